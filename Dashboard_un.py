@@ -4,6 +4,19 @@ import pandas as pd
 import plotly.express as px
 from PIL import Image
 import io
+from upload_cache import read_excel_sheets_cached
+
+# Every sheet the dashboard needs, with its read options
+DASHBOARD_SHEETS = {
+    'DataSheet': {},
+    'קריאות חוזרות לפי טכנאי': {},
+    'התפלגות סוגי קריאה': {'index_col': 0},
+    'חלקים הכי נפוצים': {},
+    'תקלות לפי דגם': {},
+    'קריאות לפי אתר': {},
+    'ביקורים טכניים לפי דגם': {},
+    'קריאות לפי טכנאי וסוג קריאה': {},
+}
 
 
 # Sidebar: Upload Excel files
@@ -16,9 +29,12 @@ if file_1 and file_2:
     label_1 = st.sidebar.text_input("Label for First File", value="Dataset 1")
     label_2 = st.sidebar.text_input("Label for Second File", value="Dataset 2")
 
-    # Load all sheets
-    total_1 = pd.read_excel(file_1, sheet_name='DataSheet').iloc[0, 0]
-    total_2 = pd.read_excel(file_2, sheet_name='DataSheet').iloc[0, 0]
+    # Load all sheets (each workbook is parsed once per content and cached)
+    sheets_1 = read_excel_sheets_cached(file_1, DASHBOARD_SHEETS)
+    sheets_2 = read_excel_sheets_cached(file_2, DASHBOARD_SHEETS)
+
+    total_1 = sheets_1['DataSheet'].iloc[0, 0]
+    total_2 = sheets_2['DataSheet'].iloc[0, 0]
 
     total_calls_summary = pd.DataFrame({
         'Period': [label_1, label_2],
@@ -26,8 +42,8 @@ if file_1 and file_2:
     })
     total_calls_summary['Change (%)'] = total_calls_summary['Total Calls'].pct_change().round(2) * 100
 
-    repeated_1 = pd.read_excel(file_1, sheet_name='קריאות חוזרות לפי טכנאי').assign(Period=label_1)
-    repeated_2 = pd.read_excel(file_2, sheet_name='קריאות חוזרות לפי טכנאי').assign(Period=label_2)
+    repeated_1 = sheets_1['קריאות חוזרות לפי טכנאי'].assign(Period=label_1)
+    repeated_2 = sheets_2['קריאות חוזרות לפי טכנאי'].assign(Period=label_2)
     combined_repeated = pd.concat([repeated_1, repeated_2])
 
     perf_1 = repeated_1[['טכנאי', 'קריאות חוזרות', 'סה"כ ביקורים']].copy()
@@ -40,29 +56,29 @@ if file_1 and file_2:
 
     technician_performance = pd.concat([perf_1, perf_2])
 
-    by_type_1 = pd.read_excel(file_1, sheet_name='התפלגות סוגי קריאה', index_col=0).reset_index().assign(Period=label_1)
-    by_type_2 = pd.read_excel(file_2, sheet_name='התפלגות סוגי קריאה', index_col=0).reset_index().assign(Period=label_2)
+    by_type_1 = sheets_1['התפלגות סוגי קריאה'].reset_index().assign(Period=label_1)
+    by_type_2 = sheets_2['התפלגות סוגי קריאה'].reset_index().assign(Period=label_2)
     calls_by_type = pd.concat([by_type_1, by_type_2])
     calls_by_type.rename(columns={calls_by_type.columns[0]: 'סוג קריאה'}, inplace=True)
 
-    parts_1 = pd.read_excel(file_1, sheet_name='חלקים הכי נפוצים').assign(Period=label_1)
-    parts_2 = pd.read_excel(file_2, sheet_name='חלקים הכי נפוצים').assign(Period=label_2)
+    parts_1 = sheets_1['חלקים הכי נפוצים'].assign(Period=label_1)
+    parts_2 = sheets_2['חלקים הכי נפוצים'].assign(Period=label_2)
     combined_parts = pd.concat([parts_1, parts_2])
 
-    faults_1 = pd.read_excel(file_1, sheet_name='תקלות לפי דגם').assign(Period=label_1)
-    faults_2 = pd.read_excel(file_2, sheet_name='תקלות לפי דגם').assign(Period=label_2)
+    faults_1 = sheets_1['תקלות לפי דגם'].assign(Period=label_1)
+    faults_2 = sheets_2['תקלות לפי דגם'].assign(Period=label_2)
     combined_faults = pd.concat([faults_1, faults_2])
 
-    site_1 = pd.read_excel(file_1, sheet_name='קריאות לפי אתר').assign(Period=label_1)
-    site_2 = pd.read_excel(file_2, sheet_name='קריאות לפי אתר').assign(Period=label_2)
+    site_1 = sheets_1['קריאות לפי אתר'].assign(Period=label_1)
+    site_2 = sheets_2['קריאות לפי אתר'].assign(Period=label_2)
     combined_sites = pd.concat([site_1, site_2])
 
-    visits_1 = pd.read_excel(file_1, sheet_name='ביקורים טכניים לפי דגם').assign(Period=label_1)
-    visits_2 = pd.read_excel(file_2, sheet_name='ביקורים טכניים לפי דגם').assign(Period=label_2)
+    visits_1 = sheets_1['ביקורים טכניים לפי דגם'].assign(Period=label_1)
+    visits_2 = sheets_2['ביקורים טכניים לפי דגם'].assign(Period=label_2)
     combined_visits = pd.concat([visits_1, visits_2])
 
-    calls_by_tech_1 = pd.read_excel(file_1, sheet_name='קריאות לפי טכנאי וסוג קריאה').assign(Period=label_1)
-    calls_by_tech_2 = pd.read_excel(file_2, sheet_name='קריאות לפי טכנאי וסוג קריאה').assign(Period=label_2)
+    calls_by_tech_1 = sheets_1['קריאות לפי טכנאי וסוג קריאה'].assign(Period=label_1)
+    calls_by_tech_2 = sheets_2['קריאות לפי טכנאי וסוג קריאה'].assign(Period=label_2)
     combined_calls_by_tech = pd.concat([calls_by_tech_1, calls_by_tech_2])
     combined_calls_by_tech['סוג קריאה'] = combined_calls_by_tech['סוג קריאה'].replace('תחזוקה', 'תחזוקה/שיפוץ/בדיקה')
 
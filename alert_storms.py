@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+# Alert storms: a station raising more than ``threshold`` alerts of one type
+# within ``window`` minutes.
+# Every alert closes a window: the alerts of the same (station, alert) in the
+# ``window`` minutes up to and including it. A window holding more than
+# ``threshold`` alerts is hot, and hot windows that share alerts chain into one
+# storm, reported with its first and last alert, how many alerts it spans and
+# the most alerts a single window held.
+# StormDetector reads the log as time-ordered chunks and keeps only what the
+# next chunk can still touch: the rows of the last ``window`` minutes, an
+# alert count per (station, alert) and the storms that may still grow. Memory
+# follows the window, not the length of the log, so multi-month logs can be
+# streamed; an in-memory frame is a single chunk. Within a chunk the windows
+# are found with binary searches over one sorted (station, alert, time) key.
+
+STATION = "station"
+ALERT = "alert"
+
+STORM_COLUMNS = ["Station", "Alert", "Storm Start", "Storm End", "Alerts", "Peak Alerts in Window"]
+DEFAULT_THRESHOLD = 10
+DEFAULT_WINDOW_MINUTES = 10
+
+
+# 🛠 HELPER FUNCTIONS
+def _window_counts(codes, times, window) -> tuple:
+    # Rows sorted by (key code, time); for each, where its window starts and how many alerts it holds.
+    # One int64 search key per row: key code * stride + milliseconds, which stays
+    # in range for years of log and many thousands of keys (nanoseconds would not)
+    order = np.lexsort((times, codes))
+    ms = (times - times.min()) // 1_000_000 if len(times) else times
+    window = window // 1_000_000
+    # Keys stride past window + span, so "time - window" never reaches the previous key
+    stride = int(ms.max()) + window + 1 if len(ms) else 1
+    keyed = codes[order] * stride + window + ms[order]
+    start = np.searchsorted(keyed, keyed - window, side="left")
+    return order, start, np.arange(len(order)) - start + 1
+
+
+# 📥 PUBLIC API
+class StormDetector:
+    """Sliding-window storm detection over an alert log fed in time-ordered chunks.
+
+    Chunks need "station" and "alert" columns and ``time_col``; rows missing
+    any of them are skipped. A chunk may be unsorted inside, but none may hold
+    rows older than the previous chunk's latest one.
+    """
+
+    def __init__(self, time_col, threshold=DEFAULT_THRESHOLD, window_minutes=DEFAULT_WINDOW_MINUTES):
+        self.time_col = time_col
+        self.threshold = threshold
+        self.window = int(pd.Timedelta(minutes=window_minutes).value)  # ns
+        self._tail = pd.DataFrame({
+            STATION: pd.Series(dtype=object), ALERT: pd.Series(dtype=object),
+            "time": pd.Series(dtype="datetime64[ns]"), "n": pd.Series(dtype=np.int64),
+        })
+        self._seen = {}  # (station, alert) -> alerts so far
+        self._open = {}  # (station, alert) -> [start, end, first n, last n, peak]
+        self._closed = []
+        self._latest = None
+
+    def feed(self, chunk: pd.DataFrame):
+        rows = pd.DataFrame({
+            STATION: chunk[STATION].to_numpy(dtype=object),
+            ALERT: chunk[ALERT].to_numpy(dtype=object),
+            "time": pd.to_datetime(chunk[self.time_col], errors="coerce").to_numpy(dtype="datetime64[ns]"),
+        }).dropna()
+        if rows.empty:
+            return self
+        rows = rows.sort_values("time", kind="stable", ignore_index=True)
+        if self._latest is not None and rows["time"].iloc[0] < self._latest:
+            raise ValueError("Alert log chunks must come in time order for storm detection")
+
+        combined = pd.concat([self._tail, rows], ignore_index=True)
+        grouper = combined.groupby([STATION, ALERT], sort=False)
+        codes = grouper.ngroup().to_numpy()
+        uniques = list(grouper.size().index)
+        # Per-key running number of every alert, continuing from earlier chunks
+        seen = np.array([self._seen.get(key, 0) for key in uniques], dtype=np.int64)
+        new_codes = codes[len(self._tail):]
+        n = combined["n"].to_numpy(dtype=float, na_value=0).astype(np.int64)
+        n[len(self._tail):] = seen[new_codes] + pd.Series(new_codes).groupby(new_codes).cumcount().to_numpy()
+        combined["n"] = n
+        for key, count in zip(uniques, seen + np.bincount(new_codes, minlength=len(uniques))):
+            self._seen[key] = int(count)
+
+        times = combined["time"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        order, start, counts = _window_counts(codes, times, self.window)
+        hot = (order >= len(self._tail)) & (counts > self.threshold)
+        self._chain(uniques, codes[order][hot], n[order][hot], counts[hot], times[order][start[hot]], times[order][hot])
+
+        self._latest = rows["time"].iloc[-1]
+        horizon = self._latest.value - self.window
+        for key in [key for key, storm in self._open.items() if storm[1] < horizon]:
+            self._close(key)
+        self._tail = combined[times >= horizon].reset_index(drop=True)
+        return self
+
+    def _chain(self, uniques, codes, last_n, counts, starts, ends):
+        # Hot windows in (key, time) order; one that shares alerts with the key's open storm extends it
+        first_n = last_n - counts + 1
+        for code in np.unique(codes):
+            key = uniques[code]
+            for i in np.flatnonzero(codes == code):
+                storm = self._open.get(key)
+                if storm is not None and first_n[i] <= storm[3]:
+                    storm[1], storm[3], storm[4] = ends[i], last_n[i], max(storm[4], counts[i])
+                    continue
+                if storm is not None:
+                    self._close(key)
+                self._open[key] = [starts[i], ends[i], first_n[i], last_n[i], counts[i]]
+
+    def _close(self, key):
+        start, end, first_n, last_n, peak = self._open.pop(key)
+        self._closed.append((key[0], key[1], start, end, last_n - first_n + 1, peak))
+
+    def storms(self) -> pd.DataFrame:
+        """Every storm so far, open ones included, by station then start."""
+        records = self._closed + [
+            (key[0], key[1], start, end, last_n - first_n + 1, peak)
+            for key, (start, end, first_n, last_n, peak) in self._open.items()
+        ]
+        storms = pd.DataFrame(records, columns=STORM_COLUMNS)
+        for col in ("Storm Start", "Storm End"):
+            storms[col] = pd.to_datetime(storms[col].astype(np.int64) if len(storms) else storms[col])
+        storms[["Alerts", "Peak Alerts in Window"]] = storms[["Alerts", "Peak Alerts in Window"]].astype(np.int64)
+        return storms.sort_values(
+            ["Station", "Storm Start", "Alert"], key=lambda col: col.astype(str) if col.dtype == object else col,
+            kind="stable", ignore_index=True
+        )
+
+
+def detect_storms(df, time_col, threshold=DEFAULT_THRESHOLD, window_minutes=DEFAULT_WINDOW_MINUTES, chunk_rows=None):
+    """Storms in an alert log held in memory; ``chunk_rows`` feeds it in time-ordered chunks."""
+    detector = StormDetector(time_col, threshold, window_minutes)
+    if not chunk_rows:
+        return detector.feed(df).storms()
+    times = pd.to_datetime(df[time_col], errors="coerce")
+    df = df.iloc[np.argsort(times.to_numpy(dtype="datetime64[ns]"), kind="stable")]
+    for first in range(0, len(df), chunk_rows):
+        detector.feed(df.iloc[first:first + chunk_rows])
+    return detector.storms()
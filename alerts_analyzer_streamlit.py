@@ -1,10 +1,37 @@
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 from io import BytesIO
 from PIL import Image
-import xlsxwriter
+from alert_storms import DEFAULT_THRESHOLD, DEFAULT_WINDOW_MINUTES, detect_storms
+from excel_writer import Partitions, ReportWriter
+from lazy_download import artifact_key, lazy_download_button
+from schema import timestamp_columns
+from upload_cache import read_excel_cached
 
+STORM_CHUNK_ROWS = 100_000
+STORMS_SHEET = "Alert Storms"
+
+
+def alert_blocks(df, alerts):
+    """Counts per (station, alert, alert details) from one groupby, split into a block per station and alert.
+
+    Block ``s * len(alerts) + a`` holds station ``s`` (in order of appearance)
+    and alert ``a`` (in ``alerts`` order), its details sorted. Also returns the
+    blocks of the (station, alert) pairs found in ``df``, in order; one whose
+    rows all lack details still gets its (empty) block in the report.
+    """
+    summary = df.groupby(["station", "alert", "alert details"], observed=True).size().reset_index(name="Count")
+    stations = df["station"].dropna().unique()
+
+    def block_codes(frame):
+        station, alert = pd.Index(stations).get_indexer(frame["station"]), pd.Index(alerts).get_indexer(frame["alert"])
+        return np.where((station >= 0) & (alert >= 0), station * len(alerts) + alert, -1)
+
+    present = np.unique(block_codes(df))
+    blocks = Partitions(summary.drop(columns="station"), block_codes(summary), len(stations) * len(alerts))
+    return stations, blocks, present[present >= 0]
 
 
 st.title("🚨 Polytex Alert Analyzer")
@@ -13,7 +40,7 @@ uploaded_file = st.file_uploader("Upload an Excel file", type=["xlsx"])
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
+        df = read_excel_cached(uploaded_file, engine="auto")
         df.columns = df.columns.str.strip().str.lower()
 
         required_columns = ["station", "alert", "alert details"]
@@ -27,50 +54,51 @@ if uploaded_file:
             else:
                 selected_alerts = st.multiselect("Select alerts to include in the report", sorted(unique_alerts))
 
+            detect = st.checkbox(
+                "🌩️ Detect alert storms",
+                help="Bursts of more than N alerts of one type at a station within T minutes, listed on an extra sheet."
+            )
+            storm_options = None
+            if detect:
+                time_columns = timestamp_columns(df)
+                if not time_columns:
+                    st.warning("No date or time column found, alert storms can't be detected.")
+                else:
+                    time_col = st.selectbox("Timestamp column", time_columns)
+                    threshold = st.number_input("More than N alerts", min_value=1, value=DEFAULT_THRESHOLD)
+                    window = st.number_input("Within T minutes", min_value=1, value=DEFAULT_WINDOW_MINUTES)
+                    storm_options = (time_col, int(threshold), int(window))
+
             if selected_alerts:
                 df_filtered = df[df["alert"].isin(selected_alerts)]
 
                 if not df_filtered.empty:
-                    output = BytesIO()
-                    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                        for station in df_filtered["station"].unique():
-                            station_data = df_filtered[df_filtered["station"] == station]
-                            sheet_name = str(station)[:31]
-                            workbook = writer.book
-                            worksheet = workbook.add_worksheet(sheet_name)
-
-                            row = 0
-                            for alert in selected_alerts:
-                                alert_data = station_data[station_data["alert"] == alert]
-                                if not alert_data.empty:
-                                    summary = alert_data.groupby(["alert", "alert details"]).size().reset_index(name="Count")
-                                    worksheet.write(row, 0, f"Alert: {alert}")
-                                    row += 1
-
-                                    col_widths = [len(str(col)) for col in summary.columns]
-                                    for col_idx, col_name in enumerate(summary.columns):
-                                        worksheet.write(row, col_idx, col_name)
-                                    row += 1
-
-                                    for record in summary.itertuples(index=False):
-                                        for col_idx, value in enumerate(record):
-                                            val_str = str(value)
-                                            worksheet.write(row, col_idx, val_str)
-                                            col_widths[col_idx] = max(col_widths[col_idx], len(val_str))
-                                        row += 1
-
-                                    for i, w in enumerate(col_widths):
-                                        worksheet.set_column(i, i, w + 2)
-                                    row += 2
-
-                    output.seek(0)
+                    def build_alert_summary():
+                        output = BytesIO()
+                        with ReportWriter(output, expected_rows=len(df_filtered)) as writer:
+                            stations, blocks, present = alert_blocks(df_filtered, selected_alerts)
+                            current = None
+                            # Only the blocks of alerts each station raised, already in sheet and block order
+                            for block in present:
+                                station, alert = divmod(int(block), len(selected_alerts))
+                                if station != current:
+                                    worksheet, row, current = writer.add_sheet(stations[station]), 0, station
+                                title = f"Alert: {selected_alerts[alert]}"
+                                row = writer.write_partition(blocks, block, worksheet, row, title=title) + 2
+                            if storm_options:
+                                # Fed to the detector in time-ordered chunks, so its working memory stays bounded
+                                storms = detect_storms(df_filtered, *storm_options, chunk_rows=STORM_CHUNK_ROWS)
+                                writer.write_frame(storms, STORMS_SHEET)
+                        return output.getvalue()
+
                     input_filename = uploaded_file.name.rsplit('.', 1)[0]
                     out_filename = f"{input_filename}_alert_summary.xlsx"
 
-                    st.download_button(
-                        label="📥 Download Excel Report",
-                        data=output,
-                        file_name=out_filename,
+                    # Built when downloaded, not on every change of the alert selection
+                    selection = (selected_alerts, storm_options)
+                    lazy_download_button(
+                        "📥 Download Excel Report", artifact_key("alert_summary", uploaded_file, selection),
+                        build_alert_summary, file_name=out_filename,
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
                 else:
@@ -4,6 +4,10 @@ import pandas as pd
 from io import BytesIO
 import datetime as dt
 from PIL import Image
+from excel_writer import ReportWriter
+from repeat_engine import ATTRIBUTIONS, DEFAULT_WINDOWS, find_repeat_pairs, technician_repeat_rates
+from schema import drop_unused_categories
+from upload_cache import read_excel_cached
 
 
 
@@ -17,7 +21,7 @@ parts_file = st.file_uploader("🔧 קובץ חלקים (Excel)", type=['xlsx'],
 if service_file and parts_file:
     st.success("✔️ הקבצים נטענו בהצלחה")
 
-    service_df_temp = pd.read_excel(service_file)
+    service_df_temp = read_excel_cached(service_file, schema=True)
     service_df_temp['ת. פתיחה'] = pd.to_datetime(service_df_temp['ת. פתיחה'], errors='coerce')
     min_date, max_date = service_df_temp['ת. פתיחה'].min(), service_df_temp['ת. פתיחה'].max()
 
@@ -42,24 +46,35 @@ if service_file and parts_file:
 
     st.markdown(f"🔍 *מנתח בין:* `{start_date.date()}` ועד `{end_date.date()}`")
 
+    st.header("3️⃣ הגדרות קריאות חוזרות")
+    repeat_window = st.selectbox("חלון קריאה חוזרת (ימים)", list(DEFAULT_WINDOWS), index=list(DEFAULT_WINDOWS).index(30))
+    call_type_options = sorted(service_df_temp['סוג קריאה'].dropna().unique())
+    repeat_call_types = st.multiselect(
+        "סוגי קריאה לניתוח", call_type_options,
+        default=[t for t in ['ביקור טכני'] if t in call_type_options]
+    )
+    attribution = st.selectbox("זקיפת הקריאה החוזרת", list(ATTRIBUTIONS), format_func=ATTRIBUTIONS.get)
+
     if st.button("🚀 בצע ניתוח"):
         with st.spinner("מריץ ניתוחים..."):
 
             service_df = service_df_temp.copy()
-            parts_df = pd.read_excel(parts_file)
+            parts_df = read_excel_cached(parts_file, schema=True)
             service_df = service_df[(service_df['ת. פתיחה'] >= start_date) & (service_df['ת. פתיחה'] <= end_date)]
+            # Categorical columns: keep counts to the values left after the date filter
+            service_df = drop_unused_categories(service_df)
 
             results = {}
             results["כמות קריאות"] = pd.DataFrame({'סה"כ קריאות': [service_df.shape[0]]})
             results["התפלגות סוגי קריאה"] = service_df['סוג קריאה'].value_counts().reset_index().rename(columns={'index': 'סוג קריאה', 'סוג קריאה': 'כמות'})
-            tech_df = service_df[service_df['סוג קריאה'] == 'ביקור טכני']
+            tech_df = drop_unused_categories(service_df[service_df['סוג קריאה'] == 'ביקור טכני'])
             results["ביקורים טכניים לפי דגם"] = tech_df['מק"ט'].value_counts().reset_index().rename(columns={'index': 'דגם', 'דגם': 'כמות ביקורים'})
 
             if 'מק"ט' in service_df.columns and 'תאור תקלה' in service_df.columns:
                 issues_by_model = (
                     service_df[['מק"ט', 'תאור תקלה']]
                     .dropna(subset=['מק"ט', 'תאור תקלה'])
-                    .groupby(['מק"ט', 'תאור תקלה'])
+                    .groupby(['מק"ט', 'תאור תקלה'], observed=True)
                     .size()
                     .reset_index(name='כמות')
                     .sort_values(by=['מק"ט', 'כמות'], ascending=[True, False])
@@ -68,35 +83,30 @@ if service_file and parts_file:
             else:
                 results["תקלות לפי דגם"] = pd.DataFrame(columns=["דגם", "תאור תקלה", "כמות"])
 
-            results["צירופי תקלה ופעולה"] = service_df.groupby(['תאור תקלה', 'תאור קוד פעולה']).size().reset_index(name='כמות').sort_values(by='כמות', ascending=False)
-            results["קריאות לפי טכנאי וסוג קריאה"] = service_df.groupby(['לטיפול', 'סוג קריאה']).size().reset_index(name='כמות קריאות')
+            results["צירופי תקלה ופעולה"] = service_df.groupby(['תאור תקלה', 'תאור קוד פעולה'], observed=True).size().reset_index(name='כמות').sort_values(by='כמות', ascending=False)
+            results["קריאות לפי טכנאי וסוג קריאה"] = service_df.groupby(['לטיפול', 'סוג קריאה'], observed=True).size().reset_index(name='כמות קריאות')
             results["קריאות לפי אתר"] = service_df['תאור האתר'].value_counts().reset_index().rename(columns={'index': 'תאור האתר', 'תאור האתר': 'כמות קריאות'})
 
-            tech_df = tech_df.copy()
-            tech_df['ת. פתיחה'] = pd.to_datetime(tech_df['ת. פתיחה'])
-            tech_df.sort_values(by=["מס' מכשיר", "ת. פתיחה"], inplace=True)
-            tech_df['prev_open'] = tech_df.groupby("מס' מכשיר")['ת. פתיחה'].shift(1)
-            tech_df['prev_technician'] = tech_df.groupby("מס' מכשיר")['לטיפול'].shift(1)
-            tech_df['days_diff'] = (tech_df['ת. פתיחה'] - tech_df['prev_open']).dt.days
-            tech_df['חוזרת'] = tech_df['days_diff'].apply(lambda x: x <= 30 if pd.notnull(x) else False)
-            repeated = tech_df[tech_df['חוזרת']]
-            repeat_count = repeated['prev_technician'].value_counts().reset_index()
-            repeat_count.columns = ['טכנאי', 'קריאות חוזרות']
-            total = tech_df['לטיפול'].value_counts().reset_index()
-            total.columns = ['טכנאי', 'סה"כ ביקורים']
-            repeat_stats = pd.merge(repeat_count, total, on='טכנאי', how='left')
-            repeat_stats['אחוז חוזרות'] = (repeat_stats['קריאות חוזרות'] / repeat_stats['סה"כ ביקורים'] * 100).round(2)
+            pairs = find_repeat_pairs(service_df, [repeat_window], call_types=repeat_call_types, attribution=attribution)
+            rates = technician_repeat_rates(service_df, pairs, call_types=repeat_call_types)
+            rates = rates.sort_values('Repeats', ascending=False, kind='stable')
+            repeat_stats = pd.DataFrame({
+                'טכנאי': rates.index,
+                'קריאות חוזרות': rates['Repeats'].to_numpy(),
+                'סה"כ ביקורים': rates['Calls'].to_numpy(),
+                'אחוז חוזרות': rates['Percentage'].round(2).to_numpy(),
+            })
             results["קריאות חוזרות לפי טכנאי"] = repeat_stats
 
             results["חלקים הכי נפוצים"] = parts_df['תאור מוצר - חלק'].value_counts().reset_index().rename(columns={'index': 'תיאור חלק', 'תאור מוצר - חלק': 'כמות החלפות'})
             results['חלקים לפי מק"ט בטיפול'] = parts_df['מק"ט בטיפול'].value_counts().reset_index().rename(columns={'index': 'מק"ט בטיפול', 'מק"ט בטיפול': 'כמות החלפות'})
-            results["חלקים לפי דגם מכונה"] = parts_df.groupby(['מק"ט בטיפול', 'תאור מוצר - חלק']).size().reset_index(name='כמות החלפות')
+            results["חלקים לפי דגם מכונה"] = parts_df.groupby(['מק"ט בטיפול', 'תאור מוצר - חלק'], observed=True).size().reset_index(name='כמות החלפות')
 
             
         output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        with ReportWriter(output) as writer:
             for sheet_name, df in results.items():
-                df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+                writer.write_frame(df, sheet_name)
         output.seek(0)
 
         # קביעת שם קובץ מותאם לפי בחירה
@@ -0,0 +1,251 @@
+"""Performance benchmarks for the toolkit's hot paths.
+
+Run from the repository root, e.g.::
+
+    python benchmarks.py readers --rows 100000
+    python benchmarks.py readers --file "PM8 transactions.xlsx" --file alerts.xlsx
+    python benchmarks.py repeats --rows 1000000
+    python benchmarks.py machine_report --machines 5000
+    python benchmarks.py alert_storms --rows 1000000
+"""
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+import alert_storms
+import excel_reader
+import machine_report
+import repeat_engine
+from schema import normalize_frame
+
+
+# 🛠 HELPER FUNCTIONS
+def measure(func, *args, **kwargs):
+    """Run ``func`` twice: timed, then under tracemalloc; return (result, seconds, peak MB).
+
+    Tracing slows Python down, hence the separate runs. tracemalloc sees Python
+    and numpy allocations but not native ones (calamine), so compare memory
+    between the openpyxl engines only.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def print_table(rows):
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+# 🧪 SYNTHETIC FILE SHAPES
+def pm8_transactions(rows, rng):
+    return pd.DataFrame({
+        "Created Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s"),
+        "Card ID": rng.integers(10_000, 99_999, rows).astype(str),
+        "RFID Tag": [f"E200{v:08X}" for v in rng.integers(0, rows // 3 + 1, rows)],
+        "Transaction Type ID": rng.choice(["Delivery", "Return", "Collect"], rows),
+        "User Full Name": rng.choice([f"עובד {i}" for i in range(800)], rows),
+        "Item Type Name": rng.choice(["חלוק", "מכנסיים", "חולצה", "כובע"], rows),
+        "Item Sub Type Name": rng.choice(["S", "M", "L", "XL", "XXL"], rows),
+    })
+
+
+def alert_log(rows, rng):
+    return pd.DataFrame({
+        "Station": rng.choice([f"Station {i}" for i in range(300)], rows),
+        "Alert": rng.choice([f"Alert {i}" for i in range(40)], rows),
+        "Alert Details": rng.choice([f"Details {i}" for i in range(120)], rows),
+        "Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90 * 24 * 3600, rows), unit="s"),
+    })
+
+
+def rfid_reads(rows, rng):
+    return pd.DataFrame({
+        "RFID": [f"E200{v:08X}" for v in rng.integers(0, rows // 5 + 1, rows)],
+        "Item Type Name": rng.choice(["חלוק", "מכנסיים", "חולצה"], rows),
+        "Item Sub Type Name": rng.choice(["S", "M", "L", "XL"], rows),
+        "Station Name": rng.choice([f"Station {i}" for i in range(200)], rows),
+    })
+
+
+def service_calls(rows, rng, machines=None):
+    # Every one of the machines (default: one per ten calls) gets at least one call
+    machines = machines or max(1, rows // 10)
+    return pd.DataFrame({
+        "מס. קריאה": np.arange(rows) + 1_000_000,
+        "ת. פתיחה": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, rows), unit="min"),
+        "מס' מכשיר": rng.permutation(np.arange(rows) % machines) + 1,
+        "תאור האתר": rng.choice([f"אתר {i}" for i in range(400)], rows),
+        "לטיפול": rng.choice([f"טכנאי {i}" for i in range(120)], rows),
+        "סוג קריאה": rng.choice(["ביקור טכני", "התקנה", "תחזוקה מונעת"], rows, p=[0.7, 0.1, 0.2]),
+        "תאור תקלה": rng.choice([f"תקלה {i}" for i in range(300)], rows),
+        "תאור קוד פעולה": rng.choice([f"פעולה {i}" for i in range(150)], rows),
+    })
+
+
+def spare_parts(calls, rng, per_call=0.6):
+    rows = int(len(calls) * per_call)
+    return pd.DataFrame({
+        "מס. קריאה": rng.choice(calls["מס. קריאה"].to_numpy(), rows),
+        'מק"ט - חלק': rng.choice([f"PRT-{i:05d}" for i in range(2_000)], rows),
+        "תאור מוצר - חלק": rng.choice([f"חלק חילוף {i}" for i in range(2_000)], rows),
+        "כמות בפועל": rng.integers(0, 4, rows),
+    })
+
+
+FILE_SHAPES = {
+    "service_calls": service_calls,
+    "pm8_transactions": pm8_transactions,
+    "alert_log": alert_log,
+    "rfid_reads": rfid_reads,
+}
+
+
+def to_xlsx_bytes(df):
+    output = BytesIO()
+    df.to_excel(output, index=False, engine="xlsxwriter")
+    return output.getvalue()
+
+
+# ⏱️ BENCHMARKS
+def bench_readers(args):
+    rng = np.random.default_rng(args.seed)
+    workbooks = {}
+    for path in args.file:
+        with open(path, "rb") as f:
+            workbooks[path] = f.read()
+    if not workbooks:
+        for name, make in FILE_SHAPES.items():
+            print(f"Generating {name} ({args.rows:,} rows)...")
+            workbooks[name] = to_xlsx_bytes(make(args.rows, rng))
+
+    results = []
+    for name, data in workbooks.items():
+        for engine in excel_reader.available_engines():
+            for dtype in (None, str):
+                df, seconds, peak_mb = measure(
+                    lambda: excel_reader.read_excel(BytesIO(data), engine=engine, dtype=dtype)
+                )
+                results.append({
+                    "File": name,
+                    "Engine": engine,
+                    "dtype": "str" if dtype is str else "infer",
+                    "Rows": len(df),
+                    "Seconds": round(seconds, 2),
+                    "Peak MB": round(peak_mb, 1),
+                })
+    print_table(results)
+
+
+def bench_repeats(args):
+    rng = np.random.default_rng(args.seed)
+    print(f"Generating service_calls ({args.rows:,} rows)...")
+    calls = normalize_frame(service_calls(args.rows, rng))
+    scenarios = [
+        ("pairs, 30 days", lambda: repeat_engine.find_repeat_pairs(calls, [30])),
+        ("pairs, 7/14/30/60/90 days", lambda: repeat_engine.find_repeat_pairs(calls, repeat_engine.DEFAULT_WINDOWS)),
+        ("pairs, 'ביקור טכני' only", lambda: repeat_engine.find_repeat_pairs(calls, [30], call_types=["ביקור טכני"])),
+        ("pairs, credit repeat call", lambda: repeat_engine.find_repeat_pairs(calls, [30], attribution="repeat")),
+        ("marks, 30 days", lambda: repeat_engine.mark_repeats(calls, [30])),
+    ]
+
+    results = []
+    for name, run in scenarios:
+        def cold(run=run):
+            repeat_engine.clear_cache()
+            return run()
+
+        result, seconds, peak_mb = measure(cold)
+        _, cached_seconds, _ = measure(run)
+        results.append({
+            "Scenario": name,
+            "Rows": len(calls),
+            "Result Rows": len(result),
+            "Seconds": round(seconds, 2),
+            "Cached Seconds": round(cached_seconds, 2),
+            "Peak MB": round(peak_mb, 1),
+        })
+    print_table(results)
+
+
+def bench_machine_report(args):
+    rng = np.random.default_rng(args.seed)
+    results = []
+    # Quarter, half and full fleet: time should grow linearly with the fleet
+    for machines in (args.machines // 4, args.machines // 2, args.machines):
+        rows = machines * args.calls_per_machine
+        calls = normalize_frame(service_calls(rows, rng, machines))
+        parts = normalize_frame(spare_parts(calls, rng))
+        report, seconds, peak_mb = measure(machine_report.build_report, calls, parts)
+        results.append({
+            "Machines": calls["מס' מכשיר"].nunique(),
+            "Calls": len(calls),
+            "Parts": len(parts),
+            "MB": round(len(report) / (1024 * 1024), 1),
+            "Seconds": round(seconds, 2),
+            "ms / Machine": round(seconds * 1000 / machines, 2),
+            "Peak MB": round(peak_mb, 1),
+        })
+    print_table(results)
+
+
+def bench_alert_storms(args):
+    rng = np.random.default_rng(args.seed)
+    print(f"Generating alert_log ({args.rows:,} rows)...")
+    log = alert_log(args.rows, rng).rename(columns=str.lower)
+    results = []
+    # Peak memory of the chunked runs should follow the chunk size, not the log
+    for chunk_rows in (None, 100_000, 10_000):
+        storms, seconds, peak_mb = measure(
+            alert_storms.detect_storms, log, "date", args.threshold, args.window, chunk_rows=chunk_rows
+        )
+        results.append({
+            "Chunk Rows": chunk_rows or "all",
+            "Rows": len(log),
+            "Storms": len(storms),
+            "Seconds": round(seconds, 2),
+            "Peak MB": round(peak_mb, 1),
+        })
+    print_table(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=7)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    readers = sub.add_parser("readers", help="Compare the Excel reader engines")
+    readers.add_argument("--rows", type=int, default=100_000, help="Rows per synthetic workbook")
+    readers.add_argument("--file", action="append", default=[], help="Benchmark a real workbook instead")
+    readers.set_defaults(func=bench_readers)
+
+    repeats = sub.add_parser("repeats", help="Time the shared repeat-call engine")
+    repeats.add_argument("--rows", type=int, default=1_000_000, help="Synthetic service calls")
+    repeats.set_defaults(func=bench_repeats)
+
+    machines = sub.add_parser("machine_report", help="Build the per-machine service calls report")
+    machines.add_argument("--machines", type=int, default=5_000, help="Machines in the largest fleet")
+    machines.add_argument("--calls-per-machine", type=int, default=10)
+    machines.set_defaults(func=bench_machine_report)
+
+    storms = sub.add_parser("alert_storms", help="Detect alert storms, in memory and in chunks")
+    storms.add_argument("--rows", type=int, default=1_000_000, help="Synthetic alert log rows")
+    storms.add_argument("--threshold", type=int, default=2, help="More than this many alerts...")
+    storms.add_argument("--window", type=int, default=60, help="...within this many minutes")
+    storms.set_defaults(func=bench_alert_storms)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Helpers for the in-process caches (upload_cache, lazy_download, ...).
+# Their keys are built from read options and widget selections, which can hold
+# dicts, lists, sets and dtypes; freeze_key() turns those into hashable tuples,
+# the same value always giving the same key.
+
+
+# 📥 PUBLIC API
+def freeze_key(value):
+    """Hashable form of ``value`` for use in a cache key; dict and set order don't matter."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze_key(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        # Sorted, as set order of strings changes from one process to the next
+        return tuple(sorted((freeze_key(v) for v in value), key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_key(v) for v in value)
+    if isinstance(value, type):
+        return value.__name__
+    return value
@@ -0,0 +1,153 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from upload_cache import content_hash, read_excel_cached
+
+# One join between a service calls export and a parts export.
+# The tools used to cast call numbers to text, strip ".0" and merge strings
+# on every rerun. Here each call number is normalized once into an int64 key:
+# the number itself for plain numeric IDs (1234, 1234.0, "1234", " 1234 "),
+# a 64-bit hash of the cleaned text for anything else (leading zeros, letters),
+# so "01234" still only matches "01234". The parts rows sorted by key form a
+# call -> parts index (CSR: a call's parts are one contiguous slice), and
+# matching any calls against it is two binary searches per call.
+# Joins are built per (calls file, parts file) content hash and cached here,
+# shared by every tool and session. Row numbers are positions in the frames
+# as read_excel_cached returns them, which are also their index labels, so
+# filtered frames are joined through their index.
+
+CALL = "מס. קריאה"
+MAX_ENTRIES = 16
+
+_DIRECTION_MARKS = re.compile(r"[\u200e\u200f\u202a-\u202e]")
+_PLAIN_NUMBER = re.compile(r"(0|[1-9]\d{0,17})(\.0*)?")
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (calls hash, parts hash) -> CallJoin
+
+
+# 🛠 HELPER FUNCTIONS
+def call_keys(values) -> tuple:
+    """(int64 key, valid mask) per call number; missing and empty ones are not valid."""
+    values = pd.Series(values).reset_index(drop=True)
+    keys = np.zeros(len(values), dtype=np.int64)
+    valid = values.notna().to_numpy().copy()
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        valid &= np.mod(numbers, 1, where=valid, out=np.ones_like(numbers)) == 0
+        keys[valid] = numbers[valid].astype(np.int64)
+        return keys, valid
+    text = values[valid].astype(str).str.replace(_DIRECTION_MARKS, "", regex=True).str.strip()
+    numeric = text.str.fullmatch(_PLAIN_NUMBER).to_numpy(dtype=bool)
+    positions = np.flatnonzero(valid)
+    keys[positions[numeric]] = text[numeric].str.split(".", n=1).str[0].astype(np.int64).to_numpy()
+    keys[positions[~numeric]] = pd.util.hash_array(text[~numeric].to_numpy(dtype=object)).view(np.int64)
+    valid[positions] = text.ne("").to_numpy()
+    return keys, valid
+
+
+def _sorted_by_key(keys, valid, rows):
+    rows = rows[valid[rows]]
+    order = rows[np.argsort(keys[rows], kind="stable")]
+    return order, keys[order]
+
+
+def _match(keys, valid, left_rows, right_order, right_sorted, keep_unmatched):
+    # Every (left position, right row) pair with equal keys, left-major, right rows in file order
+    left_keys = keys[left_rows]
+    start = np.searchsorted(right_sorted, left_keys, side="left")
+    counts = np.where(valid[left_rows], np.searchsorted(right_sorted, left_keys, side="right") - start, 0)
+    if keep_unmatched:
+        slots = np.maximum(counts, 1)
+        left = np.repeat(np.arange(len(left_rows)), slots)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(slots) - slots, slots)
+        right = np.full(len(left), -1, dtype=np.int64)
+        matched = np.repeat(counts, slots) > 0
+        right[matched] = right_order[(np.repeat(start, slots) + offsets)[matched]]
+        return left, right
+    left = np.repeat(np.arange(len(left_rows)), counts)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, right_order[np.repeat(start, counts) + offsets]
+
+
+def _rows(df):
+    return df.index.to_numpy(dtype=np.int64)
+
+
+def _combine(left_df, right_df, left, right, suffixes):
+    # pd.merge's layout: left columns (with the key), then the right ones without it
+    right_df = right_df.drop(columns=[CALL], errors="ignore")
+    overlap = set(left_df.columns) & set(right_df.columns)
+    left_part = left_df.iloc[left].rename(columns={c: f"{c}{suffixes[0]}" for c in overlap})
+    right_part = right_df.reset_index(drop=True).reindex(right)  # -1: no match, an empty row
+    right_part = right_part.rename(columns={c: f"{c}{suffixes[1]}" for c in overlap})
+    return pd.concat([left_part.reset_index(drop=True), right_part.reset_index(drop=True)], axis=1)
+
+
+# 📥 PUBLIC API
+class CallJoin:
+    """Calls rows <-> parts rows by normalized call number."""
+
+    def __init__(self, calls_numbers, parts_numbers):
+        self.calls_keys, self.calls_valid = call_keys(calls_numbers)
+        self.parts_keys, self.parts_valid = call_keys(parts_numbers)
+        # The call -> parts index; the other direction is sorted on first use
+        self._parts_index = _sorted_by_key(self.parts_keys, self.parts_valid, np.arange(len(self.parts_keys)))
+        self._calls_index = None
+
+    def parts_of_calls(self, call_rows=None, part_rows=None, keep_unmatched=False):
+        """(position in call_rows, parts row) for every matching pair, calls first.
+
+        ``call_rows`` / ``part_rows`` restrict the join to those rows (default:
+        all). With ``keep_unmatched`` a call without parts gets one pair with
+        parts row -1.
+        """
+        call_rows = np.arange(len(self.calls_keys)) if call_rows is None else np.asarray(call_rows, dtype=np.int64)
+        if part_rows is None:
+            order, sorted_keys = self._parts_index
+        else:
+            order, sorted_keys = _sorted_by_key(self.parts_keys, self.parts_valid, np.asarray(part_rows, dtype=np.int64))
+        return _match(self.calls_keys, self.calls_valid, call_rows, order, sorted_keys, keep_unmatched)
+
+    def calls_of_parts(self, part_rows=None, call_rows=None, keep_unmatched=False):
+        """(position in part_rows, calls row) for every matching pair, parts first."""
+        part_rows = np.arange(len(self.parts_keys)) if part_rows is None else np.asarray(part_rows, dtype=np.int64)
+        if call_rows is None:
+            if self._calls_index is None:
+                self._calls_index = _sorted_by_key(self.calls_keys, self.calls_valid, np.arange(len(self.calls_keys)))
+            order, sorted_keys = self._calls_index
+        else:
+            order, sorted_keys = _sorted_by_key(self.calls_keys, self.calls_valid, np.asarray(call_rows, dtype=np.int64))
+        return _match(self.parts_keys, self.parts_valid, part_rows, order, sorted_keys, keep_unmatched)
+
+    def merge_calls(self, calls_df, parts_df, how="left", suffixes=("_x", "_y")) -> pd.DataFrame:
+        """Like ``pd.merge(calls_df, parts_df, on=CALL, how=how)`` for how "left" or "inner"."""
+        left, right = self.parts_of_calls(_rows(calls_df), _rows(parts_df), keep_unmatched=how == "left")
+        positions = pd.Index(parts_df.index).get_indexer(right)
+        return _combine(calls_df, parts_df, left, np.where(right < 0, -1, positions), suffixes)
+
+    def merge_parts(self, parts_df, calls_df, how="left", suffixes=("_x", "_y")) -> pd.DataFrame:
+        """Like ``pd.merge(parts_df, calls_df, on=CALL, how=how)`` for how "left" or "inner"."""
+        left, right = self.calls_of_parts(_rows(parts_df), _rows(calls_df), keep_unmatched=how == "left")
+        positions = pd.Index(calls_df.index).get_indexer(right)
+        return _combine(parts_df, calls_df, left, np.where(right < 0, -1, positions), suffixes)
+
+
+def call_join(calls_file, parts_file) -> CallJoin:
+    """The join of two uploaded exports (read with schema=True), built once per file pair."""
+    key = (content_hash(calls_file), content_hash(parts_file))
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key]
+    join = CallJoin(read_excel_cached(calls_file, schema=True)[CALL], read_excel_cached(parts_file, schema=True)[CALL])
+    with _lock:
+        _entries[key] = join
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return join
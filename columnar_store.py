@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from schema import SCHEMA_VERSION
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, without it there is no store
+    pa = feather = None
+
+# On-disk store of parsed uploads. The first time an export is parsed, each
+# (content hash, sheet, read options) is written as an uncompressed Feather
+# (Arrow IPC) file; later loads from any tool, session or process on the same
+# instance read it back memory-mapped instead of re-parsing the xlsx XML.
+# The store is capped in size and evicts the least recently used entries.
+# Entry ids hash schema.SCHEMA_VERSION with the key, so frames written under an
+# older column registry or parser are never read back; they age out by LRU.
+# Only Feather is ever written or read (no pickle, which would run whatever a
+# planted file holds). Object columns mixing numbers and text, which Arrow
+# can't hold, are stored as text: arrow_safe() converts the copy that is
+# written, the caller's frame keeps its parsed values, and a later load from
+# the store gives those columns back as text.
+# The store lives in a per-user directory created 0700; one that is not owned
+# by this user or is open to others is never read or written.
+
+_UID = getattr(os, "getuid", lambda: None)()
+
+
+def user_temp_dir(name: str) -> Path:
+    """``name`` under the temp directory, suffixed with the user id where there is one."""
+    return Path(tempfile.gettempdir()) / (f"{name}_{_UID}" if _UID is not None else name)
+
+
+STORE_DIR = Path(os.environ.get("POLYTEX_STORE_DIR", user_temp_dir("polytex_store")))
+MAX_STORE_BYTES = int(os.environ.get("POLYTEX_STORE_MB", "512")) * 1024 * 1024
+
+# What pyarrow raises for data it can't convert (ArrowTypeError/ArrowInvalid subclass these)
+ARROW_ERRORS = (TypeError, ValueError, OverflowError, NotImplementedError)
+
+_lock = threading.Lock()
+
+
+# 🛠 HELPER FUNCTIONS
+def arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """A copy of ``df`` with the object columns Arrow can't hold (numbers and text mixed) as text.
+
+    ``df`` itself is never modified; it is returned as is when Arrow can hold every column.
+    """
+    if pa is None:
+        return df
+    mixed = []
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except ARROW_ERRORS:  # numbers and text in one column are common in Priority exports
+            mixed.append(col)
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+
+def private_dir(path) -> Path:
+    """Create ``path`` as a 0700 directory; PermissionError if it exists but others could write to it."""
+    path = Path(path)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if _UID is None:  # Windows: the temp directory is per user already
+        return path
+    info = path.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != _UID or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by this user and closed to others")
+    return path
+
+
+def write_frame(path, df: pd.DataFrame) -> str:
+    """Write ``df`` to ``path`` as Feather, mixed object columns as text.
+
+    Returns the format used. The file is written next to ``path`` first and then
+    moved into place, so concurrent readers never see a partial file.
+    """
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        feather.write_feather(arrow_safe(df), tmp, compression="uncompressed")
+    except ARROW_ERRORS:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    os.replace(tmp, path)
+    return "feather"
+
+
+def read_frame(path, fmt: str) -> pd.DataFrame:
+    if not can_read(fmt):
+        raise ValueError(f"Unsupported snapshot format: {fmt}")
+    return feather.read_feather(path, memory_map=True)
+
+
+def can_read(fmt: str) -> bool:
+    return fmt == "feather" and feather is not None
+
+
+def _entry_id(key) -> str:
+    return hashlib.sha256(repr((SCHEMA_VERSION, key)).encode("utf-8")).hexdigest()[:32]
+
+
+def _paths(entry_id: str):
+    return STORE_DIR / f"{entry_id}.snap", STORE_DIR / f"{entry_id}.json"
+
+
+def _read_meta(meta_path: Path) -> dict:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(entry_id: str):
+    for path in _paths(entry_id):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _evict():
+    metas = []
+    for meta_path in STORE_DIR.glob("*.json"):
+        meta = _read_meta(meta_path)
+        if meta is None:
+            continue
+        # Last use is tracked through the mtime of the sidecar, touched on every hit
+        metas.append((meta_path.stat().st_mtime, meta_path.stem, meta["bytes"]))
+    total = sum(size for _, _, size in metas)
+    for _, entry_id, size in sorted(metas):
+        if total <= MAX_STORE_BYTES:
+            break
+        _remove(entry_id)
+        total -= size
+
+
+# 📥 PUBLIC API
+def get(key) -> pd.DataFrame:
+    """Return the stored frame for ``key`` or None."""
+    data_path, meta_path = _paths(_entry_id(key))
+    try:
+        private_dir(STORE_DIR)
+    except OSError:
+        return None
+    meta = _read_meta(meta_path)
+    if meta is None or not data_path.exists() or not can_read(meta["format"]):
+        return None
+    try:
+        df = read_frame(data_path, meta["format"])
+        os.utime(meta_path)
+    except (OSError, ValueError):
+        return None
+    return df
+
+
+def put(key, df: pd.DataFrame, label: str = "", sheet=None):
+    """Store ``df`` under ``key``; failures (full, read-only or unsafe disk, no pyarrow) are not fatal."""
+    if feather is None:
+        return
+    entry_id = _entry_id(key)
+    data_path, meta_path = _paths(entry_id)
+    try:
+        private_dir(STORE_DIR)
+    except OSError:
+        return
+    try:
+        fmt = write_frame(data_path, df)
+        meta = {
+            "file": label,
+            "sheet": str(sheet) if sheet is not None else "",
+            "format": fmt,
+            "rows": len(df),
+            "columns": len(df.columns),
+            "bytes": data_path.stat().st_size,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+        with _lock:
+            _evict()
+    except (OSError, *ARROW_ERRORS):
+        _remove(entry_id)
+
+
+def store_entries() -> pd.DataFrame:
+    rows = []
+    if STORE_DIR.exists():
+        for meta_path in STORE_DIR.glob("*.json"):
+            meta = _read_meta(meta_path)
+            if meta is None:
+                continue
+            rows.append({
+                "File": meta["file"],
+                "Sheet": meta["sheet"],
+                "Format": meta["format"],
+                "Rows": meta["rows"],
+                "Columns": meta["columns"],
+                "Size (MB)": round(meta["bytes"] / (1024 * 1024), 2),
+                "Created": meta["created"],
+                "Last Used": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta_path.stat().st_mtime)),
+            })
+    columns = ["File", "Sheet", "Format", "Rows", "Columns", "Size (MB)", "Created", "Last Used"]
+    return pd.DataFrame(rows, columns=columns).sort_values("Last Used", ascending=False)
+
+
+def store_usage() -> dict:
+    entries = store_entries()
+    return {
+        "Directory": str(STORE_DIR),
+        "Entries": len(entries),
+        "Used (MB)": round(float(entries["Size (MB)"].sum()), 2),
+        "Limit (MB)": round(MAX_STORE_BYTES / (1024 * 1024), 2),
+    }
+
+
+def clear_store():
+    with _lock:
+        if STORE_DIR.exists():
+            for path in list(STORE_DIR.glob("*.json")) + list(STORE_DIR.glob("*.snap")):
+                _remove(path.stem)
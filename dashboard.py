@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 from PIL import Image
 import io
+from excel_writer import ReportWriter
+from snapshot import load_workbook_snapshot
 
 
 
@@ -13,9 +15,22 @@ total_calls_summary = pd.DataFrame({
     'Change (%)': [None, 20.12]
 })
 
+# Bundled workbooks are read from their columnar snapshots (rebuilt when the xlsx changes)
+COMPARISON_SHEETS = {
+    'קריאות חוזרות לפי טכנאי': {},
+    'התפלגות סוגי קריאה': {'index_col': 0},
+    'חלקים הכי נפוצים': {},
+    'תקלות לפי דגם': {},
+    'קריאות לפי אתר': {},
+    'ביקורים טכניים לפי דגם': {},
+    'קריאות לפי טכנאי וסוג קריאה': {},
+}
+sheets_2024 = load_workbook_snapshot('ניתוח קריאות 2024 Q1.xlsx', COMPARISON_SHEETS)
+sheets_2025 = load_workbook_snapshot('Service Calls Q1_2025_final.xlsx', COMPARISON_SHEETS)
+
 # Repeated Calls by Technician
-repeated_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='קריאות חוזרות לפי טכנאי').assign(Year='2024')
-repeated_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='קריאות חוזרות לפי טכנאי').assign(Year='2025')
+repeated_2024 = sheets_2024['קריאות חוזרות לפי טכנאי'].assign(Year='2024')
+repeated_2025 = sheets_2025['קריאות חוזרות לפי טכנאי'].assign(Year='2025')
 combined_repeated_calls = pd.concat([repeated_2024, repeated_2025])
 
 # Technician Performance Summary
@@ -30,31 +45,31 @@ performance_2025['שנה'] = '2025'
 technician_performance = pd.concat([performance_2024, performance_2025])
 
 # Calls by Type (with index fix)
-calls_by_type_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='התפלגות סוגי קריאה', index_col=0).reset_index()
-calls_by_type_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='התפלגות סוגי קריאה', index_col=0).reset_index()
+calls_by_type_2024 = sheets_2024['התפלגות סוגי קריאה'].reset_index()
+calls_by_type_2025 = sheets_2025['התפלגות סוגי קריאה'].reset_index()
 calls_by_type_2024['Year'] = '2024'
 calls_by_type_2025['Year'] = '2025'
 calls_by_type = pd.concat([calls_by_type_2024, calls_by_type_2025])
 calls_by_type.rename(columns={calls_by_type.columns[0]: 'סוג קריאה'}, inplace=True)
 
 # Parts Usage
-parts_usage_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='חלקים הכי נפוצים').assign(Year='2024')
-parts_usage_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='חלקים הכי נפוצים').assign(Year='2025')
+parts_usage_2024 = sheets_2024['חלקים הכי נפוצים'].assign(Year='2024')
+parts_usage_2025 = sheets_2025['חלקים הכי נפוצים'].assign(Year='2025')
 combined_parts_usage = pd.concat([parts_usage_2024, parts_usage_2025])
 
 # Most Common Faults
-faults_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='תקלות לפי דגם').assign(Year='2024')
-faults_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='תקלות לפי דגם').assign(Year='2025')
+faults_2024 = sheets_2024['תקלות לפי דגם'].assign(Year='2024')
+faults_2025 = sheets_2025['תקלות לפי דגם'].assign(Year='2025')
 combined_faults = pd.concat([faults_2024, faults_2025])
 
 # Calls by Site
-calls_by_site_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='קריאות לפי אתר').assign(Year='2024')
-calls_by_site_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='קריאות לפי אתר').assign(Year='2025')
+calls_by_site_2024 = sheets_2024['קריאות לפי אתר'].assign(Year='2024')
+calls_by_site_2025 = sheets_2025['קריאות לפי אתר'].assign(Year='2025')
 combined_calls_by_site = pd.concat([calls_by_site_2024, calls_by_site_2025])
 
 # Technical Visits by Model
-visits_by_model_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='ביקורים טכניים לפי דגם').assign(Year='2024')
-visits_by_model_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='ביקורים טכניים לפי דגם').assign(Year='2025')
+visits_by_model_2024 = sheets_2024['ביקורים טכניים לפי דגם'].assign(Year='2024')
+visits_by_model_2025 = sheets_2025['ביקורים טכניים לפי דגם'].assign(Year='2025')
 combined_visits_by_model = pd.concat([visits_by_model_2024, visits_by_model_2025])
 
 # Define Polytex colors
@@ -69,9 +84,9 @@ st.dataframe(total_calls_summary)
 
 # Export Summary
 output_buffer = io.BytesIO()
-with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:
-    total_calls_summary.to_excel(writer, sheet_name='Total Calls', index=False)
-    technician_performance.to_excel(writer, sheet_name='Technician Performance', index=False)
+with ReportWriter(output_buffer) as writer:
+    writer.write_frame(total_calls_summary, 'Total Calls')
+    writer.write_frame(technician_performance, 'Technician Performance')
 st.download_button(label="Download Summary Report", data=output_buffer.getvalue(), file_name="Q1_Comparison_Summary.xlsx")
 
 fig_total = px.bar(total_calls_summary, x='Year', y='Total Calls', text='Total Calls', 
@@ -187,8 +202,8 @@ st.plotly_chart(fig_visits)
 
 # Call Types per Technician
 st.subheader("Call Types per Technician")
-calls_by_tech_2024 = pd.read_excel('ניתוח קריאות 2024 Q1.xlsx', sheet_name='קריאות לפי טכנאי וסוג קריאה').assign(Year='2024')
-calls_by_tech_2025 = pd.read_excel('Service Calls Q1_2025_final.xlsx', sheet_name='קריאות לפי טכנאי וסוג קריאה').assign(Year='2025')
+calls_by_tech_2024 = sheets_2024['קריאות לפי טכנאי וסוג קריאה'].assign(Year='2024')
+calls_by_tech_2025 = sheets_2025['קריאות לפי טכנאי וסוג קריאה'].assign(Year='2025')
 combined_calls_by_tech = pd.concat([calls_by_tech_2024, calls_by_tech_2025])
 combined_calls_by_tech['סוג קריאה'] = combined_calls_by_tech['סוג קריאה'].replace('תחזוקה', 'תחזוקה/שיפוץ/בדיקה')
 
@@ -0,0 +1,241 @@
+import multiprocessing
+import os
+import queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from excel_writer import temp_report_path
+from repeat_engine import CREDITED
+from report_output import Report, file_extension, file_name, render
+from schema import drop_unused_categories, restore_headers
+
+# Device Fixes outputs as independent jobs.
+# Each analysis of the main workbook and each per-group export (per device,
+# per technician) is one job; with enough rows they run concurrently in a
+# process pool, so "Run Analysis" takes as long as the slowest artifact
+# rather than the sum of all of them.
+# The jobs live in this module, not in the Streamlit script, because pool
+# workers must be able to import them. The filtered calls are sent to each
+# worker once (pool initializer), not once per job. Workers are spawned, not
+# forked, since the Streamlit server process is multi-threaded.
+
+PARALLEL_MIN_ROWS = 20_000  # below this, process start-up costs more than it saves
+MAX_WORKERS = 4
+POLL_SECONDS = 0.2
+
+_worker_calls = None
+_worker_progress = None
+
+
+# 🛠 ANALYSES (each returns the sheets it adds to the main workbook)
+def _repeated(df):
+    return drop_unused_categories(df[df["Repeated Call"] == True])
+
+
+def unique_devices(df):
+    unique_devices = df["מס' מכשיר"].nunique()
+    return [("Unique Devices", pd.DataFrame([{"Unique Devices Fixed": unique_devices}]))]
+
+
+def common_faults(df):
+    fault_counts = df["תאור קוד התקלה"].value_counts().reset_index()
+    fault_counts.columns = ["Problem", "Count"]
+    return [("Common Faults", fault_counts)]
+
+
+def model_calls(df):
+    model_counts = df['מק"ט'].value_counts().reset_index()
+    model_counts.columns = ["Model Code", "Number of Calls"]
+    return [("Model Call Counts", model_counts)]
+
+
+def problem_device(df):
+    device_counts = df["מס' מכשיר"].value_counts().reset_index()
+    device_counts.columns = ["Device Number", "Number of Calls"]
+    top_device = device_counts.iloc[0]["Device Number"]
+    top_device_data = df[df["מס' מכשיר"] == top_device][["ת. פתיחה", "תאור קוד התקלה", "תאור התיקון"]]
+    return [("Most Problematic Device", device_counts), (f"Device {top_device}", top_device_data)]
+
+
+def problem_product(df):
+    product_counts = df["תאור מוצר"].value_counts().reset_index()
+    product_counts.columns = ["Product Description", "Number of Calls"]
+    return [("Most Problematic Product", product_counts)]
+
+
+def repeat_stats(df):
+    repeated_problems = (
+        _repeated(df).groupby(["תאור מוצר", "תאור קוד התקלה"], observed=True)
+        .size()
+        .reset_index(name="Repeated Call Count")
+        .sort_values(by="Repeated Call Count", ascending=False)
+    )
+    return [("Repeated Problems", repeated_problems)]
+
+
+def tech_stats(df):
+    tech_calls = df["לטיפול"].value_counts().reset_index()
+    tech_calls.columns = ["Technician", "Number of Calls"]
+    repeated_tech = _repeated(df)[CREDITED].value_counts().reset_index()
+    repeated_tech.columns = ["Technician", "Repeated Calls"]
+    tech_stats = pd.merge(tech_calls, repeated_tech, on="Technician", how="left").fillna({"Repeated Calls": 0})
+    tech_stats["Repeated Calls"] = tech_stats["Repeated Calls"].astype(int)
+    tech_stats["% Repeated"] = round((tech_stats["Repeated Calls"] / tech_stats["Number of Calls"]) * 100, 2)
+    return [("Technician Stats", tech_stats)]
+
+
+def device_lifecycle(df):
+    repairs_per_device = df.groupby("מס' מכשיר").size().reset_index(name="Total Repairs")
+    dates = df.groupby("מס' מכשיר")["ת. פתיחה"].agg(["min", "max"]).reset_index()
+    dates.columns = ["מס' מכשיר", "First Repair", "Last Repair"]
+    lifecycle = pd.merge(repairs_per_device, dates, on="מס' מכשיר")
+    lifecycle = lifecycle[lifecycle["Total Repairs"] > 1]
+    lifecycle["Lifecycle (Days)"] = (lifecycle["Last Repair"] - lifecycle["First Repair"]).dt.days
+    return [("Device Lifecycle", lifecycle)]
+
+
+def faults_by_product(df):
+    faults_by_product = (
+        df.groupby(["תאור מוצר", "תאור קוד התקלה"], observed=True)
+        .size()
+        .reset_index(name="Fault Count")
+        .sort_values(["תאור מוצר", "Fault Count"], ascending=[True, False])
+    )
+    return [("Faults by Product", faults_by_product)]
+
+
+# Sheet order of the main workbook
+ANALYSES = {
+    "unique": unique_devices,
+    "common_faults": common_faults,
+    "model_calls": model_calls,
+    "problem_device": problem_device,
+    "problem_product": problem_product,
+    "repeat_stats": repeat_stats,
+    "tech_stats": tech_stats,
+    "device_lifecycle": device_lifecycle,
+    "faults_by_product": faults_by_product,
+}
+
+# Per-group exports: artifact -> (grouping column, download file name without extension)
+EXPORTS = {"devices": ("מס' מכשיר", "per_device"), "techs": ("לטיפול", "per_technician")}
+MAIN_NAME = "device_analysis_results"
+
+
+# 🛠 HELPER FUNCTIONS
+def export_groups(df, by, base, fmt="xlsx", streaming=False, progress=None, headers=None):
+    """A sheet per ``by`` group, as (bytes or temp file path, download file name).
+
+    Streaming writes to a temp file (xlsx in constant_memory mode), so memory
+    stays flat however many groups there are. ``headers`` (schema.original_headers)
+    gives the columns back the names they had in the uploaded file.
+    """
+    headers = headers or {}
+    df = restore_headers(df, headers)
+    report = Report().add_groups(base, df, headers.get(by, by), drop=[CREDITED])
+    output = temp_report_path(base + "_", file_extension(report, fmt)) if streaming else None
+    data = render(report, fmt, output, constant_memory=streaming or None, progress=progress)
+    return data, file_name(report, base, fmt)
+
+
+def main_report(sheets, fmt="xlsx", headers=None):
+    """The main report from (sheet name, table) pairs, as (bytes, download file name)."""
+    report = Report()
+    for sheet_name, table in sheets:
+        report.add(sheet_name, restore_headers(table, headers or {}))
+    return render(report, fmt), file_name(report, MAIN_NAME, fmt)
+
+
+def _init_worker(calls, progress_queue):
+    global _worker_calls, _worker_progress
+    _worker_calls, _worker_progress = calls, progress_queue
+
+
+def _worker_analysis(name):
+    return ANALYSES[name](_worker_calls)
+
+
+def _worker_export(artifact, fmt, streaming, headers):
+    def progress(done, total):
+        # About a hundred updates per export at most
+        if done == total or done % max(total // 100, 1) == 0:
+            _worker_progress.put((artifact, done / total))
+
+    return export_groups(_worker_calls, *EXPORTS[artifact], fmt, streaming, progress, headers)
+
+
+def _main_from(sheets, analyses, fmt, headers):
+    return main_report([sheet for name in analyses for sheet in sheets[name]], fmt, headers)
+
+
+def _run_inline(calls, analyses, exports, fmt, streaming, on_progress, headers):
+    sheets = {}
+    for name in analyses:
+        sheets[name] = ANALYSES[name](calls)
+        on_progress("main", len(sheets) / len(analyses))
+    results = {"main": _main_from(sheets, analyses, fmt, headers)}
+    for artifact in exports:
+        results[artifact] = export_groups(
+            calls, *EXPORTS[artifact], fmt, streaming,
+            lambda done, total, artifact=artifact: on_progress(artifact, done / total), headers,
+        )
+    return results
+
+
+def _run_pool(calls, analyses, exports, fmt, streaming, on_progress, headers, workers):
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    sheets, results = {}, {}
+    if not analyses:
+        results["main"] = _main_from(sheets, analyses, fmt, headers)
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(calls, progress_queue)) as pool:
+        jobs = {pool.submit(_worker_export, artifact, fmt, streaming, headers): artifact for artifact in exports}
+        jobs.update({pool.submit(_worker_analysis, name): name for name in analyses})
+        pending = set(jobs)
+        while pending:
+            finished, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            try:
+                while True:
+                    on_progress(*progress_queue.get_nowait())
+            except queue.Empty:
+                pass
+            for job in finished:
+                name = jobs[job]
+                if name in ANALYSES:
+                    sheets[name] = job.result()
+                    on_progress("main", len(sheets) / len(analyses))
+                    if len(sheets) == len(analyses):
+                        # Written here while the exports may still be running
+                        results["main"] = _main_from(sheets, analyses, fmt, headers)
+                else:
+                    results[name] = job.result()
+                    on_progress(name, 1.0)
+    return results
+
+
+# 📥 PUBLIC API
+def run_jobs(calls: pd.DataFrame, analyses, exports, fmt="xlsx", streaming=False, on_progress=None, workers=None,
+             headers=None) -> dict:
+    """Build the main report (from ``analyses``, keys of ANALYSES) and the ``exports`` as ``fmt``.
+
+    Returns {"main": (bytes, file name), artifact: (bytes or temp file path,
+    file name), ...}. ``on_progress`` is called with (artifact, fraction done)
+    as jobs advance. Runs in a process pool from PARALLEL_MIN_ROWS rows, in
+    this process otherwise (or when the pool can't start). ``headers``
+    (schema.original_headers of the upload) renames the output columns back
+    to the uploaded file's headers.
+    """
+    on_progress = on_progress or (lambda artifact, fraction: None)
+    analyses = [name for name in ANALYSES if name in set(analyses)]
+    exports = list(exports)
+    if workers is None:
+        workers = min(MAX_WORKERS, os.cpu_count() or 1, len(analyses) + len(exports))
+    if workers > 1 and len(calls) >= PARALLEL_MIN_ROWS:
+        try:
+            return _run_pool(calls, analyses, exports, fmt, streaming, on_progress, headers, workers)
+        except (BrokenProcessPool, OSError):
+            pass
+    return _run_inline(calls, analyses, exports, fmt, streaming, on_progress, headers)
@@ -0,0 +1,139 @@
+from io import BytesIO
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Pluggable spreadsheet reader used by the ingestion layer (upload_cache).
+#   "openpyxl"        - pandas' default full-load reader (the original behaviour)
+#   "openpyxl-stream" - openpyxl read-only mode, rows streamed into chunked DataFrames,
+#                       so memory stays around one chunk plus the parsed result
+#   "calamine"        - Rust-based reader (python-calamine), much faster when installed
+#   "auto"            - calamine if available, otherwise openpyxl-stream
+# The benchmark in benchmarks.py compares them on our file shapes.
+
+DEFAULT_CHUNK_ROWS = 50_000
+STREAM_OPTIONS = {"dtype", "usecols"}
+
+
+# 🛠 HELPER FUNCTIONS
+def calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+        from pandas.io.excel._base import ExcelFile
+    except ImportError:
+        return False
+    return "calamine" in getattr(ExcelFile, "_engines", {})
+
+
+def available_engines() -> list:
+    engines = ["openpyxl", "openpyxl-stream"]
+    if calamine_available():
+        engines.append("calamine")
+    return engines
+
+
+def resolve_engine(engine=None) -> str:
+    if engine in (None, "openpyxl"):
+        return "openpyxl"
+    if engine == "auto":
+        return "calamine" if calamine_available() else "openpyxl-stream"
+    if engine == "calamine" and not calamine_available():
+        return "openpyxl-stream"
+    if engine not in ("openpyxl-stream", "calamine"):
+        raise ValueError(f"Unknown Excel reader engine: {engine}")
+    return engine
+
+
+def _header_names(header_row) -> list:
+    # Same naming pandas uses: blank headers become "Unnamed: i", repeats get ".1", ".2", ...
+    names, seen = [], {}
+    for i, value in enumerate(header_row):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _cell_str(value):
+    if value is None:
+        return None
+    # Like pandas: whole-number floats are read as ints ("7", not "7.0")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _finish_chunk(rows, columns, dtype, usecols) -> pd.DataFrame:
+    if dtype is str:
+        # Stringify the raw cell values, before pandas infers numeric columns
+        df = pd.DataFrame(rows, columns=columns, dtype=object).dropna(how="all")
+        df = df.apply(lambda col: col.map(_cell_str))
+    else:
+        df = pd.DataFrame.from_records(rows, columns=columns).dropna(how="all")
+        if dtype is not None:
+            df = df.astype(dtype)
+    if usecols is not None:
+        df = df[[col for col in columns if col in usecols]]
+    return df
+
+
+# 📥 PUBLIC API
+def iter_excel_chunks(source, sheet_name=0, chunk_rows=DEFAULT_CHUNK_ROWS, engine="auto", dtype=None, usecols=None):
+    """Yield a sheet as consecutive DataFrames of at most ``chunk_rows`` rows.
+
+    The first row is the header. ``source`` is a path, bytes or a file object.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    if resolve_engine(engine) == "calamine":
+        df = pd.read_excel(source, sheet_name=sheet_name, engine="calamine", dtype=dtype, usecols=usecols)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Trailing blank header cells are just the sheet's used range, not columns
+        width = len(header)
+        while width and header[width - 1] is None:
+            width -= 1
+        columns = _header_names(header[:width])
+        while True:
+            chunk = [
+                row[:width] if len(row) >= width else row + (None,) * (width - len(row))
+                for row in islice(rows, chunk_rows)
+            ]
+            if not chunk:
+                break
+            yield _finish_chunk(chunk, columns, dtype, usecols)
+    finally:
+        workbook.close()
+
+
+def read_excel(source, sheet_name=0, engine=None, chunk_rows=DEFAULT_CHUNK_ROWS, **kwargs) -> pd.DataFrame:
+    """``pd.read_excel`` with a selectable engine (see the module notes).
+
+    The streaming engine supports ``dtype`` and ``usecols`` (column names);
+    any other pandas option falls back to the full-load openpyxl reader.
+    """
+    engine = resolve_engine(engine)
+    if engine == "openpyxl-stream" and set(kwargs) <= STREAM_OPTIONS:
+        chunks = list(iter_excel_chunks(source, sheet_name, chunk_rows, engine, **kwargs))
+        if not chunks:
+            return pd.DataFrame()
+        df = pd.concat(chunks, ignore_index=True)
+        # Columns that were empty in some chunks come back as object, re-infer them
+        return df if kwargs.get("dtype") is not None else df.infer_objects()
+    if engine == "openpyxl-stream":
+        engine = "openpyxl"
+    return pd.read_excel(source, sheet_name=sheet_name, engine=engine, **kwargs)
@@ -0,0 +1,342 @@
+import os
+import re
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# Shared Excel report writer used by every tool.
+#   - formats are created once per workbook and cached by their properties
+#   - column widths come from vectorized string lengths, on a sample for long columns
+#   - sheet names are sanitized, cut to Excel's 31 characters and de-duplicated
+#   - above CONSTANT_MEMORY_ROWS rows the workbook switches to xlsxwriter's
+#     constant_memory mode, which flushes each row to disk as soon as the next
+#     one starts (rows must then be written top to bottom, as write_frame does)
+#   - streaming exports (write_groups into a temp_report_path file) also close
+#     each finished sheet's spool file, so a workbook with thousands of sheets
+#     keeps neither their rows nor thousands of open file handles in memory.
+#     xlsxwriter has no public call for this, so finish_sheet() uses two
+#     worksheet internals; requirements.txt pins XlsxWriter to the 3.2 series
+#     they were checked against, and an xlsxwriter without them fails the
+#     export with an error saying so, not an AttributeError from inside it
+#   - Partitions split a frame into groups once (cell values and per-group
+#     widths in one pass) for reports that write a block per group, e.g. a
+#     sheet per machine, without re-filtering the frame for every group
+
+CONSTANT_MEMORY_ROWS = 200_000
+WIDTH_SAMPLE_ROWS = 5_000
+GROUP_BATCH_ROWS = 50_000
+MAX_COLUMN_WIDTH = 100
+MAX_SHEET_NAME = 31
+DATE_FORMAT = "yyyy-mm-dd hh:mm:ss"
+# Temp report files carry this prefix; ones older than STALE_REPORT_SECONDS
+# belong to sessions that ended without replacing them and are swept
+TEMP_REPORT_PREFIX = "polytex_report_"
+STALE_REPORT_SECONDS = 6 * 3600
+SWEEP_INTERVAL_SECONDS = 600
+# Same look as the header pandas writes with to_excel
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+_last_sweep = 0.0
+
+
+# 🛠 HELPER FUNCTIONS
+def _text_lengths(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Only the categories in use need measuring, not every row
+        values = pd.Series(values.cat.remove_unused_categories().cat.categories)
+    return values.astype(str).str.len()
+
+
+def column_widths(df: pd.DataFrame, padding=2, sample_rows=WIDTH_SAMPLE_ROWS, max_width=MAX_COLUMN_WIDTH) -> list:
+    """Width per column: longest value or header, plus ``padding``.
+
+    Columns longer than ``sample_rows`` are measured on a fixed random sample.
+    """
+    widths = []
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i].dropna()
+        if len(values) > sample_rows:
+            values = values.sample(sample_rows, random_state=0)
+        longest = int(_text_lengths(values).max()) if len(values) else 0
+        widths.append(min(max(longest, len(str(df.columns[i]))) + padding, max_width))
+    return widths
+
+
+def clean_sheet_name(name) -> str:
+    """Replace the characters Excel rejects in sheet names and cut to 31 characters."""
+    name = _INVALID_SHEET_CHARS.sub("_", str(name)).strip().strip("'")
+    # Cutting may leave a trailing apostrophe, which Excel rejects as well
+    return name[:MAX_SHEET_NAME].rstrip("'") or "Sheet"
+
+
+def _cell_lengths(values: pd.Series) -> np.ndarray:
+    # Text length of every cell, 0 for empty ones
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        lengths = np.append(values.cat.categories.astype(str).str.len().to_numpy(), 0)
+        return lengths[values.cat.codes.to_numpy()]  # code -1 (NaN) picks the trailing 0
+    return values.astype(str).str.len().where(values.notna(), 0).to_numpy()
+
+
+def _cell_values(df: pd.DataFrame) -> pd.DataFrame:
+    # NaN / NaT / pd.NA become empty cells
+    return df.astype(object).where(df.notna(), None)
+
+
+def group_bounds(codes, n_groups):
+    """Row order that brings each group's rows together, and where each group starts.
+
+    ``codes`` holds a group number per row (-1: no group, left out). Rows keep
+    their original order within a group; group g is ``order[bounds[g]:bounds[g + 1]]``.
+    """
+    codes = np.asarray(codes)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    return order, np.searchsorted(codes[order], np.arange(n_groups + 1))
+
+
+def temp_report_path(prefix="report_", suffix=".xlsx") -> str:
+    """Path of a new, empty temporary file; the caller removes it when done."""
+    fd, path = tempfile.mkstemp(prefix=TEMP_REPORT_PREFIX + prefix, suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def remove_stale_reports(max_age=STALE_REPORT_SECONDS) -> int:
+    """Delete temp report files older than ``max_age`` seconds; returns how many.
+
+    Streamlit reruns call this on every click, so the temp directory is
+    scanned at most once per SWEEP_INTERVAL_SECONDS.
+    """
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return 0
+    _last_sweep = now
+    removed = 0
+    for path in Path(tempfile.gettempdir()).glob(TEMP_REPORT_PREFIX + "*"):
+        try:
+            if path.stat().st_mtime < now - max_age:
+                path.unlink()
+                removed += 1
+        except OSError:  # gone already, or another user's file
+            pass
+    return removed
+
+
+def remove_report(output):
+    """Delete a report written to a temp file; in-memory reports are left alone."""
+    if isinstance(output, str) and os.path.exists(output):
+        os.remove(output)
+
+
+# 📥 PUBLIC API
+class Partitions:
+    """The rows of ``df`` split into groups once, ready to be written group by group.
+
+    ``codes`` gives each row's group (0 to n_groups - 1, -1 for none). The cell
+    conversion and the per-group column widths (as column_widths measures
+    them, unsampled) are computed for the whole frame in one pass, so writing
+    thousands of small per-group blocks costs no pandas work per group.
+    """
+
+    def __init__(self, df, codes, n_groups, padding=2):
+        self.columns = df.columns
+        self.order, self.bounds = group_bounds(codes, n_groups)
+        self.records = _cell_values(df.iloc[self.order]).to_numpy()
+        lengths = pd.DataFrame({i: _cell_lengths(df.iloc[:, i])[self.order] for i in range(df.shape[1])})
+        longest = lengths.groupby(np.asarray(codes)[self.order]).max().reindex(range(n_groups), fill_value=0)
+        headers = np.array([len(str(col)) for col in df.columns], dtype=np.int64)
+        self.padding = padding
+        self._widths = np.minimum(np.maximum(longest.to_numpy(dtype=np.int64), headers) + padding, MAX_COLUMN_WIDTH)
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def rows(self, group):
+        return self.records[self.bounds[group]:self.bounds[group + 1]]
+
+    def widths(self, group) -> list:
+        return self._widths[group].tolist()
+
+
+class ReportWriter:
+    """xlsxwriter workbook with the report helpers the tools share.
+
+    ``expected_rows`` (total rows the report will hold) turns on constant_memory
+    mode when it exceeds CONSTANT_MEMORY_ROWS. ``output`` defaults to a BytesIO,
+    a file path writes straight to disk. Use as a context manager or call close().
+    """
+
+    def __init__(self, output=None, expected_rows=0, constant_memory=None):
+        self.output = BytesIO() if output is None else output
+        if constant_memory is None:
+            constant_memory = expected_rows > CONSTANT_MEMORY_ROWS
+        self.constant_memory = constant_memory
+        self.workbook = xlsxwriter.Workbook(self.output, {
+            "constant_memory": constant_memory,
+            "default_date_format": DATE_FORMAT,
+        })
+        self.sheets = {}
+        self._formats = {}
+        self._used_names = set()
+        self._reserved = set()
+        self._widths = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def format(self, **properties):
+        """Return a cached workbook format with these properties."""
+        key = tuple(sorted(properties.items()))
+        if key not in self._formats:
+            self._formats[key] = self.workbook.add_format(properties)
+        return self._formats[key]
+
+    def sheet_name(self, name) -> str:
+        """Reserve and return a valid, unique sheet name for ``name``.
+
+        Useful when links to a sheet are written before the sheet itself.
+        """
+        base = clean_sheet_name(name)
+        candidate, n = base, 1
+        while candidate.lower() in self._used_names:
+            n += 1
+            suffix = f" ({n})"
+            candidate = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+        self._used_names.add(candidate.lower())
+        self._reserved.add(candidate)
+        return candidate
+
+    def add_sheet(self, name):
+        """Add a worksheet; ``name`` is sanitized unless it came from sheet_name()."""
+        if name in self._reserved:
+            self._reserved.discard(name)
+        else:
+            name = self.sheet_name(name)
+            self._reserved.discard(name)
+        worksheet = self.workbook.add_worksheet(name)
+        self.sheets[name] = worksheet
+        return worksheet
+
+    def fit_columns(self, worksheet, widths, first_col=0, cell_format=None):
+        """Widen columns to at least ``widths`` (never narrows what a previous block set)."""
+        current = self._widths.setdefault(worksheet.name, {})
+        for i, width in enumerate(widths, start=first_col):
+            current[i] = max(current.get(i, 0), width)
+            worksheet.set_column(i, i, current[i], cell_format)
+
+    def write_frame(self, df, sheet=None, start_row=0, title=None, header=True,
+                    autofit=True, padding=2, cell_format=None) -> int:
+        """Write ``df`` (without its index) and return the next free row.
+
+        ``sheet`` is a worksheet or a name for a new sheet. An optional bold
+        ``title`` goes on the first row; ``cell_format`` applies to the columns.
+        """
+        worksheet = sheet if hasattr(sheet, "write_row") else self.add_sheet(sheet if sheet is not None else "Sheet1")
+        widths = None
+        if autofit:
+            widths = column_widths(df, padding)
+            if title and widths:
+                widths[0] = min(max(widths[0], len(str(title)) + padding), MAX_COLUMN_WIDTH)
+        return self._write_block(worksheet, start_row, df.columns, _cell_values(df).to_numpy(),
+                                 widths, title, header, cell_format)
+
+    def write_partition(self, partitions, group, sheet=None, start_row=0, title=None, header=True,
+                        autofit=True, cell_format=None) -> int:
+        """Write one group of ``partitions`` like write_frame writes a frame; returns the next free row."""
+        worksheet = sheet if hasattr(sheet, "write_row") else self.add_sheet(sheet if sheet is not None else "Sheet1")
+        widths = None
+        if autofit:
+            widths = partitions.widths(group)
+            if title and widths:
+                widths[0] = min(max(widths[0], len(str(title)) + partitions.padding), MAX_COLUMN_WIDTH)
+        return self._write_block(worksheet, start_row, partitions.columns, partitions.rows(group),
+                                 widths, title, header, cell_format)
+
+    def _write_block(self, worksheet, row, columns, records, widths, title, header, cell_format) -> int:
+        if widths is not None:
+            self.fit_columns(worksheet, widths, cell_format=cell_format)
+        elif cell_format is not None:
+            for i in range(len(columns)):
+                worksheet.set_column(i, i, None, cell_format)
+        if title is not None:
+            worksheet.write(row, 0, title, self.format(bold=True))
+            row += 1
+        if header:
+            worksheet.write_row(row, 0, [str(col) for col in columns], self.format(**HEADER_FORMAT))
+            row += 1
+        for record in records.tolist():
+            worksheet.write_row(row, 0, record, cell_format)
+            row += 1
+        return row
+
+    def finish_sheet(self, worksheet):
+        """Flush a sheet that will get no more rows.
+
+        In constant_memory mode this writes its last row and closes its spool
+        file; xlsxwriter reopens it when the workbook is assembled. Otherwise
+        close() flushes the sheet.
+        """
+        if not self.constant_memory:
+            return
+        write_last_row = getattr(worksheet, "_write_single_row", None)
+        close_spool = getattr(worksheet, "_opt_close", None)
+        if write_last_row is None or close_spool is None:
+            raise RuntimeError(
+                f"xlsxwriter {xlsxwriter.__version__} has no Worksheet._write_single_row/_opt_close, "
+                "which streamed exports need; install the XlsxWriter version pinned in requirements.txt"
+            )
+        write_last_row()
+        close_spool()
+
+    def write_groups(self, df, by, drop=None, autofit=True, padding=2, cell_format=None, progress=None) -> int:
+        """One sheet per ``by`` group of ``df``, named after the group; returns the number of sheets.
+
+        ``drop`` lists columns to leave out; ``progress(done, total)`` is called
+        after each sheet. Column widths are measured once on
+        the whole frame, and rows are converted for writing in batches of
+        GROUP_BATCH_ROWS instead of group by group.
+        """
+        frame = df.drop(columns=drop) if drop else df
+        grouper = df.groupby(by, observed=True)
+        keys = grouper.size().index
+        codes = grouper.ngroup().to_numpy(dtype=float, na_value=-1).astype(np.int64)
+        order, bounds = group_bounds(codes, len(keys))
+        widths = column_widths(frame, padding) if autofit else None
+
+        group = 0
+        while group < len(keys):
+            # Consecutive groups up to GROUP_BATCH_ROWS rows (at least one group)
+            last = max(int(np.searchsorted(bounds, bounds[group] + GROUP_BATCH_ROWS, side="right")) - 1, group + 1)
+            batch_start = bounds[group]
+            records = _cell_values(frame.iloc[order[batch_start:bounds[last]]]).to_numpy()
+            for g in range(group, last):
+                key = keys[g]
+                worksheet = self.add_sheet("_".join(map(str, key)) if isinstance(key, tuple) else key)
+                rows = records[bounds[g] - batch_start:bounds[g + 1] - batch_start]
+                self._write_block(worksheet, 0, frame.columns, rows, widths, None, True, cell_format)
+                self.finish_sheet(worksheet)
+                if progress is not None:
+                    progress(g + 1, len(keys))
+            group = last
+        return len(keys)
+
+    def close(self) -> bytes:
+        """Finish the workbook; returns its bytes when writing to memory."""
+        if self.workbook.fileclosed:
+            return self.getvalue()
+        self.workbook.close()
+        return self.getvalue()
+
+    def getvalue(self) -> bytes:
+        return self.output.getvalue() if hasattr(self.output, "getvalue") else None
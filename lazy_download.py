@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from cache_keys import freeze_key
+from upload_cache import content_hash
+
+# Downloads built on click, not on every rerun.
+# Streamlit reruns the whole tool on every widget change, and the tools used
+# to build each workbook up front so it could be handed to download_button -
+# paid again for every selectbox change, downloaded or not. Here the button
+# gets a callable instead (Streamlit runs it only when the button is clicked),
+# and what it builds is memoized by (artifact, input hash, selection): a second
+# click, or a click after flipping a selection back, is served from memory.
+# Entries live at module level, shared by every session, evicted LRU-first.
+
+MAX_ENTRIES = 16
+MAX_BYTES = 256 * 1024 * 1024
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> bytes
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+# 🛠 HELPER FUNCTIONS
+def _get(key):
+    with _lock:
+        data = _entries.get(key)
+        if data is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return data
+
+
+def _put(key, data: bytes):
+    with _lock:
+        _entries[key] = data
+        _entries.move_to_end(key)
+        total = sum(len(d) for d in _entries.values())
+        while len(_entries) > 1 and (len(_entries) > MAX_ENTRIES or total > MAX_BYTES):
+            _, evicted = _entries.popitem(last=False)
+            total -= len(evicted)
+            _stats["evictions"] += 1
+
+
+# 📥 PUBLIC API
+def artifact_key(name: str, inputs, selection=None) -> tuple:
+    """Memo key for artifact ``name``; ``inputs`` are uploaded files (or their hashes)."""
+    if not isinstance(inputs, (list, tuple)):
+        inputs = [inputs]
+    hashes = tuple(i if isinstance(i, str) else content_hash(i) for i in inputs)
+    return (name, hashes, freeze_key(selection))
+
+
+def build_artifact(key, build) -> bytes:
+    """``build()``'s bytes, built at most once per ``key`` while it stays cached."""
+    data = _get(key)
+    if data is None:
+        data = build()
+        _put(key, data)
+    return data
+
+
+def lazy_download_button(label, key, build, file_name, mime=None, **kwargs):
+    """``st.download_button`` whose data is ``build()``, run only when the button is clicked."""
+    return st.download_button(label, data=lambda: build_artifact(key, build), file_name=file_name, mime=mime, **kwargs)
+
+
+def cache_stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "Entries": len(_entries),
+            "Size (MB)": round(sum(len(d) for d in _entries.values()) / (1024 * 1024), 1),
+            "Hits": _stats["hits"],
+            "Misses": _stats["misses"],
+            "Evictions": _stats["evictions"],
+            "Hit Rate (%)": round(_stats["hits"] / lookups * 100, 2) if lookups else 0,
+        }
+
+
+def clear_cache():
+    with _lock:
+        _entries.clear()
+        for k in _stats:
+            _stats[k] = 0
@@ -1,25 +1,142 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from call_join import CallJoin, call_join
+from excel_writer import Partitions, ReportWriter
+from upload_cache import read_excel_cached
+
+# A sheet per machine, built from partitions computed once.
+# The calls are split by machine in a single pass and the call types, fault
+# details and replaced parts of every machine come from one grouped
+# aggregation each (parts reach their machine through the shared call_join),
+# so the report takes time linear in the data instead of re-filtering all
+# calls and parts for each of thousands of machines.
+
+MACHINE = "מס' מכשיר"
+CALL = "מס. קריאה"
+SITE = "תאור האתר"
+FAULT_COLUMNS = [CALL, "תאור תקלה", "תאור קוד פעולה"]
+PART_KEYS = ['מק"ט - חלק', 'תאור מוצר - חלק']
+
 
 # 🛠 HELPER FUNCTIONS
-def autofit_columns(worksheet, dataframe, padding=5):
-    for i, col in enumerate(dataframe.columns):
-        try:
-            max_length = max(
-                dataframe[col].astype(str).map(len).max(),
-                len(str(col))
-            )
-            worksheet.set_column(i, i, max_length + padding)
-        except Exception:
-            pass
+def machine_summary(calls_df: pd.DataFrame) -> pd.DataFrame:
+    """Calls and most frequent site per machine, busiest machines first."""
+    # Ties go to the first site in sort order, as with Series.mode().iloc[0]
+    site_counts = calls_df.groupby([MACHINE, SITE], observed=True).size().reset_index(name="Count")
+    top_sites = (
+        site_counts.sort_values([MACHINE, "Count", SITE], ascending=[True, False, True], kind="stable")
+        .drop_duplicates(MACHINE)
+        .set_index(MACHINE)[SITE]
+    )
+    summary = calls_df.groupby(MACHINE).size().reset_index(name="Total_Calls")
+    summary["Site_Name"] = summary[MACHINE].map(top_sites).astype(object).fillna("Unknown Site")
+    return summary.sort_values(by="Total_Calls", ascending=False)
+
+
+def _call_types(calls_df, codes, n_machines):
+    # Call type counts per machine, most frequent first, ties in order of appearance (as value_counts)
+    types = pd.DataFrame({
+        "machine": codes,
+        "Call Type": calls_df["סוג קריאה"].astype(object).fillna("Not Defined").to_numpy(),
+    })
+    counts = (
+        types[types["machine"] >= 0].groupby(["machine", "Call Type"], sort=False).size().reset_index(name="Count")
+        .sort_values(["machine", "Count"], ascending=[True, False], kind="stable")
+    )
+    return Partitions(counts[["Call Type", "Count"]], counts["machine"].to_numpy(), n_machines)
+
+
+def _fault_details(calls_df, codes, n_machines):
+    columns = [col for col in FAULT_COLUMNS if col in calls_df.columns]
+    if not columns:
+        empty = pd.DataFrame(columns=["Call Number", "תאור תקלה", "תאור קוד פעולה"])
+        return Partitions(empty, [], n_machines, padding=5)
+    # First occurrence of each distinct row per machine, in file order
+    details = calls_df[columns].assign(machine=codes)
+    details = details[details["machine"] >= 0].drop_duplicates()
+    details = details.rename(columns={CALL: "Call Number"})
+    return Partitions(details.drop(columns="machine"), details["machine"].to_numpy(), n_machines, padding=5)
+
+
+def _parts_replaced(calls_df, parts_df, codes, n_machines, join):
+    used = parts_df.index[parts_df['כמות בפועל'] > 0]
+    call_positions, part_rows = join.parts_of_calls(calls_df.index, used)
+    # Each part row once per machine, however many of the machine's calls share its call number
+    pairs = pd.DataFrame({"machine": codes[call_positions], "row": part_rows})
+    pairs = pairs[pairs["machine"] >= 0].drop_duplicates()
+    parts = (
+        parts_df.loc[pairs["row"], PART_KEYS + ['כמות בפועל']].assign(machine=pairs["machine"].to_numpy())
+        .groupby(["machine"] + PART_KEYS, observed=True)['כמות בפועל'].sum()
+        .reset_index()
+    )
+    parts.columns = ["machine", "Part Number", "Part Description", "Total Quantity"]
+    return Partitions(parts.drop(columns="machine"), parts["machine"].to_numpy(), n_machines, padding=5)
+
+
+# 📥 PUBLIC API
+def build_report(calls_df: pd.DataFrame, parts_df: pd.DataFrame, join: CallJoin = None) -> bytes:
+    """The machines workbook: a linked Summary sheet and a sheet per machine.
+
+    ``join`` is the files' cached call_join (rows as read); without it one is
+    built for these frames.
+    """
+    if join is None:
+        calls_df, parts_df = calls_df.reset_index(drop=True), parts_df.reset_index(drop=True)
+        join = CallJoin(calls_df[CALL], parts_df[CALL])
+    summary_with_site = machine_summary(calls_df)
+    machines = summary_with_site[MACHINE].tolist()
+    # Row -> position of its machine in the summary (-1: no machine number)
+    codes = pd.Index(summary_with_site[MACHINE]).get_indexer(calls_df[MACHINE])
+    call_types = _call_types(calls_df, codes, len(machines))
+    faults = _fault_details(calls_df, codes, len(machines))
+    parts = _parts_replaced(calls_df, parts_df, codes, len(machines), join)
+
+    with ReportWriter(expected_rows=len(calls_df) + len(parts_df)) as writer:
+        summary_sheet = writer.add_sheet('Summary')
+
+        bold_format = writer.format(bold=True)
+        # Tab names are reserved up front so the links below point at the final names
+        tab_names = [writer.sheet_name(f"Machine_{str(machine).split('.')[0]}") for machine in machines]
+
+        headers = ['Machine ID', 'Total Calls', 'Site Name']
+        for col_num, header in enumerate(headers):
+            summary_sheet.write(0, col_num, header, bold_format)
+
+        for row_num, (machine, total_calls, site_name, tab_name) in enumerate(zip(
+            machines, summary_with_site['Total_Calls'].tolist(), summary_with_site['Site_Name'].tolist(), tab_names
+        ), start=1):
+            link = f"internal:'{tab_name}'!A1"
+            summary_sheet.write_url(row_num, 0, link, string=str(machine).split('.')[0])
+            summary_sheet.write(row_num, 1, total_calls)
+            summary_sheet.write(row_num, 2, site_name)
+
+        for col_num, header in enumerate(headers):
+            if header == 'Site Name':
+                summary_sheet.set_column(col_num, col_num, len(header) + 30)
+            else:
+                summary_sheet.set_column(col_num, col_num, len(header) + 10)
+
+        for g, site_name in enumerate(summary_with_site['Site_Name'].tolist()):
+            worksheet = writer.add_sheet(tab_names[g])
+
+            worksheet.write_url('A1', "internal:'Summary'!A1", string="🖙 Back to Summary", cell_format=bold_format)
+            worksheet.write('A3', 'Site:', bold_format)
+            worksheet.write('B3', site_name, bold_format)
+            worksheet.write('A5', 'Call Types and Counts:', bold_format)
+
+            machine_types = call_types.rows(g)
+            for idx, (ct, count) in enumerate(machine_types):
+                worksheet.write(6 + idx, 0, ct)
+                worksheet.write(6 + idx, 1, count)
+
+            start_row = len(machine_types) + 8
+
+            start_row = writer.write_partition(faults, g, worksheet, start_row, title='Fault Description, Action, and Call Number:') + 1
+            start_row = writer.write_partition(parts, g, worksheet, start_row, title='Spare Parts Replaced (Actual Quantity):') + 1
+            writer.finish_sheet(worksheet)
+    return writer.getvalue()
 
-def write_simple_table(worksheet, start_row, title, dataframe, writer):
-    bold_format = writer.book.add_format({'bold': True})
-    worksheet.write(start_row, 0, title, bold_format)
-    dataframe.to_excel(writer, sheet_name=worksheet.name, startrow=start_row + 1, index=False)
-    autofit_columns(worksheet, dataframe)
-    return start_row + len(dataframe) + 3
 
 # 💻 MAIN APP
 def run_app():
@@ -30,8 +147,8 @@ def run_app():
     parts_file = st.file_uploader("Upload Spare Parts File", type=['xlsx'])
 
     if calls_file and parts_file:
-        calls_df = pd.read_excel(calls_file)
-        parts_df = pd.read_excel(parts_file)
+        calls_df = read_excel_cached(calls_file, schema=True)
+        parts_df = read_excel_cached(parts_file, schema=True)
 
         calls_df['ת. פתיחה'] = pd.to_datetime(calls_df['ת. פתיחה'], errors='coerce', dayfirst=True)
 
@@ -58,84 +175,7 @@ def run_app():
             return
 
         if st.button("📊 Generate Report"):
-            output = BytesIO()
-            writer = pd.ExcelWriter(output, engine='xlsxwriter')
-            workbook = writer.book
-
-            summary_with_site = calls_df.groupby("מס' מכשיר").agg(
-                Total_Calls=("מס' מכשיר", 'size'),
-                Site_Name=('תאור האתר', lambda x: x.mode().iloc[0] if not x.mode().empty else 'Unknown Site')
-            ).reset_index().sort_values(by='Total_Calls', ascending=False)
-
-            summary_sheet = workbook.add_worksheet('Summary')
-            writer.sheets['Summary'] = summary_sheet
-
-            bold_format = workbook.add_format({'bold': True})
-
-            headers = ['Machine ID', 'Total Calls', 'Site Name']
-            for col_num, header in enumerate(headers):
-                summary_sheet.write(0, col_num, header, bold_format)
-
-            for row_num, (index, row) in enumerate(summary_with_site.iterrows(), start=1):
-                machine_id = str(row["מס' מכשיר"]).split('.')[0]
-                total_calls = row['Total_Calls']
-                site_name = row['Site_Name']
-                tab_name = f"Machine_{machine_id}"
-                link = f"internal:'{tab_name}'!A1"
-                summary_sheet.write_url(row_num, 0, link, string=machine_id)
-                summary_sheet.write(row_num, 1, total_calls)
-                summary_sheet.write(row_num, 2, site_name)
-
-            for col_num, header in enumerate(headers):
-                if header == 'Site Name':
-                    summary_sheet.set_column(col_num, col_num, len(header) + 30)
-                else:
-                    summary_sheet.set_column(col_num, col_num, len(header) + 10)
-
-            for original_machine_id in summary_with_site["מס' מכשיר"]:
-                machine_id = str(original_machine_id).split('.')[0]
-                machine_calls = calls_df[calls_df["מס' מכשיר"] == original_machine_id]
-                site_name = summary_with_site[summary_with_site["מס' מכשיר"] == original_machine_id]['Site_Name'].iloc[0]
-                call_types = machine_calls['סוג קריאה'].fillna('Not Defined').value_counts().reset_index()
-                call_types.columns = ['Call Type', 'Count']
-
-                expected_columns = ["מס' קריאה", 'תאור תקלה', 'תאור קוד פעולה']
-                available_columns = [col for col in expected_columns if col in machine_calls.columns]
-
-                if available_columns:
-                    fault_action_details = machine_calls[available_columns].drop_duplicates()
-                    if "מס' קריאה" in fault_action_details.columns:
-                        fault_action_details.rename(columns={"מס' קריאה": 'Call Number'}, inplace=True)
-                else:
-                    fault_action_details = pd.DataFrame(columns=['Call Number', 'תאור תקלה', 'תאור קוד פעולה'])
-
-                relevant_parts = parts_df[
-                    (parts_df['מספר קריאה'].isin(machine_calls["מס' קריאה"])) &
-                    (parts_df['כמות בפועל'] > 0)
-                ]
-                parts_replaced = relevant_parts.groupby(['מק"ט - חלק', 'תאור מוצר - חלק']).agg({'כמות בפועל': 'sum'}).reset_index()
-                parts_replaced.columns = ['Part Number', 'Part Description', 'Total Quantity']
-
-                tab_name = f"Machine_{machine_id}"
-                worksheet = workbook.add_worksheet(tab_name)
-                writer.sheets[tab_name] = worksheet
-
-                worksheet.write_url('A1', "internal:'Summary'!A1", string="🖙 Back to Summary", cell_format=bold_format)
-                worksheet.write('A3', 'Site:', bold_format)
-                worksheet.write('B3', site_name, bold_format)
-                worksheet.write('A5', 'Call Types and Counts:', bold_format)
-
-                for idx, (ct, count) in enumerate(call_types.values):
-                    worksheet.write(6 + idx, 0, ct)
-                    worksheet.write(6 + idx, 1, count)
-
-                start_row = len(call_types) + 8
-
-                start_row = write_simple_table(worksheet, start_row, 'Fault Description, Action, and Call Number:', fault_action_details, writer)
-                start_row = write_simple_table(worksheet, start_row, 'Spare Parts Replaced (Actual Quantity):', parts_replaced, writer)
-
-            writer.close()
-            output.seek(0)
+            output = BytesIO(build_report(calls_df, parts_df, call_join(calls_file, parts_file)))
 
             st.download_button(
                 label="💅 Download Final Report",
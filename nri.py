@@ -2,36 +2,32 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime, timedelta
+from excel_reader import iter_excel_chunks
+from lazy_download import artifact_key, lazy_download_button
+from report_output import FORMATS, Report, available_formats, file_name, mime_type, render
+from schema import normalize_frame
+from upload_cache import content_hash, file_bytes, read_excel_cached, read_csv_cached
+
+STREAM_CHUNK_ROWS = 100_000
 
 
 def normalize_columns(df):
-    column_map = {
-        # Common mappings across xlsx/csv
-        "Created Date": "CreatedDate",
-        "CreatedDate": "CreatedDate",
-        "Card ID": "CardId",
-        "CardId": "CardId",
-        "RFID Tag": "RFID",
-        "RFID": "RFID",
-        "Transaction Type ID": "TransactionType",
-        "TransactionInfoTypeName": "TransactionType",
-        "User Full Name": "UserName",
-        "UserName": "UserName",
-        "Item Type Name": "ItemTypeName",
-        "ItemTypeName": "ItemTypeName",
-        "Item Sub Type Name": "ItemSubTypeName",
-        "ItemSubTypeName": "ItemSubTypeName"
-    }
-    df = df.rename(columns={col: column_map.get(col, col) for col in df.columns})
-    return df
+    # Aliases (xlsx vs csv headers) and dtypes come from the shared schema registry
+    return normalize_frame(df)
 
 
-def get_unreturned_items(df: pd.DataFrame, days: int) -> pd.DataFrame:
+def _prepare_transactions(df: pd.DataFrame) -> pd.DataFrame:
     df = normalize_columns(df)
     df["CreatedDate"] = pd.to_datetime(df["CreatedDate"], errors="coerce")
-    df = df.dropna(subset=["CreatedDate", "RFID", "TransactionType"])
+    return df.dropna(subset=["CreatedDate", "RFID", "TransactionType"])
+
 
-    latest = df.sort_values("CreatedDate").groupby("RFID", as_index=False).last()
+def _keep_latest(df: pd.DataFrame) -> pd.DataFrame:
+    # Stable sort, so on equal timestamps the row that came later in the file wins
+    return df.sort_values("CreatedDate", kind="stable").drop_duplicates("RFID", keep="last")
+
+
+def _filter_unreturned(latest: pd.DataFrame, days: int) -> pd.DataFrame:
     cutoff = pd.Timestamp.now() - pd.Timedelta(days=days)
 
     # Treat 'Delivery' as 'Dispense'
@@ -39,7 +35,35 @@ def get_unreturned_items(df: pd.DataFrame, days: int) -> pd.DataFrame:
         (latest["TransactionType"].str.lower() == "delivery") &
         (latest["CreatedDate"] < cutoff)
     ]
-    return unreturned
+    return unreturned.sort_values("RFID", kind="stable", ignore_index=True)
+
+
+def get_unreturned_items(df: pd.DataFrame, days: int) -> pd.DataFrame:
+    # The whole latest row per tag, as in streaming mode (groupby().last() would
+    # fill its empty cells from older transactions)
+    return _filter_unreturned(_keep_latest(_prepare_transactions(df)), days)
+
+
+def latest_transactions_streaming(chunks) -> pd.DataFrame:
+    """Reduce transaction chunks to the latest transaction per RFID.
+
+    Only the running per-tag state is kept between chunks, so peak memory is
+    proportional to the number of distinct tags, not to the number of rows.
+    """
+    latest = None
+    for chunk in chunks:
+        chunk_latest = _keep_latest(_prepare_transactions(chunk))
+        latest = chunk_latest if latest is None else _keep_latest(pd.concat([latest, chunk_latest], ignore_index=True))
+    if latest is None:
+        return pd.DataFrame(columns=["RFID", "CreatedDate", "TransactionType"])
+    return latest
+
+
+def _transaction_chunks(uploaded_file):
+    data = file_bytes(uploaded_file)
+    if uploaded_file.name.endswith(".csv"):
+        return pd.read_csv(io.BytesIO(data), dtype=str, chunksize=STREAM_CHUNK_ROWS)
+    return iter_excel_chunks(data, chunk_rows=STREAM_CHUNK_ROWS, engine="openpyxl-stream", dtype=str)
 
 
 def run_app():
@@ -58,38 +82,44 @@ def run_app():
     if option == "Custom":
         days = st.number_input("Enter custom number of days:", min_value=1, max_value=365, value=30)
 
+    streaming = st.checkbox(
+        "⚡ Streaming mode (low memory, for year-long exports)",
+        help="Reads the file in chunks and keeps only the latest transaction per RFID."
+    )
+    output_format = st.selectbox("Output format", available_formats(), format_func=FORMATS.get)
+
     if uploaded_file:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file, dtype=str)
+        if streaming:
+            # The per-tag state doesn't depend on the timeframe, so keep it across reruns
+            file_key = content_hash(uploaded_file)
+            cached = st.session_state.get("nri_latest")
+            if cached is None or cached[0] != file_key:
+                with st.spinner("Streaming transactions..."):
+                    cached = (file_key, latest_transactions_streaming(_transaction_chunks(uploaded_file)))
+                st.session_state["nri_latest"] = cached
+            unreturned = _filter_unreturned(cached[1], days)
         else:
-            df = pd.read_excel(uploaded_file, dtype=str)
+            if uploaded_file.name.endswith(".csv"):
+                df = read_csv_cached(uploaded_file, schema=True, dtype=str)
+            else:
+                df = read_excel_cached(uploaded_file, schema=True, dtype=str, engine="auto")
 
-        unreturned = get_unreturned_items(df, days)
+            unreturned = get_unreturned_items(df, days)
 
-        summary = unreturned.groupby(["ItemTypeName", "ItemSubTypeName"], dropna=False).size().reset_index(name="Count")
+        summary = unreturned.groupby(["ItemTypeName", "ItemSubTypeName"], dropna=False, observed=True).size().reset_index(name="Count")
         summary.loc[:, "Analysis Period"] = f"> {days} days"
 
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            # Save unreturned sheet with selected columns
-            cols_to_include = [col for col in [
-                "RFID", "CardId", "UserName", "ItemTypeName", "ItemSubTypeName", "CreatedDate", "TransactionType"
-            ] if col in unreturned.columns]
-            unreturned[cols_to_include].to_excel(writer, sheet_name="Unreturned", index=False)
-            summary.to_excel(writer, sheet_name="Summary", index=False)
-
-            # Auto-fit columns
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                df_to_use = unreturned[cols_to_include] if sheet_name == "Unreturned" else summary
-                for idx, col in enumerate(df_to_use.columns):
-                    max_len = max([len(str(x)) for x in df_to_use[col].astype(str).values] + [len(col)]) + 2
-                    worksheet.set_column(idx, idx, max_len)
+        # Unreturned sheet with selected columns
+        cols_to_include = [col for col in [
+            "RFID", "CardId", "UserName", "ItemTypeName", "ItemSubTypeName", "CreatedDate", "TransactionType"
+        ] if col in unreturned.columns]
+        report = Report().add("Unreturned", unreturned[cols_to_include]).add("Summary", summary)
 
         st.success(f"✅ Found {len(unreturned)} unreturned items older than {days} days.")
-        st.download_button(
-            label="📥 Download Unreturned Report",
-            data=output.getvalue(),
-            file_name="Unreturned_Report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        # The cutoff moves with the clock, so today's date is part of the selection
+        selection = (days, output_format, pd.Timestamp.now().date())
+        lazy_download_button(
+            "📥 Download Unreturned Report", artifact_key("unreturned", uploaded_file, selection),
+            lambda: render(report, output_format), file_name=file_name(report, "Unreturned_Report", output_format),
+            mime=mime_type(report, output_format)
         )
@@ -1,6 +1,44 @@
 import streamlit as st
 import pandas as pd
-from io import BytesIO
+from call_join import call_join
+from report_output import FORMATS, Report, available_formats, file_name, mime_type, render
+from upload_cache import read_excel_cached
+
+PART_KEYS = ['Part Number', 'Part Description']
+SITES_SHEET = "Parts by Site"
+PIVOT_SHEET = "Site x Part Pivot"
+
+def site_summaries(merged_df, sites):
+    """Parts used per site in ``sites``, from one grouped aggregation.
+
+    Sites come in ``sites`` order (as categories of 'Site Name'), each one's
+    most used parts first; equal quantities keep part number order.
+    """
+    selected = merged_df[merged_df['Site Name'].isin(sites)]
+    summary = (
+        selected.groupby(['Site Name'] + PART_KEYS, observed=True)['Quantity Used'].sum()
+        .reset_index()
+    )
+    summary['Site Name'] = pd.Categorical(summary['Site Name'], categories=list(sites))
+    return summary.sort_values(['Site Name', 'Quantity Used'], ascending=[True, False], kind='stable', ignore_index=True)
+
+def site_part_pivot(summary, sites):
+    """Quantity per part (rows) and site (columns), with a total, most used parts first."""
+    pivot = summary.pivot_table(
+        index=PART_KEYS, columns='Site Name', values='Quantity Used', aggfunc='sum', fill_value=0, observed=True
+    )
+    pivot = pivot.reindex(columns=list(sites), fill_value=0)
+    pivot.columns = [str(site) for site in pivot.columns]
+    pivot['Total'] = pivot.sum(axis=1)
+    return pivot.sort_values('Total', ascending=False, kind='stable').reset_index()
+
+def build_report(merged_df, sites, pivot=False):
+    """A sheet per site (in ``sites`` order), split from one summary, plus the pivot sheet if asked for."""
+    summary = site_summaries(merged_df, sites)
+    report = Report().add_groups(SITES_SHEET, summary, 'Site Name', drop=['Site Name'])
+    if pivot:
+        report.add(PIVOT_SHEET, site_part_pivot(summary, sites))
+    return report
 
 def run_app():
     st.title("📦 Spare Parts Report by Site")
@@ -11,20 +49,17 @@ def run_app():
     calls_file = st.file_uploader("📄 Upload Service Calls Report", type=["xlsx"])
 
     if parts_file and calls_file:
-        parts_df = pd.read_excel(parts_file)
-        calls_df = pd.read_excel(calls_file)
-
-        # Merge based on Service Call Number
-        merged_df = parts_df.merge(
-            calls_df[['מס. קריאה', 'תאור האתר']],
-            left_on='מספר קריאה',
-            right_on='מס. קריאה',
-            how='left'
+        parts_df = read_excel_cached(parts_file, schema=True)
+        calls_df = read_excel_cached(calls_file, schema=True)
+
+        # Site per part row through the shared, cached calls <-> parts join on the call number
+        merged_df = call_join(calls_file, parts_file).merge_parts(
+            parts_df, calls_df[['מס. קריאה', 'תאור האתר']], how='left'
         )
 
         # Clean and rename columns
         merged_df = merged_df.rename(columns={
-            'מספר קריאה': 'Service Call Number',
+            'מס. קריאה': 'Service Call Number',
             'תאור האתר': 'Site Name',
             'מק"ט - חלק': 'Part Number',
             'תאור מוצר - חלק': 'Part Description',
@@ -47,34 +82,19 @@ def run_app():
 
         st.caption(f"✅ {len(selected_sites)} site(s) selected")
 
+        output_format = st.selectbox("Output format", available_formats(), format_func=FORMATS.get)
+        add_pivot = st.checkbox("Add a site × part pivot sheet", value=False)
+
         # Report generation
         if selected_sites and st.button("📊 Create Report"):
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                for site in selected_sites:
-                    site_df = merged_df[merged_df['Site Name'] == site]
-                    summary_df = site_df.groupby(
-                        ['Part Number', 'Part Description'], as_index=False
-                    )['Quantity Used'].sum().sort_values(by='Quantity Used', ascending=False)
-
-                    sheet_name = site[:31]
-                    summary_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-                    # Auto-adjust column widths
-                    worksheet = writer.sheets[sheet_name]
-                    for idx, col in enumerate(summary_df.columns):
-                        max_len = max(
-                            summary_df[col].astype(str).map(len).max(),
-                            len(str(col))
-                        ) + 1
-                        worksheet.set_column(idx, idx, max_len)
+            report = build_report(merged_df, selected_sites, pivot=add_pivot)
 
             st.success("✅ Report created. Click below to download.")
             st.download_button(
                 label="📥 Download Excel Report",
-                data=output.getvalue(),
-                file_name="Spare_Parts_By_Site_Report.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                data=render(report, output_format),
+                file_name=file_name(report, "Spare_Parts_By_Site_Report", output_format),
+                mime=mime_type(report, output_format)
             )
 
 if __name__ == "__main__":
@@ -5,6 +5,9 @@ from io import BytesIO
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
+from excel_writer import ReportWriter
+from lazy_download import artifact_key, lazy_download_button
+from upload_cache import content_hash, read_excel_cached
 
 def run_app():
 
@@ -20,7 +23,8 @@ def run_app():
     uploaded_file = st.file_uploader("📤 Upload Spare Parts Excel File", type=["xlsx"])
     if uploaded_file:
         try:
-            df = pd.read_excel(uploaded_file, sheet_name="DataSheet")
+            df = read_excel_cached(uploaded_file, sheet_name="DataSheet", schema=True)
+            file_hash = content_hash(uploaded_file)
             st.success("✅ File loaded successfully.")
 
             def map_unit_category(row):
@@ -49,7 +53,7 @@ def run_app():
 
             st.header("📦 Used Spare Parts Summary")
             parts_summary = (
-                df.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'])['כמות בפועל']
+                df.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'], observed=True)['כמות בפועל']
                 .sum()
                 .reset_index(name="Total Used")
                 .sort_values(by="Total Used", ascending=False)
@@ -60,53 +64,64 @@ def run_app():
             system_options = ["All"] + sorted(df['סוג מערכת'].dropna().unique())
             selected_system = st.selectbox("Select System Type", options=system_options)
 
-            towrite_sys = BytesIO()
-            with pd.ExcelWriter(towrite_sys, engine="xlsxwriter") as writer:
-                if selected_system == "All":
-                    for sys, group in df.groupby('סוג מערכת'):
+            def build_system_summary():
+                towrite_sys = BytesIO()
+                with ReportWriter(towrite_sys) as writer:
+                    if selected_system == "All":
+                        for sys, group in df.groupby('סוג מערכת'):
+                            summary = (
+                                group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'], observed=True)['כמות בפועל']
+                                .sum()
+                                .reset_index(name="Total Used")
+                            )
+                            writer.write_frame(summary, str(sys))
+                    else:
+                        group = df[df['סוג מערכת'] == selected_system]
                         summary = (
-                            group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'])['כמות בפועל']
+                            group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'], observed=True)['כמות בפועל']
                             .sum()
                             .reset_index(name="Total Used")
                         )
-                        summary.to_excel(writer, sheet_name=str(sys)[:31], index=False)
-                else:
-                    group = df[df['סוג מערכת'] == selected_system]
-                    summary = (
-                        group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'])['כמות בפועל']
-                        .sum()
-                        .reset_index(name="Total Used")
-                    )
-                    summary.to_excel(writer, sheet_name=str(selected_system)[:31], index=False)
-            towrite_sys.seek(0)
-            st.download_button("📥 Download System Summary", data=towrite_sys, file_name="parts_by_system.xlsx")
+                        writer.write_frame(summary, str(selected_system))
+                return towrite_sys.getvalue()
+
+            # Built only when downloaded, once per file and selection
+            lazy_download_button(
+                "📥 Download System Summary", artifact_key("parts_by_system", file_hash, selected_system),
+                build_system_summary, file_name="parts_by_system.xlsx"
+            )
 
             st.header("👨‍🔧 Export Parts by Technician")
             tech_options = ["All"] + sorted(df['לטיפול'].dropna().unique())
             selected_tech = st.selectbox("Select Technician", options=tech_options)
 
-            towrite_tech = BytesIO()
-            with pd.ExcelWriter(towrite_tech, engine="xlsxwriter") as writer:
-                if selected_tech == "All":
-                    for tech, group in df.groupby('לטיפול'):
+            def build_technician_summary():
+                towrite_tech = BytesIO()
+                with ReportWriter(towrite_tech) as writer:
+                    if selected_tech == "All":
+                        for tech, group in df.groupby('לטיפול', observed=True):
+                            group = group[group['כמות בפועל'] > 0]
+                            summary = (
+                                group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'], observed=True)['כמות בפועל']
+                                .sum()
+                                .reset_index(name="Total Used")
+                            )
+                            writer.write_frame(summary, str(tech))
+                    else:
+                        group = df[df['לטיפול'] == selected_tech]
                         group = group[group['כמות בפועל'] > 0]
                         summary = (
-                            group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'])['כמות בפועל']
+                            group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'], observed=True)['כמות בפועל']
                             .sum()
                             .reset_index(name="Total Used")
                         )
-                        summary.to_excel(writer, sheet_name=str(tech)[:31], index=False)
-                else:
-                    group = df[df['לטיפול'] == selected_tech]
-                    group = group[group['כמות בפועל'] > 0]
-                    summary = (
-                        group.groupby(['מק"ט - חלק', 'תאור מוצר - חלק'])['כמות בפועל']
-                        .sum()
-                        .reset_index(name="Total Used")
-                    )
-                    summary.to_excel(writer, sheet_name=str(selected_tech)[:31], index=False)
-            towrite_tech.seek(0)
-            st.download_button("📥 Download Technician Summary", data=towrite_tech, file_name="parts_by_technician.xlsx")
+                        writer.write_frame(summary, str(selected_tech))
+                return towrite_tech.getvalue()
+
+            lazy_download_button(
+                "📥 Download Technician Summary", artifact_key("parts_by_technician", file_hash, selected_tech),
+                build_technician_summary, file_name="parts_by_technician.xlsx"
+            )
 
         except Exception as e:
             st.error(f"❌ Failed to process file: {e}")
@@ -4,6 +4,9 @@ from pathlib import Path
 from streamlit_sortables import sort_items
 from google.oauth2 import service_account
 from google.cloud import firestore
+from upload_cache import cache_stats, clear_cache
+import lazy_download
+from columnar_store import clear_store, store_entries, store_usage
 
 st.set_page_config(page_title="Polytex Service Tools", page_icon="politex.ico", layout="centered")
 
@@ -125,6 +128,25 @@ if st.session_state.admin:
         save_config(st.session_state.tool_config)
         st.success("✅ Settings saved to Firestore!")
 
+    st.subheader("📦 Upload Cache")
+    st.dataframe([cache_stats()], hide_index=True)
+    if st.button("🧹 Clear Upload Cache"):
+        clear_cache()
+        st.success("✅ Upload cache cleared!")
+
+    st.subheader("📥 Download Cache")
+    st.dataframe([lazy_download.cache_stats()], hide_index=True)
+    if st.button("🧹 Clear Download Cache"):
+        lazy_download.clear_cache()
+        st.success("✅ Download cache cleared!")
+
+    st.subheader("🗄️ Columnar Store")
+    st.dataframe([store_usage()], hide_index=True)
+    st.dataframe(store_entries(), hide_index=True)
+    if st.button("🧹 Clear Columnar Store"):
+        clear_store()
+        st.success("✅ Columnar store cleared!")
+
 # ===============================
 # 🔧 Logo & Title
 # ===============================
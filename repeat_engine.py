@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Vectorized repeat-call engine shared by repeated_calls, app_final_built_clean
+# and device_fixes_app.
+# A call is a repeat when the previous call on the same device was opened at
+# most ``w`` days earlier; several windows are evaluated in the same pass.
+# Calls are ordered by (device, open date) with a stable sort, so ties keep
+# their file order. Calls without a device number are counted but never paired.
+# Options, the same in every tool:
+#   windows     - repeat windows in days
+#   call_types  - only consider calls of these types ('סוג קריאה'), e.g. ['ביקור טכני']
+#   attribution - "first": the repeat is credited to the technician of the first call,
+#                 "repeat": to the technician of the repeat call
+# Results are memoized per (content of the calls, options), because Streamlit
+# reruns the tools on every click.
+
+CALL = "מס. קריאה"
+DEVICE = "מס' מכשיר"
+OPENED = "ת. פתיחה"
+TECHNICIAN = "לטיפול"
+FAULT = "תאור תקלה"
+ACTION = "תאור קוד פעולה"
+CALL_TYPE = "סוג קריאה"
+
+FIRST_CALL = "קריאה ראשונה"
+REPEAT_CALL = "קריאה חוזרת"
+PAIR_COLUMNS = [
+    FIRST_CALL,
+    f"{FAULT} (קריאה ראשונה)",
+    f"{ACTION} (קריאה ראשונה)",
+    REPEAT_CALL,
+    f"{FAULT} (קריאה חוזרת)",
+    f"{ACTION} (קריאה חוזרת)",
+    DEVICE,
+]
+
+PREVIOUS_DATE = "Previous Call Date"
+DAYS_SINCE = "Days Since Last Call"
+CREDITED = "Credited Technician"
+
+DEFAULT_WINDOWS = (7, 14, 30, 60, 90)
+ATTRIBUTIONS = {"first": "Technician of the first call", "repeat": "Technician of the repeat call"}
+DAY_SECONDS = 24 * 3600
+MAX_CACHED = 8
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (kind, fingerprint, options) -> DataFrame
+
+
+def window_label(days: int) -> str:
+    return f"תוך {days} ימים"
+
+
+# 🛠 HELPER FUNCTIONS
+def filter_call_types(calls: pd.DataFrame, call_types=None) -> pd.DataFrame:
+    if not call_types:
+        return calls
+    return calls[calls[CALL_TYPE].isin(list(call_types))]
+
+
+def sort_calls(calls: pd.DataFrame) -> pd.DataFrame:
+    calls = calls.copy()
+    calls[OPENED] = pd.to_datetime(calls[OPENED], errors="coerce")
+    return calls.sort_values([DEVICE, OPENED], kind="stable")
+
+
+def prior_call_counts(ordered: pd.DataFrame, windows) -> dict:
+    """For each window, how many earlier calls on the same device fall within it.
+
+    ``ordered`` comes from sort_calls. All windows are answered from one sorted
+    key array with binary searches: the key is (device code, seconds since the
+    first call), so the calls of a device are contiguous and in date order, and
+    "within w days" (timedelta.days <= w, i.e. less than w + 1 days apart) is
+    the half-open key interval (key - (w + 1) days, key].
+    """
+    counts = {w: np.zeros(len(ordered), dtype=np.int64) for w in windows}
+    valid = (ordered[DEVICE].notna() & ordered[OPENED].notna()).to_numpy()
+    if not valid.any():
+        return counts
+    dated = ordered[valid]
+    codes = pd.factorize(dated[DEVICE], sort=False)[0].astype(np.int64)
+    seconds = ((dated[OPENED] - dated[OPENED].min()).dt.total_seconds() // 1).to_numpy(np.int64)
+    span = int(seconds.max()) + (max(windows) + 1) * DAY_SECONDS + 1
+    keys = codes * span + seconds
+    positions = np.arange(len(keys))
+    for w in windows:
+        starts = np.searchsorted(keys, keys - (w + 1) * DAY_SECONDS, side="right")
+        counts[w][valid] = positions - starts
+    return counts
+
+
+def _fingerprint(calls: pd.DataFrame):
+    return len(calls), tuple(calls.columns), int(pd.util.hash_pandas_object(calls, index=True).sum())
+
+
+def _memoized(kind, calls, options, compute) -> pd.DataFrame:
+    key = (kind, _fingerprint(calls), options)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key].copy()
+    result = compute()
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return result.copy()
+
+
+def _previous_calls(ordered):
+    carried = [col for col in (CALL, OPENED, TECHNICIAN, FAULT, ACTION) if col in ordered.columns]
+    return ordered.groupby(DEVICE, sort=False, observed=True)[carried].shift(1)
+
+
+def _analyze(calls, windows, call_types):
+    ordered = sort_calls(filter_call_types(calls, call_types))
+    return ordered, _previous_calls(ordered), prior_call_counts(ordered, windows)
+
+
+def _check_attribution(attribution):
+    if attribution not in ATTRIBUTIONS:
+        raise ValueError(f"Unknown attribution rule: {attribution}")
+
+
+# 📥 PUBLIC API
+def mark_repeats(calls: pd.DataFrame, windows=(30,), call_types=None, attribution="first") -> pd.DataFrame:
+    """Return all the calls in (device, date) order with repeat columns added.
+
+    PREVIOUS_DATE and DAYS_SINCE describe the previous call on the device, each
+    window gets a boolean column (window_label) marking the repeat calls, and
+    CREDITED holds the technician a repeat is credited to. With ``call_types``
+    repeats are looked for among calls of those types only; calls of other
+    types are kept, with empty repeat columns and never marked as repeats.
+    """
+    _check_attribution(attribution)
+    windows = sorted(set(windows))
+
+    def compute():
+        marked = sort_calls(calls)
+        # Filtering after the stable sort gives the same order as sorting the filtered calls
+        selected = np.ones(len(marked), dtype=bool)
+        if call_types:
+            selected = marked[CALL_TYPE].isin(list(call_types)).to_numpy()
+        ordered = marked[selected]
+        previous, counts = _previous_calls(ordered), prior_call_counts(ordered, windows)
+
+        positions = pd.RangeIndex(len(marked))
+
+        def spread(values):
+            # Values of the selected calls onto every call, missing for the others
+            return values.set_axis(positions[selected]).reindex(positions).set_axis(marked.index)
+
+        marked[PREVIOUS_DATE] = spread(previous[OPENED])
+        marked[DAYS_SINCE] = (marked[OPENED] - marked[PREVIOUS_DATE]).dt.days
+        for w in windows:
+            flags = np.zeros(len(marked), dtype=bool)
+            flags[selected] = counts[w] > 0
+            marked[window_label(w)] = flags
+        marked[CREDITED] = spread(previous[TECHNICIAN] if attribution == "first" else ordered[TECHNICIAN])
+        return marked
+
+    return _memoized("marks", calls, (tuple(windows), tuple(call_types or ()), attribution), compute)
+
+
+def find_repeat_pairs(calls: pd.DataFrame, windows=(30,), call_types=None, attribution="first") -> pd.DataFrame:
+    """Return one row per (first call, repeat call) pair, in (device, date) order.
+
+    Pairs are found for the widest of ``windows``; each window also gets a
+    boolean column (window_label) telling whether the pair falls within it.
+    Besides PAIR_COLUMNS there is the technician credited with the repeat
+    (TECHNICIAN, chosen by ``attribution``) and the days between the calls.
+    """
+    _check_attribution(attribution)
+    windows = sorted(set(windows))
+
+    def compute():
+        ordered, previous, counts = _analyze(calls, windows, call_types)
+        # Dates are sorted within a device, so any earlier call in the window means the previous one is
+        is_repeat = counts[windows[-1]] > 0
+        first, repeat = previous[is_repeat], ordered[is_repeat]
+        pairs = pd.DataFrame({
+            FIRST_CALL: first.get(CALL),
+            f"{FAULT} (קריאה ראשונה)": first.get(FAULT),
+            f"{ACTION} (קריאה ראשונה)": first.get(ACTION),
+            REPEAT_CALL: repeat.get(CALL),
+            f"{FAULT} (קריאה חוזרת)": repeat.get(FAULT),
+            f"{ACTION} (קריאה חוזרת)": repeat.get(ACTION),
+            DEVICE: repeat[DEVICE],
+            TECHNICIAN: (first if attribution == "first" else repeat)[TECHNICIAN],
+            "ימים": (repeat[OPENED] - first[OPENED]).dt.days.astype(int),
+        }, index=repeat.index)
+        for w in windows:
+            pairs[window_label(w)] = counts[w][is_repeat] > 0
+        return pairs.reset_index(drop=True)
+
+    return _memoized("pairs", calls, (tuple(windows), tuple(call_types or ()), attribution), compute)
+
+
+def technician_repeat_rates(calls: pd.DataFrame, pairs: pd.DataFrame, window_days: int = None, call_types=None) -> pd.DataFrame:
+    """Calls, repeats credited and repeat percentage per technician (only those with repeats).
+
+    ``window_days`` restricts the pairs to one of the windows they were found
+    with; pass the ``call_types`` the pairs were found with, so calls are
+    counted the same way.
+    """
+    calls = filter_call_types(calls, call_types)
+    if window_days is not None:
+        pairs = pairs[pairs[window_label(window_days)]]
+    repeats = pairs.groupby(TECHNICIAN, sort=False, observed=True).size()
+    totals = calls.groupby(TECHNICIAN, observed=True).size()
+    rates = pd.DataFrame({"Repeats": repeats, "Calls": totals.reindex(repeats.index).fillna(0).astype(int)})
+    rates["Percentage"] = (rates["Repeats"] / rates["Calls"].where(rates["Calls"] > 0) * 100).fillna(0)
+    return rates
+
+
+def repeat_window_summary(calls: pd.DataFrame, pairs: pd.DataFrame, windows, call_types=None) -> pd.DataFrame:
+    """One row per technician: calls, then repeats and repeat percentage for each window."""
+    windows = sorted(set(windows))
+    calls = filter_call_types(calls, call_types)
+    summary = calls.groupby(TECHNICIAN, observed=True).size().rename("Calls").to_frame()
+    for w in windows:
+        repeats = pairs[pairs[window_label(w)]].groupby(TECHNICIAN, observed=True).size()
+        summary[f"Repeats ({w} days)"] = repeats.reindex(summary.index).fillna(0).astype(int)
+        summary[f"% ({w} days)"] = (summary[f"Repeats ({w} days)"] / summary["Calls"] * 100).round(2)
+    return summary.rename_axis("Technician").reset_index()
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
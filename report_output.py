@@ -0,0 +1,198 @@
+import re
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+
+from excel_writer import ReportWriter
+
+# One report model, several output formats.
+# A Report is an ordered set of sheets; a sheet holds one or more tables (each
+# with an optional title), or is a "group" sheet that fans out to one sheet
+# per value of a column, like the per-device exports.
+#   "xlsx"    - the workbook the tools always produced (default, for people)
+#   "csv"     - a zip with one CSV per table (one per group for group sheets)
+#   "parquet" - one .parquet file when the report holds a single table,
+#               otherwise a zip with one .parquet file per table; a group
+#               sheet is a single table there, its group column tells the
+#               groups apart
+# CSV and Parquet skip the Excel cell-by-cell serialization, so large results
+# come out many times faster and smaller for scripts and BI tools.
+
+FORMATS = {"xlsx": "Excel (.xlsx)", "csv": "CSV files (.zip)", "parquet": "Parquet"}
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_INVALID_FILE_CHARS = re.compile(r'[\\/:*?"<>|]')
+
+
+# 🛠 HELPER FUNCTIONS
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats() -> list:
+    formats = ["xlsx", "csv"]
+    if parquet_available():
+        formats.append("parquet")
+    return formats
+
+
+def _file_stem(name) -> str:
+    return _INVALID_FILE_CHARS.sub("_", str(name)).strip() or "table"
+
+
+def _parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    # Parquet needs string column names and one type per column; mixed object columns become text
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes.eq(object)]:
+        df[col] = df[col].astype("string")
+    return df
+
+
+class Report:
+    """Sheets of tables, rendered by ``render`` in any of FORMATS."""
+
+    def __init__(self):
+        self.sheets = {}  # name -> ("tables", [(title, df), ...]) or ("groups", (df, by, drop))
+
+    def add(self, sheet, df, title=None):
+        """Append a table to ``sheet`` (created on first use)."""
+        self.sheets.setdefault(sheet, ("tables", []))[1].append((title, df))
+        return self
+
+    def add_groups(self, sheet, df, by, drop=None):
+        """A sheet per ``by`` group of ``df``; ``sheet`` names the single table in Parquet.
+
+        ``drop`` columns are left out of every output, except ``by`` columns in the
+        single table, where they tell the groups apart.
+        """
+        self.sheets[sheet] = ("groups", (df, by, drop))
+        return self
+
+    def tables(self, split_groups=True):
+        """Yield (file stem, DataFrame) for every table in the report."""
+        for sheet, (kind, content) in self.sheets.items():
+            if kind == "groups":
+                df, by, drop = content
+                if not split_groups:
+                    # Rows in the same group order as the sheets, without the rows no group takes;
+                    # the group columns stay, since they are what tells the groups apart here
+                    keys = [by] if isinstance(by, str) else list(by)
+                    df = df.dropna(subset=keys).sort_values(keys, kind="stable")
+                    drop = [col for col in drop or [] if col not in keys]
+                    yield _file_stem(sheet), df.drop(columns=drop) if drop else df
+                    continue
+                for key, group in df.groupby(by, observed=True):
+                    stem = _file_stem("_".join(map(str, key)) if isinstance(key, tuple) else key)
+                    yield stem, group.drop(columns=drop) if drop else group
+                continue
+            for i, (title, df) in enumerate(content, start=1):
+                if len(content) == 1:
+                    yield _file_stem(sheet), df
+                else:
+                    yield _file_stem(f"{sheet} - {title if title is not None else i}"), df
+
+    def table_count(self) -> int:
+        """Tables as Parquet sees them: a group sheet is one table."""
+        return sum(1 if kind == "groups" else len(content) for kind, content in self.sheets.values())
+
+    def row_count(self) -> int:
+        return sum(
+            len(content[0]) if kind == "groups" else sum(len(df) for _, df in content)
+            for kind, content in self.sheets.values()
+        )
+
+
+def _unique_names(stems, extension):
+    seen = set()
+    for stem in stems:
+        name, n = f"{stem}{extension}", 1
+        while name.lower() in seen:
+            n += 1
+            name = f"{stem} ({n}){extension}"
+        seen.add(name.lower())
+        yield name
+
+
+def _write_xlsx(report, output, constant_memory=None, progress=None):
+    with ReportWriter(output, expected_rows=report.row_count(), constant_memory=constant_memory) as writer:
+        for sheet, (kind, content) in report.sheets.items():
+            if kind == "groups":
+                df, by, drop = content
+                writer.write_groups(df, by, drop=drop, progress=progress)
+                continue
+            worksheet = writer.add_sheet(sheet)
+            row = 0
+            for title, df in content:
+                row = writer.write_frame(df, worksheet, row, title=title) + 1
+            writer.finish_sheet(worksheet)
+
+
+def _write_csv_zip(report, output, progress=None):
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        tables = list(report.tables())
+        for i, (name, (_, df)) in enumerate(zip(_unique_names((stem for stem, _ in tables), ".csv"), tables), start=1):
+            # utf-8-sig so Excel opens the Hebrew text correctly
+            archive.writestr(name, df.to_csv(index=False).encode("utf-8-sig"))
+            if progress is not None:
+                progress(i, len(tables))
+
+
+def _write_parquet(report, output):
+    tables = list(report.tables(split_groups=False))
+    if len(tables) == 1:
+        _parquet_ready(tables[0][1]).to_parquet(output, index=False)
+        return
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+        # Parquet is compressed already
+        for name, (_, df) in zip(_unique_names((stem for stem, _ in tables), ".parquet"), tables):
+            buffer = BytesIO()
+            _parquet_ready(df).to_parquet(buffer, index=False)
+            archive.writestr(name, buffer.getvalue())
+
+
+# 📥 PUBLIC API
+def file_extension(report: Report, fmt: str) -> str:
+    if fmt == "xlsx":
+        return ".xlsx"
+    if fmt == "parquet" and report.table_count() == 1:
+        return ".parquet"
+    return ".zip"
+
+
+def file_name(report: Report, base: str, fmt: str) -> str:
+    """``base`` with the extension ``fmt`` produces for this report."""
+    return base + file_extension(report, fmt)
+
+
+def mime_type(report: Report, fmt: str) -> str:
+    return MIME_TYPES[file_extension(report, fmt).lstrip(".")]
+
+
+def render(report: Report, fmt="xlsx", output=None, constant_memory=None, progress=None):
+    """Write ``report`` as ``fmt``; returns the bytes, or ``output`` when it is a file path.
+
+    ``constant_memory`` is passed to the Excel writer (None: decided by row count).
+    ``progress(done, total)`` follows the group sheets (xlsx) or the tables (CSV).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    if fmt == "parquet" and not parquet_available():
+        raise ValueError("Parquet output needs pyarrow installed")
+    target = BytesIO() if output is None else output
+    if fmt == "xlsx":
+        _write_xlsx(report, target, constant_memory, progress)
+    elif fmt == "csv":
+        _write_csv_zip(report, target, progress)
+    else:
+        _write_parquet(report, target)
+    return target.getvalue() if output is None else output
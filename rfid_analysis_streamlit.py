@@ -1,60 +1,164 @@
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-from io import BytesIO
 import os
 from PIL import Image
+from excel_reader import iter_excel_chunks
+from lazy_download import artifact_key, lazy_download_button
+from report_output import FORMATS, Report, available_formats, file_name, mime_type, render
+from schema import normalize_frame, original_headers, restore_headers, timestamp_columns
+from upload_cache import content_hash, file_bytes, read_excel_cached
+
+REQUIRED_COLUMNS = ["RFID", "ItemTypeName", "ItemSubTypeName", "StationName"]
+TYPE_COLUMNS = ["ItemTypeName", "ItemSubTypeName"]
+STREAM_CHUNK_ROWS = 100_000
+DEFAULT_DUPLICATE_SECONDS = 60
 
 
 st.title("🔍 RFID Mismatch Analyzer")
 
 uploaded_file = st.file_uploader("Upload an RFID Excel File", type=["xlsx"])
 
+def mismatch_mask(df):
+    """Rows of the tags read with more than one item type or sub type (nunique() > 1 per RFID)."""
+    tags = pd.Series(pd.factorize(df["RFID"])[0]).where(lambda codes: codes >= 0)
+    # Compare small integer codes instead of the strings; missing values (-1) don't count
+    codes = pd.DataFrame({col: pd.factorize(df[col])[0] for col in TYPE_COLUMNS}).where(lambda c: c >= 0)
+    mismatched = codes.groupby(tags).transform("nunique").gt(1).any(axis=1)
+    return mismatched.to_numpy() & tags.notna().to_numpy()
+
+def summarize(result_df, total_transactions):
+    unique_mismatched_rfid = result_df["RFID"].nunique()
+    mismatch_percentage = (unique_mismatched_rfid / total_transactions) * 100 if total_transactions > 0 else 0
+    return {
+        "Total Transactions": total_transactions,
+        "Mismatched RFID Count": unique_mismatched_rfid,
+        "Mismatch Percentage (%)": round(mismatch_percentage, 2)
+    }
+
+def missing_column(df):
+    return next((col for col in REQUIRED_COLUMNS if col not in df.columns), None)
+
 def process_excel(file):
     try:
-        df = pd.read_excel(file, engine="openpyxl")
-
-        required_columns = ["RFID", "Item Type Name", "Item Sub Type Name", "Station Name"]
-        for col in required_columns:
-            if col not in df.columns:
-                st.error(f"Missing required column: {col}")
-                return None, None
+        df = read_excel_cached(file, engine="auto", schema=True)
 
-        mismatches = []
-        grouped = df.groupby("RFID")
-        for rfid, group in grouped:
-            if group["Item Type Name"].nunique() > 1 or group["Item Sub Type Name"].nunique() > 1:
-                mismatches.append(group)
+        missing = missing_column(df)
+        if missing:
+            st.error(f"Missing required column: {missing}")
+            return None, None
 
-        result_df = pd.concat(mismatches) if mismatches else pd.DataFrame(columns=df.columns)
+        # Tags in RFID order, each one's reads in file order
+        result_df = df[mismatch_mask(df)].sort_values("RFID", kind="stable")
+        return result_df, summarize(result_df, len(df))
 
-        unique_mismatched_rfid = result_df["RFID"].nunique()
-        total_transactions = len(df)
-        mismatch_percentage = (unique_mismatched_rfid / total_transactions) * 100 if total_transactions > 0 else 0
-
-        summary = {
-            "Total Transactions": total_transactions,
-            "Mismatched RFID Count": unique_mismatched_rfid,
-            "Mismatch Percentage (%)": round(mismatch_percentage, 2)
-        }
+    except Exception as e:
+        st.error(f"Error processing file: {e}")
+        return None, None
 
-        return result_df, summary
+def _read_chunks(file):
+    for chunk in iter_excel_chunks(file_bytes(file), chunk_rows=STREAM_CHUNK_ROWS, engine="openpyxl-stream", dtype=str):
+        chunk = normalize_frame(chunk)
+        missing = missing_column(chunk)
+        if missing:
+            raise ValueError(f"Missing required column: {missing}")
+        yield chunk
+
+def mismatched_tags_streaming(chunks):
+    """Pass 1: the tags with more than one item type or sub type, and the number of rows read.
+
+    Only the distinct (RFID, column, value) triples seen so far are kept
+    between chunks, so memory follows the number of tags, not of reads.
+    """
+    seen, total = None, 0
+    for chunk in chunks:
+        total += len(chunk)
+        triples = pd.concat([
+            pd.DataFrame({"RFID": chunk["RFID"].astype(object), "column": col, "value": chunk[col].astype(object)})
+            for col in TYPE_COLUMNS
+        ]).dropna()
+        seen = (triples if seen is None else pd.concat([seen, triples])).drop_duplicates(ignore_index=True)
+    if seen is None:
+        return pd.Index([]), total
+    counts = seen.groupby(["RFID", "column"]).size()
+    return counts[counts > 1].index.get_level_values("RFID").unique(), total
+
+def process_excel_streaming(file):
+    """Two passes over the file in chunks: find the mismatched tags, then collect their reads."""
+    try:
+        tags, total = mismatched_tags_streaming(_read_chunks(file))
+        rows = [chunk[chunk["RFID"].astype(object).isin(tags)] for chunk in _read_chunks(file)]
+        rows = [chunk for chunk in rows if len(chunk)]
+        result_df = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=REQUIRED_COLUMNS)
+        result_df = result_df.sort_values("RFID", key=lambda col: col.astype(str), kind="stable")
+        return result_df, summarize(result_df, total)
 
     except Exception as e:
         st.error(f"Error processing file: {e}")
         return None, None
 
-def generate_excel(result_df, summary):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        result_df.to_excel(writer, sheet_name="Mismatched Data", index=False)
-        summary_df = pd.DataFrame(list(summary.items()), columns=["Metric", "Value"])
-        summary_df.to_excel(writer, sheet_name="Summary", index=False)
-    output.seek(0)
-    return output
+def find_duplicate_reads(df, time_col, seconds):
+    """Reads of a tag within ``seconds`` of its previous read, at the same or another station.
+
+    One sort by (RFID, read time) and a diff of the timestamps: a read is a
+    duplicate when the read before it in that order has the same tag and is
+    at most ``seconds`` older.
+    """
+    tags = pd.factorize(df["RFID"])[0]
+    times = pd.to_datetime(df[time_col], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    rows = np.flatnonzero((tags >= 0) & ~np.isnat(times))
+    order = rows[np.lexsort((times[rows], tags[rows]))]
+    gaps = np.diff(times[order])
+    duplicate = (tags[order][1:] == tags[order][:-1]) & (gaps <= np.timedelta64(int(seconds), "s"))
+    current, previous = order[1:][duplicate], order[:-1][duplicate]
+
+    columns = [col for col in ["RFID", "ItemTypeName", "ItemSubTypeName", "StationName", time_col] if col in df.columns]
+    duplicates = df.iloc[current][columns].reset_index(drop=True)
+    duplicates["Previous Station"] = df["StationName"].iloc[previous].to_numpy()
+    duplicates["Previous Read"] = times[previous]
+    duplicates["Seconds Since Previous"] = gaps[duplicate] / np.timedelta64(1, "s")
+    duplicates["Same Station"] = (df["StationName"].iloc[current].to_numpy() == duplicates["Previous Station"].to_numpy())
+    return duplicates
+
+def duplicate_rates(df, duplicates):
+    """Reads, duplicate reads and duplicate rate per station (duplicates count at the station of the repeated read)."""
+    rates = pd.DataFrame({
+        "Reads": df.groupby("StationName", observed=True).size(),
+        "Duplicate Reads": duplicates.groupby("StationName", observed=True).size(),
+        "Same-Station Duplicates": duplicates[duplicates["Same Station"]].groupby("StationName", observed=True).size(),
+    }).fillna(0).astype(np.int64)
+    rates["Duplicate Rate (%)"] = (rates["Duplicate Reads"] / rates["Reads"] * 100).round(2)
+    return rates.sort_values("Duplicate Rate (%)", ascending=False, kind="stable").rename_axis("StationName").reset_index()
+
+def build_report(result_df, summary, duplicates=None, rates=None, headers=None):
+    """The results workbook; ``headers`` (schema.original_headers) puts back the uploaded file's column names."""
+    headers = headers or {}
+    summary_df = pd.DataFrame(list(summary.items()), columns=["Metric", "Value"])
+    report = Report().add("Mismatched Data", restore_headers(result_df, headers)).add("Summary", summary_df)
+    if duplicates is not None:
+        report.add("Duplicate Reads", restore_headers(duplicates, headers))
+        report.add("Duplicates by Station", restore_headers(rates, headers))
+    return report
+
+streaming = st.checkbox(
+    "⚡ Streaming mode (low memory, for multi-million-row files)",
+    help="Reads the file in chunks twice: once to find the mismatched tags, once to collect their reads."
+)
 
 if uploaded_file is not None:
-    result_df, summary = process_excel(uploaded_file)
+    if streaming:
+        # Two passes over the whole file; keep the result across reruns
+        file_key = content_hash(uploaded_file)
+        cached = st.session_state.get("rfid_streamed")
+        if cached is None or cached[0] != file_key:
+            with st.spinner("Streaming RFID reads..."):
+                cached = (file_key, *process_excel_streaming(uploaded_file))
+            if cached[1] is not None:
+                st.session_state["rfid_streamed"] = cached
+        result_df, summary = cached[1:]
+    else:
+        result_df, summary = process_excel(uploaded_file)
 
     if result_df is not None:
         st.subheader("📊 Summary")
@@ -63,15 +167,42 @@ if uploaded_file is not None:
         st.subheader("❌ Mismatched Entries")
         st.dataframe(result_df)
 
-        excel_data = generate_excel(result_df, summary)
+        duplicates = rates = duplicate_options = None
+        detect = st.checkbox(
+            "🔁 Detect duplicate reads",
+            help="The same tag read again, at the same or another station, within a number of seconds."
+        )
+        if detect and streaming:
+            st.info("Duplicate reads are detected in the regular (in-memory) mode only.")
+        elif detect:
+            df = read_excel_cached(uploaded_file, engine="auto", schema=True)
+            time_columns = timestamp_columns(df)
+            if not time_columns:
+                st.warning("No date or time column found, duplicate reads can't be detected.")
+            else:
+                time_col = st.selectbox("Read time column", time_columns)
+                seconds = st.number_input(
+                    "Read again within (seconds)", min_value=1, value=DEFAULT_DUPLICATE_SECONDS
+                )
+                duplicate_options = (time_col, int(seconds))
+                duplicates = find_duplicate_reads(df, *duplicate_options)
+                rates = duplicate_rates(df, duplicates)
+
+                st.subheader("🔁 Duplicate Reads by Station")
+                st.caption(f"{len(duplicates)} duplicate reads out of {len(df)}")
+                st.dataframe(rates)
+
+        output_format = st.selectbox("Output format", available_formats(), format_func=FORMATS.get)
+        # The reads carry the headers normalize_frame() renamed
+        report = build_report(result_df, summary, duplicates, rates, original_headers(result_df))
 
         # Use the uploaded file name to create output name
         input_filename = uploaded_file.name.rsplit(".", 1)[0]
-        download_filename = f"{input_filename}_rfid_mismatch_analysis.xlsx"
+        download_filename = file_name(report, f"{input_filename}_rfid_mismatch_analysis", output_format)
 
-        st.download_button(
-            label="📥 Download Results as Excel",
-            data=excel_data,
-            file_name=download_filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        selection = (output_format, streaming, duplicate_options)
+        lazy_download_button(
+            "📥 Download Results", artifact_key("rfid_mismatch", uploaded_file, selection),
+            lambda: render(report, output_format), file_name=download_filename,
+            mime=mime_type(report, output_format)
         )
@@ -1,39 +1,108 @@
 
 import streamlit as st
 import pandas as pd
-import io
 import re
+import numpy as np
+from call_join import call_join
+from report_output import FORMATS, Report, available_formats, file_name, mime_type, render
+from text_index import FuzzyIndex, PrefixIndex, TextIndex, cached_index
+from upload_cache import content_hash, read_excel_cached
+
+CALL_COL = "מס. קריאה"
+TEXT_COLS = ["תאור תקלה", "תאור קוד פעולה"]
+SCORE_COL = "ציון התאמה"
+FUZZY_MIN_SCORE = 0.25
+DISPLAY_COLS = [CALL_COL, "דגם", "תאור תקלה", "תאור קוד פעולה", 'מק"ט - חלק', "תאור מוצר - חלק", "כמות בפועל"]
 
 def normalize_text(s):
     if pd.isna(s):
         return ""
     return re.sub(r"[\u200e\u202c]", "", str(s)).strip()
 
+def build_finder(service_file, parts_file):
+    """The merged calls x parts frame and its search indexes (built once per file pair)."""
+    service_df = read_excel_cached(service_file, schema=True)
+    parts_df = read_excel_cached(parts_file, schema=True)
+
+    # Joined on the normalized call number (shared, cached join), then shown and searched as text
+    merged = call_join(service_file, parts_file).merge_calls(service_df, parts_df, how="left")
+    merged[CALL_COL] = merged[CALL_COL].astype(str).str.strip()
+
+    if "דגם_x" in merged.columns:
+        merged.rename(columns={"דגם_x": "דגם"}, inplace=True)
+
+    for col in ["דגם"] + TEXT_COLS:
+        if col in merged.columns:
+            merged[col] = merged[col].astype(str).apply(normalize_text).str.strip()
+
+    indexes = {CALL_COL: PrefixIndex(merged[CALL_COL])}
+    indexes.update({col: TextIndex(merged[col]) for col in TEXT_COLS if col in merged.columns})
+    return merged, indexes
+
+def _matching_rows(index, value, is_exact):
+    return index.rows_equal(value) if is_exact else index.rows_containing(value)
+
+def top_calls(merged, calls_index, fuzzy_index, query, top_n, min_score=FUZZY_MIN_SCORE):
+    """Rows (with their parts) of the ``top_n`` calls most similar to ``query``, best first."""
+    scores = fuzzy_index.row_scores(query)
+    hits = np.flatnonzero(scores >= min_score)
+    hits = hits[np.argsort(-scores[hits], kind="stable")]
+    # A call's rows share its description; keep the first top_n calls in score order
+    calls, first = np.unique(calls_index.codes[hits], return_index=True)
+    best = calls[np.argsort(first)][:top_n]
+    rows = np.flatnonzero(np.isin(calls_index.codes, best))
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return merged.iloc[rows].assign(**{SCORE_COL: scores[rows].round(2)})
+
+def show_results(filtered, file_suffix, output_format):
+    if filtered.empty:
+        st.warning("לא נמצאו תוצאות.")
+        return
+    available_cols = [col for col in DISPLAY_COLS + [SCORE_COL] if col in filtered.columns]
+    final_result = filtered[available_cols].drop_duplicates()
+
+    st.dataframe(final_result)
+
+    report = Report().add("תוצאות חיפוש", final_result)
+    st.download_button(
+        label="📥 הורד תוצאות לאקסל",
+        data=render(report, output_format),
+        file_name=file_name(report, f"תוצאות_חיפוש_{file_suffix.replace(' ', '_')}", output_format),
+        mime=mime_type(report, output_format)
+    )
+
 def run_app():
     st.title("🔍 חיפוש לפי שדה כולל קריאות ללא חלקים")
 
-    search_mode = st.radio("בחר סוג חיפוש:", ["🔒 חיפוש מדויק", "🔎 חיפוש גמיש (מכיל)"])
+    search_mode = st.radio("בחר סוג חיפוש:", ["🔒 חיפוש מדויק", "🔎 חיפוש גמיש (מכיל)", "🧠 חיפוש חכם (דומה)"])
     is_exact = search_mode == "🔒 חיפוש מדויק"
 
     service_file = st.file_uploader("העלה קובץ קריאות שירות", type=["xlsx"])
     parts_file = st.file_uploader("העלה קובץ חלקים", type=["xlsx"])
 
     if service_file and parts_file:
-        service_df = pd.read_excel(service_file)
-        parts_df = pd.read_excel(parts_file)
-
-        call_col = "מס. קריאה" if "מס. קריאה" in service_df.columns else "מספר קריאה"
-        parts_df["מספר קריאה"] = parts_df["מספר קריאה"].astype(str).str.strip().str.replace(".0", "", regex=False)
-        service_df[call_col] = service_df[call_col].astype(str).str.strip().str.replace(".0", "", regex=False)
-
-        merged = pd.merge(service_df, parts_df, left_on=call_col, right_on="מספר קריאה", how="left")
-
-        if "דגם_x" in merged.columns:
-            merged.rename(columns={"דגם_x": "דגם"}, inplace=True)
-
-        for col in ["דגם", "תאור תקלה", "תאור קוד פעולה"]:
-            if col in merged.columns:
-                merged[col] = merged[col].astype(str).apply(normalize_text).str.strip()
+        # Merging, normalizing and indexing run once per file pair, not on every rerun
+        merged, indexes = cached_index(
+            ("scfapp", content_hash(service_file), content_hash(parts_file)),
+            lambda: build_finder(service_file, parts_file)
+        )
+        call_col = CALL_COL
+
+        if search_mode == "🧠 חיפוש חכם (דומה)":
+            # Ranked by similarity: tolerates typos, niqqud, maqaf and word order
+            field = st.selectbox("חפש בשדה", [col for col in TEXT_COLS if col in indexes])
+            query = st.text_input("הקלד טקסט חופשי")
+            top_n = st.number_input("מספר קריאות מובילות", min_value=1, max_value=1000, value=50)
+            output_format = st.selectbox("פורמט קובץ", available_formats(), format_func=FORMATS.get)
+
+            if st.button("🔍 חפש") and query.strip():
+                fuzzy_index = cached_index(
+                    ("scfapp-fuzzy", content_hash(service_file), content_hash(parts_file), field),
+                    lambda: FuzzyIndex(merged[field])
+                )
+                show_results(top_calls(merged, indexes[call_col], fuzzy_index, query, int(top_n)),
+                             f"דומה_{query.strip()}", output_format)
+            return
 
         search_by = st.radio(
             "בחר דרך חיפוש:",
@@ -44,78 +113,46 @@ def run_app():
         file_suffix = ""
 
         if search_by == "מספר קריאה":
-            options = merged[call_col].dropna().unique()
-            selected_call = st.selectbox("בחר מספר קריאה", sorted(options))
+            prefix = st.text_input("הקלד תחילת מספר קריאה (לא חובה)")
+            options = indexes[call_col].keys_with_prefix(prefix.strip())
+            selected_call = st.selectbox("בחר מספר קריאה", list(options))
             file_suffix = f"מספר_קריאה_{selected_call}"
 
         elif search_by == "תאור תקלה":
-            options = merged["תאור תקלה"].dropna().unique()
-            selected_fault = st.selectbox("בחר תאור תקלה", sorted(options))
+            options = indexes["תאור תקלה"].values
+            selected_fault = st.selectbox("בחר תאור תקלה", list(options))
             file_suffix = f"תאור_תקלה_{selected_fault}"
 
         elif search_by == "תאור קוד פעולה":
-            options = merged["תאור קוד פעולה"].dropna().unique()
-            selected_action = st.selectbox("בחר תאור קוד פעולה", sorted(options))
+            options = indexes["תאור קוד פעולה"].values
+            selected_action = st.selectbox("בחר תאור קוד פעולה", list(options))
             file_suffix = f"תאור_פעולה_{selected_action}"
 
         elif search_by == "תאור תקלה וגם תאור קוד פעולה":
-            faults = merged["תאור תקלה"].dropna().unique()
-            selected_fault = st.selectbox("בחר תאור תקלה", sorted(faults), key="fault_combo")
+            faults = indexes["תאור תקלה"].values
+            selected_fault = st.selectbox("בחר תאור תקלה", list(faults), key="fault_combo")
 
             if selected_fault:
-                actions = merged[merged["תאור תקלה"] == selected_fault]["תאור קוד פעולה"].dropna().unique()
-                selected_action = st.selectbox("בחר תאור קוד פעולה", sorted(actions), key="action_combo")
+                actions = indexes["תאור קוד פעולה"].values_in(indexes["תאור תקלה"].rows_equal(selected_fault))
+                selected_action = st.selectbox("בחר תאור קוד פעולה", list(actions), key="action_combo")
                 file_suffix = f"תקלה_{selected_fault}_פעולה_{selected_action}"
 
+        output_format = st.selectbox("פורמט קובץ", available_formats(), format_func=FORMATS.get)
+
         if st.button("🔍 חפש"):
+            # Index lookups; "contains" is a literal substring match
             if search_by == "מספר קריאה" and selected_call:
-                filtered = merged[merged[call_col] == selected_call]
+                filtered = merged.iloc[indexes[call_col].rows_equal(selected_call)]
             elif search_by == "תאור תקלה" and selected_fault:
-                filtered = merged[
-                    merged["תאור תקלה"].str.contains(selected_fault, na=False)
-                ] if not is_exact else merged[merged["תאור תקלה"] == selected_fault]
+                filtered = merged.iloc[_matching_rows(indexes["תאור תקלה"], selected_fault, is_exact)]
             elif search_by == "תאור קוד פעולה" and selected_action:
-                filtered = merged[
-                    merged["תאור קוד פעולה"].str.contains(selected_action, na=False)
-                ] if not is_exact else merged[merged["תאור קוד פעולה"] == selected_action]
+                filtered = merged.iloc[_matching_rows(indexes["תאור קוד פעולה"], selected_action, is_exact)]
             elif search_by == "תאור תקלה וגם תאור קוד פעולה" and selected_fault and selected_action:
-                if is_exact:
-                    filtered = merged[
-                        (merged["תאור תקלה"] == selected_fault) &
-                        (merged["תאור קוד פעולה"] == selected_action)
-                    ]
-                else:
-                    filtered = merged[
-                        merged["תאור תקלה"].str.contains(selected_fault, na=False) &
-                        merged["תאור קוד פעולה"].str.contains(selected_action, na=False)
-                    ]
+                filtered = merged.iloc[np.intersect1d(
+                    _matching_rows(indexes["תאור תקלה"], selected_fault, is_exact),
+                    _matching_rows(indexes["תאור קוד פעולה"], selected_action, is_exact)
+                )]
             else:
                 filtered = pd.DataFrame()
 
-            if not filtered.empty:
-                display_cols = [
-                    call_col, "דגם", "תאור תקלה", "תאור קוד פעולה",
-                    'מק"ט - חלק', "תאור מוצר - חלק", "כמות בפועל"
-                ]
-                available_cols = [col for col in display_cols if col in filtered.columns]
-                final_result = filtered[available_cols].drop_duplicates()
-
-                st.dataframe(final_result)
-
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                    final_result.to_excel(writer, index=False, sheet_name="תוצאות חיפוש")
-                    sheet = writer.sheets["תוצאות חיפוש"]
-                    for i, col in enumerate(final_result.columns):
-                        width = max(final_result[col].astype(str).map(len).max(), len(col)) + 1
-                        sheet.set_column(i, i, width)
-
-                output.seek(0)
-                st.download_button(
-                    label="📥 הורד תוצאות לאקסל",
-                    data=output,
-                    file_name=f"תוצאות_חיפוש_{file_suffix.replace(' ', '_')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            else:
-                st.warning("לא נמצאו תוצאות.")
+            show_results(filtered, file_suffix, output_format)
@@ -0,0 +1,191 @@
+import hashlib
+import re
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_integer_dtype, is_numeric_dtype
+
+# Central column registry for the Priority and PM8 exports.
+# Each logical field has one canonical column name (the one the tools use), the
+# aliases it appears under in the different exports, and a declared kind:
+#   "id"       - nullable Int64 when every value is a whole number, else left as is
+#   "date"     - datetime64; text dates month first (03/13/2024), as pandas reads them
+#   "dmy date" - datetime64; text dates day first (13/03/2024), as Priority writes them
+#   "number"   - float, non-numeric values become NaN
+#   "category" - pandas categorical (technicians, sites, models, ...)
+#   "text"     - free text; categorical when values repeat enough to pay off
+# normalize_frame() is applied once at ingestion (upload_cache, schema=True), so
+# every tool gets the same column names and the same memory-compact dtypes.
+# The headers it renamed are kept in df.attrs; reports put them back with
+# restore_headers(), so exports keep the column names of the uploaded file.
+
+FIELDS = {
+    # Priority service calls / parts exports
+    "מס. קריאה": (["מס. קריאה", "מספר קריאה", "מס' קריאה"], "id"),
+    "מס' מכשיר": (["מס' מכשיר", "מספר מכשיר"], "id"),
+    "ת. פתיחה": (["ת. פתיחה", "תאריך קריאה", "תאריך פתיחה"], "dmy date"),
+    "לטיפול": (["לטיפול", "שם טכנאי"], "category"),
+    "תאור האתר": (["תאור האתר", "תיאור האתר"], "category"),
+    'מק"ט': (['מק"ט', "מק'ט", "מקט"], "category"),
+    "דגם": (["דגם"], "category"),
+    "סוג קריאה": (["סוג קריאה"], "category"),
+    "תאור מוצר": (["תאור מוצר", "תיאור מוצר"], "category"),
+    'מק"ט בטיפול': (['מק"ט בטיפול', "מק'ט בטיפול", "מקט בטיפול"], "category"),
+    "תאור מוצר בטיפול": (["תאור מוצר בטיפול", "תיאור מוצר בטיפול"], "category"),
+    'מק"ט - חלק': (['מק"ט - חלק', "מק'ט - חלק"], "category"),
+    "תאור מוצר - חלק": (["תאור מוצר - חלק", "תיאור מוצר - חלק"], "category"),
+    "כמות בפועל": (["כמות בפועל"], "number"),
+    "תאור תקלה": (["תאור תקלה", "תיאור תקלה"], "text"),
+    "תאור קוד פעולה": (["תאור קוד פעולה", "תיאור קוד פעולה"], "text"),
+    "תאור קוד התקלה": (["תאור קוד התקלה", "תיאור קוד התקלה"], "text"),
+    "תאור התיקון": (["תאור התיקון", "תיאור התיקון"], "text"),
+    # PM8 transaction / RFID reports
+    "CreatedDate": (["CreatedDate", "Created Date"], "date"),
+    "CardId": (["CardId", "Card ID"], "text"),
+    "RFID": (["RFID", "RFID Tag"], "text"),
+    "TransactionType": (["TransactionType", "Transaction Type ID", "TransactionInfoTypeName"], "category"),
+    "UserName": (["UserName", "User Full Name"], "category"),
+    "ItemTypeName": (["ItemTypeName", "Item Type Name"], "category"),
+    "ItemSubTypeName": (["ItemSubTypeName", "Item Sub Type Name"], "category"),
+    "StationName": (["StationName", "Station Name"], "category"),
+}
+
+# Free text becomes categorical only if at most this share of its values is unique
+TEXT_CATEGORY_RATIO = 0.5
+
+# Bump when normalize_frame() parses values differently
+PARSER_REVISION = 4
+# Part of every cache key, so a changed registry or parser never serves frames cached by an older one
+SCHEMA_VERSION = hashlib.sha256(repr((FIELDS, TEXT_CATEGORY_RATIO, PARSER_REVISION)).encode("utf-8")).hexdigest()[:12]
+
+ORIGINAL_HEADERS = "original_headers"  # df.attrs key: canonical name -> header in the file
+
+_QUOTES = str.maketrans({"״": '"', "”": '"', "“": '"', "׳": "'", "’": "'", "‘": "'", "`": "'"})
+
+
+# 🛠 HELPER FUNCTIONS
+def header_key(name) -> str:
+    """Comparison key for a column header: trimmed, single-spaced, straight quotes, lower case."""
+    return re.sub(r"\s+", " ", str(name).translate(_QUOTES)).strip().lower()
+
+
+_ALIAS_INDEX = {header_key(alias): canonical for canonical, (aliases, _) in FIELDS.items() for alias in aliases}
+
+
+def find_column(columns, field: str):
+    """Return the column in ``columns`` holding ``field`` (a canonical name), or None."""
+    aliases = {header_key(alias) for alias in FIELDS[field][0]}
+    return next((col for col in columns if header_key(col) in aliases), None)
+
+
+def resolve_columns(columns) -> dict:
+    """Map each aliased column to its canonical name (first match per field wins)."""
+    present = set(columns)
+    mapping = {}
+    for col in columns:
+        canonical = _ALIAS_INDEX.get(header_key(col))
+        if canonical is None or col == canonical:
+            continue
+        if canonical in present or canonical in mapping.values():
+            continue
+        mapping[col] = canonical
+    return mapping
+
+
+def _to_id(s: pd.Series) -> pd.Series:
+    if is_integer_dtype(s):
+        return s.astype("Int64")
+    if is_numeric_dtype(s):
+        numbers = s
+    else:
+        text = s.astype(str).str.replace(r"[‎‏‪-‮]", "", regex=True).str.strip()
+        # Leading zeros are significant, keep such IDs as text
+        if text[s.notna()].str.match(r"0\d").any():
+            return s
+        numbers = pd.to_numeric(text.where(s.notna()), errors="coerce")
+    if numbers.notna().sum() != s.notna().sum() or not (numbers.dropna() % 1 == 0).all():
+        return s
+    return numbers.astype("Int64")
+
+
+def _to_date(s: pd.Series, dayfirst: bool = False) -> pd.Series:
+    if is_datetime64_any_dtype(s):
+        return s
+    # Text dates follow the field's order (day first in Priority, 13/03/2024); ISO ones
+    # (2024-03-13) always stay year first. Cells Excel stored as dates come through as datetimes.
+    is_text = s.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    text = s[is_text].astype(str).str.strip()
+    iso = text.str.match(r"\d{4}-\d{1,2}-\d{1,2}").to_numpy(dtype=bool)
+    dates = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    dates[~is_text] = pd.to_datetime(s[~is_text], errors="coerce")
+    dates[text.index[iso]] = pd.to_datetime(text[iso], errors="coerce", format="ISO8601")
+    dates[text.index[~iso]] = pd.to_datetime(text[~iso], errors="coerce", dayfirst=dayfirst, format="mixed")
+    return dates
+
+
+def _to_category(s: pd.Series, ratio=None) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if ratio is not None and len(s) and s.nunique(dropna=True) > ratio * len(s):
+        return s
+    return s.astype("category")
+
+
+def compact_column(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "id":
+        return _to_id(s)
+    if kind == "date":
+        return _to_date(s)
+    if kind == "dmy date":
+        return _to_date(s, dayfirst=True)
+    if kind == "number":
+        return pd.to_numeric(s, errors="coerce")
+    if kind == "category":
+        return _to_category(s)
+    if kind == "text":
+        return _to_category(s, TEXT_CATEGORY_RATIO)
+    return s
+
+
+# 📥 PUBLIC API
+def normalize_frame(df: pd.DataFrame, compact: bool = True) -> pd.DataFrame:
+    """Rename aliased columns to their canonical names and apply the declared dtypes."""
+    mapping = resolve_columns(df.columns)
+    df = df.rename(columns=mapping)
+    df.attrs[ORIGINAL_HEADERS] = {
+        **df.attrs.get(ORIGINAL_HEADERS, {}), **{canonical: str(col) for col, canonical in mapping.items()}
+    }
+    if compact:
+        for col in df.columns:
+            if col in FIELDS:
+                df[col] = compact_column(df[col], FIELDS[col][1])
+    return df
+
+
+def original_headers(df: pd.DataFrame) -> dict:
+    """Canonical name -> header in the uploaded file, for the columns normalize_frame() renamed."""
+    return dict(df.attrs.get(ORIGINAL_HEADERS, {}))
+
+
+def restore_headers(df: pd.DataFrame, headers: dict) -> pd.DataFrame:
+    """``df`` with its canonical column names turned back into the file's headers (see original_headers)."""
+    mapping = {col: headers[col] for col in df.columns if col in headers}
+    return df.rename(columns=mapping) if mapping else df
+
+
+def timestamp_columns(df: pd.DataFrame) -> list:
+    """Columns that may hold timestamps: datetime ones first, then ones named like a date or time."""
+    dated = [col for col in df.columns if is_datetime64_any_dtype(df[col])]
+    named = [col for col in df.columns if col not in dated and any(w in str(col).lower() for w in ("date", "time"))]
+    return dated + named
+
+
+def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Forget categories with no rows left, e.g. after a date filter.
+
+    Keeps value_counts() and groupby() on the filtered frame to observed values only.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
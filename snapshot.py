@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from columnar_store import ARROW_ERRORS, can_read, private_dir, read_frame, user_temp_dir, write_frame
+
+# Columnar snapshots of workbooks that ship with the app (e.g. the Q1 2024 / Q1 2025
+# comparison files used by dashboard.py). Each sheet is converted once to an
+# uncompressed Arrow IPC (Feather) file and reloaded from it, memory-mapped, on
+# every rerun. A manifest records the source size/mtime and SHA-256, so a changed
+# xlsx is detected and its snapshot rebuilt automatically.
+
+SNAPSHOT_DIR_NAME = ".snapshots"
+MANIFEST_VERSION = 1
+
+
+# 🛠 HELPER FUNCTIONS
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_dir(xlsx_path: Path) -> Path:
+    # Next to the workbook when the app directory is writable, else a private
+    # directory under the temp dir (App Engine standard only allows writes under /tmp)
+    if not can_read("feather"):
+        return None
+    key = hashlib.sha1(str(xlsx_path.resolve()).encode("utf-8")).hexdigest()[:12]
+    tmp_root = user_temp_dir("polytex_snapshots")
+    for root in (xlsx_path.parent / SNAPSHOT_DIR_NAME, tmp_root):
+        folder = root / f"{xlsx_path.stem}_{key}"
+        try:
+            if root == tmp_root:
+                private_dir(root)
+            folder.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(folder, os.W_OK):
+            return folder
+    return None
+
+
+def _sheet_id(sheet_name, options) -> str:
+    spec = json.dumps([sheet_name, options], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_manifest(folder: Path) -> dict:
+    try:
+        with open(folder / "manifest.json", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def _save_manifest(folder: Path, manifest: dict):
+    tmp = folder / f"manifest.json.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, folder / "manifest.json")
+
+
+# 📥 PUBLIC API
+def load_workbook_snapshot(xlsx_path, sheets) -> dict:
+    """Return ``{sheet_name: DataFrame}`` for a bundled workbook, via its snapshot.
+
+    ``sheets`` is a list of sheet names or a ``{sheet_name: read options}`` dict,
+    the options being those of ``pd.read_excel``.
+    """
+    xlsx_path = Path(xlsx_path)
+    if not isinstance(sheets, dict):
+        sheets = {name: {} for name in sheets}
+
+    folder = _snapshot_dir(xlsx_path)
+    if folder is None:
+        with pd.ExcelFile(xlsx_path) as workbook:
+            return {name: workbook.parse(sheet_name=name, **options) for name, options in sheets.items()}
+
+    stat = xlsx_path.stat()
+    manifest = _load_manifest(folder)
+    manifest_dirty = False
+    if manifest.get("size") != stat.st_size or manifest.get("mtime_ns") != stat.st_mtime_ns:
+        # Touched (e.g. a fresh checkout) is not the same as changed: compare content
+        sha256 = file_sha256(xlsx_path)
+        if manifest.get("sha256") != sha256:
+            for stale in folder.glob("*.snap"):
+                stale.unlink()
+            manifest = {"version": MANIFEST_VERSION, "source": xlsx_path.name, "sha256": sha256, "sheets": {}}
+        manifest["size"] = stat.st_size
+        manifest["mtime_ns"] = stat.st_mtime_ns
+        manifest_dirty = True
+
+    frames, missing = {}, []
+    for name, options in sheets.items():
+        sheet_id = _sheet_id(name, options)
+        entry = manifest["sheets"].get(sheet_id)
+        snap_path = folder / f"{sheet_id}.snap"
+        if entry and snap_path.exists() and can_read(entry["format"]):
+            frames[name] = read_frame(snap_path, entry["format"])
+        else:
+            missing.append((name, options, sheet_id, snap_path))
+
+    if missing:
+        with pd.ExcelFile(xlsx_path) as workbook:
+            for name, options, sheet_id, snap_path in missing:
+                df = workbook.parse(sheet_name=name, **options)
+                try:
+                    fmt = write_frame(snap_path, df)
+                    manifest["sheets"][sheet_id] = {"sheet": name, "options": options, "format": fmt}
+                except ARROW_ERRORS:
+                    pass  # read from the workbook until it can be stored
+                frames[name] = df
+        manifest_dirty = True
+
+    if manifest_dirty:
+        _save_manifest(folder, manifest)
+
+    return {name: frames[name] for name in sheets}
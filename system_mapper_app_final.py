@@ -2,6 +2,10 @@ import streamlit as st
 import pandas as pd
 import re
 from io import BytesIO
+from excel_writer import ReportWriter
+from lazy_download import artifact_key, lazy_download_button
+from schema import find_column
+from upload_cache import read_excel_cached
 
 def transform_row(makat: str):
     makat = str(makat).upper()
@@ -24,6 +28,14 @@ def transform_row(makat: str):
     else:
         return makat, ""
 
+def pick_column(columns, fields, pattern):
+    # First column in file order named as one of the schema fields or matching the pattern
+    return next(
+        (col for col in columns
+         if any(find_column([col], field) for field in fields) or re.search(pattern, str(col))),
+        None,
+    )
+
 def run_app():
     st.title("🧩 System Mapper")
 
@@ -32,41 +44,32 @@ def run_app():
     if uploaded_files:
         for uploaded_file in uploaded_files:
             try:
-                df = pd.read_excel(uploaded_file)
-
-                col_name = next(
-    (col for col in df.columns if col.strip() in [
-        'מק"ט', "מק'ט", "מק\"ט", 'מקט',
-        'מק"ט בטיפול', "מק'ט בטיפול", 'מק"ט בטיפול'
-    ] or re.search(r"מ[\"']?ק[\"']?ט.*", col)), None
-)
+                df = read_excel_cached(uploaded_file)
 
-
-                desc_col = next(
-                    (col for col in df.columns if col.strip() in [
-                        'תאור מוצר', 'תיאור מוצר', 'תיאור מוצר בטיפול', 'תאור מוצר בטיפול'
-                    ] or re.search(r"ת[אֵו]?ר.*מוצר", col)), None
-                )
+                # Look the columns up through the schema aliases and the loose patterns; the output keeps the original headers
+                col_name = pick_column(df.columns, ['מק"ט', 'מק"ט בטיפול'], r"מ[\"']?ק[\"']?ט.*")
+                desc_col = pick_column(df.columns, ['תאור מוצר', 'תאור מוצר בטיפול'], r"ת[אֵו]?ר.*מוצר")
 
                 if not col_name or not desc_col:
                     st.warning(f'⚠️ Skipped {uploaded_file.name} (No valid מק"ט or תיאור מוצר column found).')
                     continue
 
-                # Apply transformation
-                mapped_df = df[col_name].apply(transform_row).apply(pd.Series)
-                df[col_name] = mapped_df[0]
-                df[desc_col] = mapped_df[1]
-                df["דגם"] = mapped_df[0]
+                def build_mapped(df=df, col_name=col_name, desc_col=desc_col):
+                    # Apply transformation
+                    mapped_df = df[col_name].apply(transform_row).apply(pd.Series)
+                    df[col_name] = mapped_df[0]
+                    df[desc_col] = mapped_df[1]
+                    df["דגם"] = mapped_df[0]
 
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                    df.to_excel(writer, sheet_name="DataSheet", index=False)
-                output.seek(0)
+                    output = BytesIO()
+                    with ReportWriter(output, expected_rows=len(df)) as writer:
+                        writer.write_frame(df, "DataSheet")
+                    return output.getvalue()
 
-                st.download_button(
-                    label=f"📥 Download: {uploaded_file.name}",
-                    data=output,
-                    file_name=uploaded_file.name,
+                # Mapped and written only when downloaded, once per file
+                lazy_download_button(
+                    f"📥 Download: {uploaded_file.name}", artifact_key("system_mapper", uploaded_file),
+                    build_mapped, file_name=uploaded_file.name,
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
             except Exception as e:
@@ -0,0 +1,48 @@
+import os
+import runpy
+
+import pandas as pd
+import pytest
+
+# The alert analyzer is a script; without an upload its UI stops after the file uploader
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alerts_analyzer_streamlit.py")
+
+
+@pytest.fixture(scope="module")
+def alert_blocks():
+    return runpy.run_path(SCRIPT)["alert_blocks"]
+
+
+def baseline_blocks(df, alerts):
+    # The per-station, per-alert loop the report was written with before alert_blocks
+    blocks = []
+    for station in df["station"].unique():
+        station_data = df[df["station"] == station]
+        for alert in alerts:
+            alert_data = station_data[station_data["alert"] == alert]
+            if not alert_data.empty:
+                summary = alert_data.groupby(["alert", "alert details"]).size().reset_index(name="Count")
+                blocks.append((station, alert, [tuple(map(str, record)) for record in summary.itertuples(index=False)]))
+    return blocks
+
+
+def test_blocks_match_the_per_station_loop(alert_blocks):
+    df = pd.DataFrame({
+        "station": ["North", "South", "North", 7, "South", "North", "North", 7, "South", "North"],
+        "alert": ["jam", "door", "jam", "jam", "low", "door", "jam", "low", "door", "low"],
+        "alert details": ["belt", "open", "belt", "motor", "ink", "open", "motor", None, "stuck", "ink"],
+    })
+    alerts = ["low", "jam", "door"]  # the selection order, not sorted
+    stations, blocks, present = alert_blocks(df, alerts)
+    assert list(stations) == ["North", "South", 7]
+
+    got = []
+    for block in present:
+        station, alert = divmod(int(block), len(alerts))
+        got.append((stations[station], alerts[alert], [tuple(map(str, row)) for row in blocks.rows(block)]))
+    assert got == baseline_blocks(df, alerts)
+    assert got[0] == ("North", "low", [("low", "ink", "1")])
+    assert got[1] == ("North", "jam", [("jam", "belt", "2"), ("jam", "motor", "1")])
+    # Station 7 raised "low" only without details: a block with no rows, as the loop wrote it
+    assert got[-2] == (7, "low", [])
+    assert list(blocks.columns) == ["alert", "alert details", "Count"]
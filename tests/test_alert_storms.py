@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_storms import STORM_COLUMNS, StormDetector, detect_storms
+
+
+def brute_force_storms(df, time_col, threshold, window_minutes):
+    # Every alert's window counted by hand, hot windows that share an alert chained into one storm
+    window = window_minutes * 60 * 10**9
+    storms = []
+    for (station, alert), group in df.dropna(subset=["station", "alert", time_col]).groupby(["station", "alert"], sort=False):
+        times = np.sort(pd.to_datetime(group[time_col]).to_numpy(dtype="datetime64[ns]").astype(np.int64))
+        episodes = []  # [first alert, last alert, peak]
+        for i in range(len(times)):
+            first = np.searchsorted(times, times[i] - window, "left")
+            count = i - first + 1
+            if count <= threshold:
+                continue
+            if episodes and first <= episodes[-1][1]:
+                episodes[-1][1], episodes[-1][2] = i, max(episodes[-1][2], count)
+            else:
+                episodes.append([first, i, count])
+        storms += [
+            (station, alert, pd.Timestamp(times[f]), pd.Timestamp(times[l]), l - f + 1, peak)
+            for f, l, peak in episodes
+        ]
+    return sorted(storms, key=_order)
+
+
+def _order(storm):
+    return str(storm[0]), storm[2], str(storm[1])
+
+
+def as_records(storms):
+    return sorted(
+        [(s, a, start, end, int(n), int(peak)) for s, a, start, end, n, peak in storms.itertuples(index=False)],
+        key=_order,
+    )
+
+
+def alert_log(rng, n, stations, alerts):
+    df = pd.DataFrame({
+        "station": rng.choice([f"s{i}" for i in range(stations)] + [3], n),
+        "alert": rng.choice([f"a{i}" for i in range(alerts)], n),
+        "when": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 6 * 3600, n), unit="s"),
+    })
+    df.loc[rng.choice(n, 5), "when"] = None
+    return df
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_chunked_and_whole_log_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    df = alert_log(rng, int(rng.integers(100, 800)), int(rng.integers(1, 5)), int(rng.integers(1, 4)))
+    threshold, window = int(rng.integers(1, 6)), int(rng.integers(5, 90))
+    expected = brute_force_storms(df, "when", threshold, window)
+    assert expected
+    for chunk_rows in (None, 7, 37, 400):
+        assert as_records(detect_storms(df, "when", threshold, window, chunk_rows=chunk_rows)) == expected
+
+
+def test_single_row_chunks_match_brute_force():
+    df = alert_log(np.random.default_rng(11), 120, 2, 2)
+    expected = brute_force_storms(df, "when", 2, 60)
+    assert expected
+    assert as_records(detect_storms(df, "when", 2, 60, chunk_rows=1)) == expected
+
+
+def test_storm_spanning_chunks_is_reported_once():
+    times = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(30), unit="min")
+    df = pd.DataFrame({"station": "A", "alert": "jam", "when": times})
+    detector = StormDetector("when", threshold=3, window_minutes=5)
+    for first in range(0, 30, 7):
+        detector.feed(df.iloc[first:first + 7])
+    storms = detector.storms()
+    assert list(storms.columns) == STORM_COLUMNS
+    assert len(storms) == 1
+    assert storms.loc[0, "Storm Start"] == times[0]
+    assert storms.loc[0, "Storm End"] == times[-1]
+    assert storms.loc[0, "Alerts"] == 30
+    assert storms.loc[0, "Peak Alerts in Window"] == 6
+
+
+def test_out_of_order_chunks_are_rejected():
+    df = pd.DataFrame({"station": "A", "alert": "jam", "when": pd.to_datetime(["2024-01-02", "2024-01-01"])})
+    detector = StormDetector("when").feed(df.iloc[:1])
+    with pytest.raises(ValueError):
+        detector.feed(df.iloc[1:])
+
+
+def test_empty_log_has_no_storms():
+    df = pd.DataFrame({"station": [], "alert": [], "when": pd.to_datetime([])})
+    storms = detect_storms(df, "when")
+    assert storms.empty
+    assert list(storms.columns) == STORM_COLUMNS
@@ -0,0 +1,8 @@
+from cache_keys import freeze_key
+
+
+def test_equal_selections_give_equal_keys():
+    assert freeze_key({"b": [1, 2], "a": {"x", "y"}}) == freeze_key({"a": {"y", "x"}, "b": (1, 2)})
+    assert freeze_key({"dtype": str}) == (("dtype", "str"),)
+    assert freeze_key([1, 2]) != freeze_key([2, 1])
+    hash(freeze_key({"sheets": ["a", "b"], "usecols": {"x"}, "n": None}))
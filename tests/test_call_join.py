@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from call_join import CALL, CallJoin, call_keys
+
+
+def test_call_keys_normalize_numbers_and_keep_text_apart():
+    keys, valid = call_keys(pd.Series(["1234", " 1234.0 ", "‎1234", "01234", "A-7", None, "", "1234.5"]))
+    assert valid.tolist() == [True, True, True, True, True, False, False, True]
+    assert keys[0] == keys[1] == keys[2] == 1234
+    assert len({keys[0], keys[3], keys[4], keys[7]}) == 4
+
+
+def test_numeric_call_keys():
+    keys, valid = call_keys(pd.Series([1234.0, np.nan, 1.5]))
+    assert valid.tolist() == [True, False, False]
+    assert keys[0] == 1234
+    keys, valid = call_keys(pd.Series([1234, None, 7], dtype="Int64"))
+    assert valid.tolist() == [True, False, True]
+    assert keys[[0, 2]].tolist() == [1234, 7]
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("how", ["left", "inner"])
+def test_merges_match_pandas(seed, how):
+    rng = np.random.default_rng(seed)
+    n, m = int(rng.integers(0, 60)), int(rng.integers(0, 80))
+    calls = pd.DataFrame({CALL: rng.integers(1, 40, n).astype(float), "site": rng.choice(["a", "b"], n), "x": rng.random(n)})
+    parts = pd.DataFrame({CALL: rng.integers(1, 45, m), "x": rng.random(m), "q": rng.integers(0, 3, m)})
+    join = CallJoin(calls[CALL], parts[CALL])
+    # Filtered frames are joined through their index, as the tools pass them
+    calls, parts = calls[calls["x"] > 0.3], parts[parts["q"] > 0]
+    as_int = calls.assign(**{CALL: calls[CALL].astype("int64")})
+
+    merged = join.merge_calls(calls, parts, how)
+    expected = pd.merge(as_int, parts, on=CALL, how=how)
+    pd.testing.assert_frame_equal(merged.assign(**{CALL: merged[CALL].astype("int64")}), expected, check_dtype=False)
+
+    merged = join.merge_parts(parts, calls, how)
+    pd.testing.assert_frame_equal(merged, pd.merge(parts, as_int, on=CALL, how=how), check_dtype=False)
+
+
+def test_text_and_numeric_call_numbers_join():
+    calls = pd.DataFrame({CALL: ["1001", "01002", "1003.0"], "site": ["a", "b", "c"]})
+    parts = pd.DataFrame({CALL: [1001, 1002, 1003, 1003], "part": ["p1", "p2", "p3", "p4"]})
+    merged = CallJoin(calls[CALL], parts[CALL]).merge_calls(calls, parts, "left")
+    assert merged["site"].tolist() == ["a", "b", "c", "c"]
+    assert merged["part"].fillna("-").tolist() == ["p1", "-", "p3", "p4"]
@@ -0,0 +1,62 @@
+import json
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+import columnar_store
+
+pytestmark = pytest.mark.skipif(columnar_store.feather is None, reason="pyarrow is not installed")
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    folder = tmp_path / "store"
+    monkeypatch.setattr(columnar_store, "STORE_DIR", folder)
+    return folder
+
+
+def test_mixed_columns_are_stored_as_text(store):
+    df = pd.DataFrame({"call": [1234, "A-7", None], "qty": [1.0, 2.0, None]})
+    columnar_store.put("key", df)
+    stored = columnar_store.get("key")
+    assert stored["call"].tolist()[:2] == ["1234", "A-7"]
+    assert pd.isna(stored["call"].iloc[2])
+    assert stored["qty"].tolist()[:2] == [1.0, 2.0]
+    assert columnar_store.arrow_safe(df)["call"].tolist()[:2] == ["1234", "A-7"]
+    assert df["call"].tolist()[:2] == [1234, "A-7"]
+
+
+def test_fresh_parses_are_returned_unmodified(store, tmp_path):
+    import upload_cache
+
+    upload_cache.clear_cache()
+    path = str(tmp_path / "mixed.xlsx")
+    pd.DataFrame({"call": [1234, "A-7", None]}).to_excel(path, index=False)
+    # Only the stored copy holds the mixed column as text
+    assert upload_cache.read_excel_cached(path)["call"].tolist()[:2] == [1234, "A-7"]
+    upload_cache.clear_cache()
+    assert upload_cache.read_excel_cached(path)["call"].tolist()[:2] == ["1234", "A-7"]
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_store_directory_is_private(store):
+    columnar_store.put("key", pd.DataFrame({"a": [1]}))
+    assert store.stat().st_mode & 0o777 == 0o700
+    store.chmod(0o777)
+    assert columnar_store.get("key") is None
+    with pytest.raises(PermissionError):
+        columnar_store.private_dir(store)
+
+
+def test_pickled_entries_are_never_loaded(store):
+    columnar_store.private_dir(store)
+    data_path, meta_path = columnar_store._paths(columnar_store._entry_id("key"))
+    with open(data_path, "wb") as f:
+        pickle.dump(pd.DataFrame({"a": [1]}), f)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"format": "pickle"}, f)
+    assert columnar_store.get("key") is None
+    with pytest.raises(ValueError):
+        columnar_store.read_frame(data_path, "pickle")
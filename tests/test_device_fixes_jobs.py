@@ -0,0 +1,32 @@
+from io import BytesIO
+
+import pandas as pd
+
+from device_fixes_jobs import run_jobs
+from repeat_engine import CREDITED
+from schema import normalize_frame, original_headers
+
+
+def calls():
+    df = normalize_frame(pd.DataFrame({
+        "מספר מכשיר": [1, 1, 2],
+        "תאריך קריאה": ["01/03/2024", "13/03/2024", "02/03/2024"],
+        "שם טכנאי": ["Dana", "Eli", "Dana"],
+        "תיאור קוד התקלה": ["jam", "jam", "noise"],
+        "תיאור התיקון": ["fixed", "fixed", "fixed"],
+        "תיאור מוצר": ["P1", "P1", "P2"],
+    }))
+    df["Repeated Call"] = [False, True, False]
+    df[CREDITED] = [None, "Eli", None]
+    return df
+
+
+def test_outputs_keep_the_uploaded_headers():
+    df = calls()
+    results = run_jobs(df, ["problem_device", "device_lifecycle"], ["techs"], headers=original_headers(df), workers=1)
+    main = pd.read_excel(BytesIO(results["main"][0]), sheet_name=None)
+    assert list(main["Device 1"].columns) == ["תאריך קריאה", "תיאור קוד התקלה", "תיאור התיקון"]
+    assert list(main["Device Lifecycle"].columns)[0] == "מספר מכשיר"
+    per_tech = pd.read_excel(BytesIO(results["techs"][0]), sheet_name=None)
+    assert sorted(per_tech) == ["Dana", "Eli"]
+    assert "שם טכנאי" in per_tech["Dana"].columns and CREDITED not in per_tech["Dana"].columns
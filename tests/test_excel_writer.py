@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from excel_writer import ReportWriter, clean_sheet_name
+
+
+def test_sheet_names_are_cleaned_and_unique():
+    assert clean_sheet_name("a/b:c?") == "a_b_c_"
+    assert clean_sheet_name("'quoted'") == "quoted"
+    assert clean_sheet_name("x" * 30 + "'tail") == "x" * 30
+    with ReportWriter() as writer:
+        names = [writer.add_sheet(name).name for name in ["Tech", "tech", "TECH", "x" * 40, "x" * 40, ""]]
+    assert names == ["Tech", "tech (2)", "TECH (3)", "x" * 31, "x" * 27 + " (2)", "Sheet"]
+    assert openpyxl.load_workbook(BytesIO(writer.getvalue())).sheetnames == names
+
+
+def test_streamed_groups_keep_every_sheet(tmp_path):
+    df = pd.DataFrame({"tech": [f"t{i % 300}" for i in range(3000)], "value": range(3000)})
+    path = str(tmp_path / "groups.xlsx")
+    with ReportWriter(path, constant_memory=True) as writer:
+        assert writer.write_groups(df, "tech") == 300
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    assert len(workbook.sheetnames) == 300
+    assert [row[1] for row in workbook["t7"].iter_rows(values_only=True)] == ["value"] + list(range(7, 3000, 300))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count open files")
+def test_streamed_sheets_do_not_hold_file_handles(tmp_path):
+    df = pd.DataFrame({"tech": range(200), "value": range(200)})
+    before = len(os.listdir("/proc/self/fd"))
+    with ReportWriter(str(tmp_path / "many.xlsx"), constant_memory=True) as writer:
+        writer.write_groups(df, "tech")
+        assert len(os.listdir("/proc/self/fd")) - before < 10
+
+
+def test_stale_reports_are_swept(monkeypatch, tmp_path):
+    import excel_writer
+
+    monkeypatch.setattr(excel_writer.tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(excel_writer, "_last_sweep", 0.0)
+    old, fresh = excel_writer.temp_report_path("per_device_"), excel_writer.temp_report_path("per_device_")
+    os.utime(old, (0, 0))
+    other = tmp_path / "unrelated.xlsx"
+    other.write_bytes(b"")
+    os.utime(other, (0, 0))
+    assert excel_writer.remove_stale_reports() == 1
+    assert not os.path.exists(old) and os.path.exists(fresh) and other.exists()
+    # Swept at most once per interval
+    os.utime(fresh, (0, 0))
+    assert excel_writer.remove_stale_reports() == 0
+
+
+def test_xlsxwriter_has_the_internals_finish_sheet_uses():
+    # Streamed exports close finished sheets through these; see requirements.txt for the pin
+    from xlsxwriter.worksheet import Worksheet
+
+    assert callable(getattr(Worksheet, "_write_single_row", None))
+    assert callable(getattr(Worksheet, "_opt_close", None))
+
+
+def test_finish_sheet_without_the_internals_fails_clearly(monkeypatch, tmp_path):
+    from xlsxwriter.worksheet import Worksheet
+
+    with ReportWriter(str(tmp_path / "plain.xlsx")) as writer:
+        writer.finish_sheet(writer.add_sheet("kept in memory"))
+    monkeypatch.delattr(Worksheet, "_opt_close")
+    writer = ReportWriter(str(tmp_path / "streamed.xlsx"), constant_memory=True)
+    with pytest.raises(RuntimeError, match="_opt_close"):
+        writer.finish_sheet(writer.add_sheet("streamed"))
+    monkeypatch.undo()
+    writer.close()
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from nri import get_unreturned_items, latest_transactions_streaming, _filter_unreturned
+
+
+def transactions():
+    return pd.DataFrame({
+        "RFID": ["b", "a", "a", "b", "c", "c"],
+        "UserName": ["Dana", "Noa", None, "Eli", "Avi", "Avi"],
+        "ItemTypeName": ["Gown", "Towel", "Towel", "Gown", "Sheet", "Sheet"],
+        "CreatedDate": ["2024-01-01 08:00", "2024-01-01 09:00", "2024-01-02 09:00",
+                        "2024-01-01 08:00", "2024-01-01 10:00", "2024-01-03 10:00"],
+        "TransactionType": ["Delivery", "Delivery", "Delivery", "Delivery", "Delivery", "Return"],
+    }).astype(str).replace("None", None)
+
+
+def test_in_memory_and_streaming_keep_the_same_latest_rows():
+    df = transactions()
+    in_memory = get_unreturned_items(df, 30)
+    streamed = _filter_unreturned(latest_transactions_streaming([df.iloc[:3], df.iloc[3:]]), 30)
+    pd.testing.assert_frame_equal(in_memory, streamed, check_dtype=False, check_categorical=False)
+
+    assert list(in_memory["RFID"]) == ["a", "b"]
+    # The latest row of "a" has no user; it is not filled in from the older one
+    assert pd.isna(in_memory.loc[0, "UserName"])
+    # On equal timestamps the row that came later in the file wins
+    assert in_memory.loc[1, "UserName"] == "Eli"
@@ -0,0 +1,141 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import repeat_engine
+from repeat_engine import (
+    ACTION, CALL, CALL_TYPE, DEVICE, FAULT, OPENED, PAIR_COLUMNS, TECHNICIAN,
+    find_repeat_pairs, repeat_window_summary, technician_repeat_rates, window_label,
+)
+
+WINDOWS = [7, 30, 90]
+CALL_TYPES = ["ביקור טכני", "התקנה", "טלפוני"]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    repeat_engine.clear_cache()
+
+
+@pytest.fixture
+def calls():
+    rng = np.random.default_rng(7)
+    n = 3000
+    opened = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 200 * 24 * 60, n), unit="min")
+    df = pd.DataFrame({
+        CALL: np.arange(100000, 100000 + n),
+        OPENED: opened.where(rng.random(n) > 0.05),
+        DEVICE: np.where(rng.random(n) > 0.05, rng.integers(1, 400, n), np.nan),
+        TECHNICIAN: rng.choice([f"tech {i}" for i in range(8)], n),
+        FAULT: rng.choice(["לא מדפיס", "תקוע", "רעש"], n),
+        ACTION: rng.choice(["החלפה", "כיול", "ניקוי"], n),
+        CALL_TYPE: rng.choice(CALL_TYPES, n),
+    })
+    # Same-day calls on a device, so the window edges and ties are exercised
+    df.loc[1::50, [DEVICE, OPENED]] = df.loc[0::50, [DEVICE, OPENED]].to_numpy()[: len(df.loc[1::50])]
+    return df
+
+
+def baseline(calls, window=30, call_types=None, attribution="first"):
+    # The iterrows loop repeated_calls ran before repeat_engine, with its window,
+    # call types and attribution made parameters. Sorting is stable, as in the engine.
+    df = calls if not call_types else calls[calls[CALL_TYPE].isin(call_types)]
+    df = df.copy()
+    df[OPENED] = pd.to_datetime(df[OPENED], errors="coerce")
+    df = df.sort_values(by=[DEVICE, OPENED], kind="stable")
+
+    device_calls = defaultdict(list)
+    for _, row in df.iterrows():
+        device_id = row[DEVICE]
+        if device_calls[device_id]:
+            last_call = device_calls[device_id][-1]
+            if (row[OPENED] - last_call[OPENED]).days <= window:
+                last_call["repeats"].append(row)
+        device_calls[device_id].append({**row.to_dict(), "repeats": []})
+
+    technician_data = defaultdict(list)
+    for device in device_calls.values():
+        for call in device:
+            for repeat in call["repeats"]:
+                credited = call[TECHNICIAN] if attribution == "first" else repeat[TECHNICIAN]
+                technician_data[credited].append([
+                    call[CALL], call[FAULT], call[ACTION],
+                    repeat[CALL], repeat[FAULT], repeat[ACTION], call[DEVICE],
+                ])
+
+    percentages = {
+        tech: len(records) / (df[TECHNICIAN] == tech).sum() * 100
+        for tech, records in technician_data.items()
+    }
+    return technician_data, percentages
+
+
+def engine_pairs_by_technician(pairs, window):
+    pairs = pairs[pairs[window_label(window)]]
+    return {
+        tech: group[PAIR_COLUMNS].to_numpy().tolist()
+        for tech, group in pairs.groupby(TECHNICIAN, sort=False)
+    }
+
+
+@pytest.mark.parametrize("attribution", ["first", "repeat"])
+@pytest.mark.parametrize("call_types", [None, ["ביקור טכני"], ["ביקור טכני", "התקנה"]])
+def test_pairs_and_rates_match_the_iterrows_loop(calls, call_types, attribution):
+    pairs = find_repeat_pairs(calls, WINDOWS, call_types=call_types, attribution=attribution)
+    for window in WINDOWS:
+        expected_pairs, expected_rates = baseline(calls, window, call_types, attribution)
+        assert expected_pairs
+        assert engine_pairs_by_technician(pairs, window) == dict(expected_pairs)
+
+        rates = technician_repeat_rates(calls, pairs, window, call_types=call_types)
+        assert rates["Percentage"].to_dict() == pytest.approx(expected_rates)
+
+
+def test_window_summary_matches_the_iterrows_loop(calls):
+    pairs = find_repeat_pairs(calls, WINDOWS)
+    summary = repeat_window_summary(calls, pairs, WINDOWS).set_index("Technician")
+    for window in WINDOWS:
+        _, expected_rates = baseline(calls, window)
+        percentages = summary[f"% ({window} days)"]
+        assert percentages[percentages > 0].to_dict() == pytest.approx(
+            {tech: round(rate, 2) for tech, rate in expected_rates.items()}
+        )
+
+
+def test_calls_without_device_or_date_are_never_paired(calls):
+    pairs = find_repeat_pairs(calls, WINDOWS)
+    undated = set(calls.loc[calls[OPENED].isna(), CALL])
+    no_device = set(calls.loc[calls[DEVICE].isna(), CALL])
+    assert pairs[DEVICE].notna().all()
+    assert not set(pairs["קריאה חוזרת"]) & (undated | no_device)
+
+
+def test_schema_dtypes_give_the_same_pairs(calls):
+    compact = calls.astype({DEVICE: "Int64", TECHNICIAN: "category", CALL_TYPE: "category"})
+    expected = find_repeat_pairs(calls, WINDOWS)
+    repeat_engine.clear_cache()
+    pairs = find_repeat_pairs(compact, WINDOWS)
+    assert pairs[PAIR_COLUMNS[:-1]].equals(expected[PAIR_COLUMNS[:-1]])
+    assert pairs[DEVICE].astype(float).tolist() == expected[DEVICE].tolist()
+
+
+@pytest.mark.parametrize("attribution", ["first", "repeat"])
+def test_marks_keep_calls_of_other_types(calls, attribution):
+    call_types = ["ביקור טכני"]
+    marked = repeat_engine.mark_repeats(calls, [30], call_types=call_types, attribution=attribution)
+    assert len(marked) == len(calls)
+    assert sorted(marked[CALL]) == sorted(calls[CALL])
+
+    other = ~marked[CALL_TYPE].isin(call_types)
+    assert other.any()
+    assert not marked.loc[other, window_label(30)].any()
+    assert marked.loc[other, [repeat_engine.PREVIOUS_DATE, repeat_engine.CREDITED]].isna().all().all()
+
+    # The calls of the selected types are marked exactly as when they are the only ones
+    repeat_engine.clear_cache()
+    alone = repeat_engine.mark_repeats(calls[calls[CALL_TYPE].isin(call_types)], [30], attribution=attribution)
+    pd.testing.assert_frame_equal(marked[~other], alone)
+    pairs = find_repeat_pairs(calls, [30], call_types=call_types, attribution=attribution)
+    assert sorted(marked.loc[marked[window_label(30)], CALL]) == sorted(pairs["קריאה חוזרת"])
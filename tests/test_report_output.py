@@ -0,0 +1,41 @@
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+
+from parts_by_site_report import build_report
+from report_output import Report, render
+
+
+def merged_parts():
+    return pd.DataFrame({
+        "Site Name": ["North", "South", "North", "South", None],
+        "Part Number": ["P1", "P1", "P2", "P3", "P9"],
+        "Part Description": ["Belt", "Belt", "Roller", "Fuse", "Lost"],
+        "Quantity Used": [2, 1, 5, 3, 1],
+    })
+
+
+def test_parquet_keeps_the_group_column():
+    data = render(build_report(merged_parts(), ["South", "North"]), "parquet")
+    table = pd.read_parquet(BytesIO(data))
+    assert list(table.columns) == ["Site Name", "Part Number", "Part Description", "Quantity Used"]
+    assert table["Site Name"].astype(str).tolist() == ["South", "South", "North", "North"]
+    assert table["Part Number"].tolist() == ["P3", "P1", "P2", "P1"]
+
+
+def test_split_groups_still_drop_the_group_column():
+    data = render(build_report(merged_parts(), ["South", "North"]), "csv")
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        assert sorted(archive.namelist()) == ["North.csv", "South.csv"]
+        north = pd.read_csv(archive.open("North.csv"), encoding="utf-8-sig")
+    assert list(north.columns) == ["Part Number", "Part Description", "Quantity Used"]
+    sheets = pd.read_excel(BytesIO(render(build_report(merged_parts(), ["South", "North"]))), sheet_name=None)
+    assert list(sheets) == ["South", "North"]
+    assert "Site Name" not in sheets["South"].columns
+
+
+def test_other_dropped_columns_leave_the_single_table():
+    df = pd.DataFrame({"tech": ["a", "b"], "note": ["x", "y"], "n": [1, 2]})
+    table = pd.read_parquet(BytesIO(render(Report().add_groups("Techs", df, "tech", drop=["note"]), "parquet")))
+    assert list(table.columns) == ["tech", "n"]
@@ -0,0 +1,146 @@
+import os
+import runpy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from schema import normalize_frame
+
+# The RFID analyzer is a script; without an upload its UI stops after the file uploader
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rfid_analysis_streamlit.py")
+
+
+@pytest.fixture(scope="module")
+def rfid():
+    return runpy.run_path(SCRIPT)
+
+
+def reads(rng, n, tags):
+    df = pd.DataFrame({
+        "RFID": [f"E{v:05d}" for v in rng.integers(0, tags, n)],
+        "Item Type Name": "Towel",
+        "Item Sub Type Name": "Large",
+        "Station Name": rng.choice(["Laundry", "Ward A", "Ward B"], n),
+        "Created Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 86400, n), unit="s"),
+    })
+    df.loc[rng.choice(n, n // 50), "Created Date"] = None
+    df.loc[rng.choice(n, n // 50), "RFID"] = None
+    return normalize_frame(df)
+
+
+def brute_force_duplicates(df, time_col, seconds):
+    duplicates = []
+    for tag, group in df.dropna(subset=["RFID", time_col]).groupby("RFID", observed=True):
+        group = group.sort_values(time_col, kind="stable")
+        times, stations = group[time_col].tolist(), group["StationName"].tolist()
+        for i in range(1, len(group)):
+            gap = (times[i] - times[i - 1]).total_seconds()
+            if gap <= seconds:
+                duplicates.append((tag, stations[i], stations[i - 1], gap))
+    return sorted(duplicates)
+
+
+@pytest.mark.parametrize("seconds", [0, 60, 900])
+def test_duplicates_match_brute_force(rfid, seconds):
+    df = reads(np.random.default_rng(seconds), 4000, 300)
+    duplicates = rfid["find_duplicate_reads"](df, "CreatedDate", seconds)
+    got = sorted(zip(duplicates["RFID"], duplicates["StationName"], duplicates["Previous Station"],
+                     duplicates["Seconds Since Previous"]))
+    expected = brute_force_duplicates(df, "CreatedDate", seconds)
+    assert expected
+    assert got == expected
+    assert (duplicates["Same Station"] == (duplicates["StationName"] == duplicates["Previous Station"])).all()
+
+
+def test_duplicate_rates_per_station(rfid):
+    df = normalize_frame(pd.DataFrame({
+        "RFID": ["a", "a", "a", "b", "b", "c"],
+        "Item Type Name": "Towel",
+        "Item Sub Type Name": "Large",
+        "Station Name": ["Laundry", "Laundry", "Ward A", "Ward A", "Ward A", "Laundry"],
+        "Created Date": pd.to_datetime([
+            "2024-01-01 08:00:00", "2024-01-01 08:00:30", "2024-01-01 08:05:00",
+            "2024-01-01 09:00:00", "2024-01-01 09:00:10", "2024-01-01 10:00:00",
+        ]),
+    }))
+    duplicates = rfid["find_duplicate_reads"](df, "CreatedDate", 60)
+    assert list(duplicates["RFID"]) == ["a", "b"]
+    rates = rfid["duplicate_rates"](df, duplicates).set_index("StationName")
+    assert rates.loc["Ward A", ["Reads", "Duplicate Reads", "Same-Station Duplicates"]].tolist() == [3, 1, 1]
+    assert rates.loc["Laundry", ["Reads", "Duplicate Reads", "Same-Station Duplicates"]].tolist() == [3, 1, 1]
+    assert rates.loc["Ward A", "Duplicate Rate (%)"] == pytest.approx(33.33)
+
+
+def test_report_keeps_the_uploaded_headers(rfid):
+    from schema import original_headers
+
+    df = reads(np.random.default_rng(1), 500, 40)
+    duplicates = rfid["find_duplicate_reads"](df, "CreatedDate", 900)
+    report = rfid["build_report"](df, {"Total Transactions": len(df)}, duplicates,
+                                  rfid["duplicate_rates"](df, duplicates), original_headers(df))
+    tables = {sheet: content[0][1] for sheet, (_, content) in report.sheets.items()}
+    assert list(tables["Mismatched Data"].columns) == ["RFID", "Item Type Name", "Item Sub Type Name", "Station Name", "Created Date"]
+    assert list(tables["Duplicate Reads"].columns)[:5] == ["RFID", "Item Type Name", "Item Sub Type Name", "Station Name", "Created Date"]
+    assert list(tables["Duplicates by Station"].columns)[0] == "Station Name"
+
+
+def tag_reads(rng, n, tags):
+    # Tags read as a few item types and sub types, with missing tags and types
+    df = pd.DataFrame({
+        "RFID": [f"E{v:04d}" for v in rng.integers(0, tags, n)],
+        "Item Type Name": rng.choice(["Towel", "Sheet"], n, p=[0.9, 0.1]),
+        "Item Sub Type Name": rng.choice(["Large", "Small"], n, p=[0.9, 0.1]),
+        "Station Name": rng.choice(["Laundry", "Ward A"], n),
+    })
+    for col in ["RFID", "Item Type Name", "Item Sub Type Name"]:
+        df.loc[rng.choice(n, n // 20), col] = None
+    return df
+
+
+def baseline_mismatches(df):
+    # The groupby loop the analyzer ran before mismatch_mask
+    mismatches = []
+    for _, group in df.groupby("RFID"):
+        if group["ItemTypeName"].nunique() > 1 or group["ItemSubTypeName"].nunique() > 1:
+            mismatches.append(group)
+    return pd.concat(mismatches) if mismatches else pd.DataFrame(columns=df.columns)
+
+
+def as_text(df):
+    return df[["RFID", "ItemTypeName", "ItemSubTypeName", "StationName"]].astype(object).where(df.notna(), None)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mismatch_mask_matches_the_groupby_loop(rfid, seed):
+    df = normalize_frame(tag_reads(np.random.default_rng(seed), 600, 80))
+    expected = baseline_mismatches(df)
+    assert len(expected)
+    got = df[rfid["mismatch_mask"](df)].sort_values("RFID", kind="stable")
+    assert got.index.tolist() == expected.index.tolist()
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 64, 1000])
+def test_streamed_mismatches_match_in_memory(rfid, monkeypatch, tmp_path, chunk_rows):
+    import columnar_store
+    import upload_cache
+
+    monkeypatch.setattr(columnar_store, "STORE_DIR", tmp_path / "store")
+    upload_cache.clear_cache()
+    path = str(tmp_path / "reads.xlsx")
+    tag_reads(np.random.default_rng(chunk_rows), 300, 40).to_excel(path, index=False)
+
+    df = normalize_frame(pd.read_excel(path))
+    expected = baseline_mismatches(df)
+    chunks = [normalize_frame(df.iloc[i:i + chunk_rows]) for i in range(0, len(df), chunk_rows)]
+    tags, total = rfid["mismatched_tags_streaming"](chunks)
+    assert total == len(df)
+    assert sorted(tags) == sorted(expected["RFID"].unique())
+
+    monkeypatch.setitem(rfid["_read_chunks"].__globals__, "STREAM_CHUNK_ROWS", chunk_rows)
+    streamed, streamed_summary = rfid["process_excel_streaming"](path)
+    in_memory, summary = rfid["process_excel"](path)
+    assert streamed_summary == summary
+    assert summary["Mismatched RFID Count"] == expected["RFID"].nunique()
+    pd.testing.assert_frame_equal(as_text(streamed).reset_index(drop=True), as_text(in_memory).reset_index(drop=True))
+    pd.testing.assert_frame_equal(as_text(in_memory), as_text(expected))
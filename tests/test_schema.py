@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pandas as pd
+
+from schema import normalize_frame
+
+
+def test_text_dates_are_day_first():
+    df = normalize_frame(pd.DataFrame({"תאריך קריאה": ["13/03/2024", "05/03/2024", "01/04/2024 08:15", None]}))
+    assert list(df["ת. פתיחה"][:3]) == [
+        pd.Timestamp("2024-03-13"), pd.Timestamp("2024-03-05"), pd.Timestamp("2024-04-01 08:15"),
+    ]
+    assert pd.isna(df["ת. פתיחה"][3])
+
+
+def test_iso_and_excel_dates_keep_their_order():
+    df = normalize_frame(pd.DataFrame({"ת. פתיחה": ["2024-04-01 10:00:00", datetime(2024, 3, 5), "13/03/2024", "not a date"]}))
+    assert list(df["ת. פתיחה"][:3]) == [
+        pd.Timestamp("2024-04-01 10:00"), pd.Timestamp("2024-03-05"), pd.Timestamp("2024-03-13"),
+    ]
+    assert pd.isna(df["ת. פתיחה"][3])
+
+
+def test_date_order_is_set_per_field():
+    # Priority dates are day first, PM8 ones month first as pandas reads them
+    df = normalize_frame(pd.DataFrame({
+        "תאריך קריאה": ["03/04/2024", "2024-03-04"],
+        "Created Date": ["03/04/2024", "2024-03-04"],
+    }))
+    assert list(df["ת. פתיחה"]) == [pd.Timestamp("2024-04-03"), pd.Timestamp("2024-03-04")]
+    assert list(df["CreatedDate"]) == [pd.Timestamp("2024-03-04"), pd.Timestamp("2024-03-04")]
+    assert pd.to_datetime(pd.Series(["03/04/2024"]))[0] == df["CreatedDate"][0]
+
+
+def test_aliases_resolve_to_canonical_names():
+    df = normalize_frame(pd.DataFrame({"מספר קריאה": [1, 2], "שם טכנאי": ["a", "b"]}))
+    assert list(df.columns) == ["מס. קריאה", "לטיפול"]
+    assert str(df["מס. קריאה"].dtype) == "Int64"
+
+
+def test_cache_keys_carry_the_schema_version(monkeypatch, tmp_path):
+    import columnar_store
+    import schema
+    import upload_cache
+
+    monkeypatch.setattr(columnar_store, "STORE_DIR", tmp_path)
+    upload_cache.clear_cache()
+    df = pd.DataFrame({"a": [1, 2]})
+    key = ("digest", "xlsx", 0, (), schema.SCHEMA_VERSION)
+    columnar_store.put(key, df)
+    assert columnar_store.get(key) is not None
+    monkeypatch.setattr(columnar_store, "SCHEMA_VERSION", "older")
+    assert columnar_store.get(key) is None
+
+
+def test_renamed_headers_can_be_restored():
+    from schema import original_headers, restore_headers
+
+    df = normalize_frame(pd.DataFrame({"מספר קריאה": [1], "שם טכנאי": ["a"], "דגם": ["x"]}))
+    headers = original_headers(df)
+    assert headers == {"מס. קריאה": "מספר קריאה", "לטיפול": "שם טכנאי"}
+    # Carried through filtering, and through a second normalization
+    assert original_headers(normalize_frame(df[df["דגם"] == "x"])) == headers
+    table = df.groupby("לטיפול", observed=True).size().reset_index(name="Calls")
+    assert list(restore_headers(table, headers).columns) == ["שם טכנאי", "Calls"]
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scfapp import CALL_COL, SCORE_COL, _matching_rows, top_calls
+from text_index import FuzzyIndex, PrefixIndex, TextIndex, normalize_hebrew, word_trigrams
+
+# Regex metacharacters, Hebrew (with a final letter) and spaces, so literal matching is exercised
+ALPHABET = list("ab .*+?()[]{}|^$\\") + list("אבשלום")
+
+
+def random_text(rng, n):
+    values = ["".join(rng.choice(ALPHABET, rng.integers(0, 12))) for _ in range(n)]
+    values = pd.Series(values, dtype=object)
+    values[rng.random(n) < 0.05] = np.nan
+    values[rng.random(n) < 0.05] = "nan"
+    return values
+
+
+def queries(rng, values):
+    present = values.dropna()
+    picked = [
+        text[start:start + length]
+        for text in rng.choice(present.to_numpy(), 30)
+        for start, length in [(rng.integers(0, len(text) + 1), rng.integers(0, 8))]
+    ]
+    return picked + ["", "a", "נ", ".*", "(a", "[]", "\\", "nan", "na", "שלום", "ab ab ab", "zzz"]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_text_index_matches_pandas(seed):
+    rng = np.random.default_rng(seed)
+    values = random_text(rng, int(rng.integers(1, 400)))
+    index = TextIndex(values)
+    for query in queries(rng, values):
+        contains = np.flatnonzero(values.str.contains(query, regex=False, na=False).to_numpy(dtype=bool))
+        equal = np.flatnonzero((values == query).to_numpy(dtype=bool))
+        assert index.rows_containing(query).tolist() == contains.tolist(), query
+        assert index.rows_equal(query).tolist() == equal.tolist(), query
+        assert _matching_rows(index, query, is_exact=False).tolist() == contains.tolist(), query
+        assert _matching_rows(index, query, is_exact=True).tolist() == equal.tolist(), query
+        assert list(index.values_in(contains)) == sorted(values.iloc[contains].dropna().unique()), query
+    assert list(index.values) == sorted(values.dropna().unique())
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_prefix_index_matches_startswith(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    keys = pd.Series(rng.integers(1, 5000, n).astype(str), dtype=object)
+    keys[rng.random(n) < 0.3] = random_text(rng, n)
+    index = PrefixIndex(keys)
+    distinct = keys.dropna().astype(str).unique()
+    for prefix in queries(rng, keys) + ["1", "12", "9", "0"]:
+        expected = sorted(key for key in distinct if key.startswith(prefix))
+        assert list(index.keys_with_prefix(prefix)) == expected, prefix
+
+
+def dice(a, b):
+    a, b = word_trigrams(normalize_hebrew(a)), word_trigrams(normalize_hebrew(b))
+    return 2 * len(a & b) / max(len(a) + len(b), 1)
+
+
+@pytest.fixture
+def finder_rows():
+    # Part rows of each call, interleaved as a merge can leave them
+    calls = {
+        "101": "המדפסת לא מדפיסה",
+        "102": "מדפסת תקועה",
+        "103": "רעש במנוע",
+        "104": "המדפסת לא מדפיסה בכלל",
+        "105": "מסך שבור",
+        "106": "לא מדפיסה - המדפסת",
+    }
+    order = ["101", "102", "104", "101", "103", "106", "104", "105", "101", "102", "106"]
+    return pd.DataFrame({
+        CALL_COL: order,
+        "תאור תקלה": [calls[call] for call in order],
+        "מק\"ט - חלק": [f"P{i}" for i in range(len(order))],
+    })
+
+
+def test_fuzzy_scores_ignore_niqqud_and_forgive_typos(finder_rows):
+    index = FuzzyIndex(finder_rows["תאור תקלה"])
+    plain = index.row_scores("המדפסת לא מדפיסה")
+    assert np.allclose(index.row_scores("הַמַּדְפֶּסֶת לֹא מַדְפִּיסָה"), plain)
+    assert np.allclose(plain, [dice("המדפסת לא מדפיסה", text) for text in finder_rows["תאור תקלה"]])
+    # Word order and the maqaf don't matter
+    assert plain[0] == plain[5] == 1.0
+
+    typo = index.row_scores("המדפסט לא מדפיסע")
+    assert np.allclose(typo, [dice("המדפסט לא מדפיסע", text) for text in finder_rows["תאור תקלה"]])
+    assert typo.argmax() == 0
+    assert 0 < typo[0] < 1
+
+
+@pytest.mark.parametrize("top_n", [1, 2, 3, 10])
+@pytest.mark.parametrize("min_score", [0.25, 0.3, 0.65])
+def test_top_calls_keep_every_part_of_the_best_calls(finder_rows, top_n, min_score):
+    query = "המדפסט לא מדפיסע"
+    found = top_calls(finder_rows, PrefixIndex(finder_rows[CALL_COL]), FuzzyIndex(finder_rows["תאור תקלה"]),
+                      query, top_n, min_score=min_score)
+
+    # Calls by score, ties in row order, down to min_score; then the first top_n of them
+    scores = {call: dice(query, text) for call, text in zip(finder_rows[CALL_COL], finder_rows["תאור תקלה"])}
+    first_row = {call: i for i, call in reversed(list(enumerate(finder_rows[CALL_COL])))}
+    ranked = sorted((call for call in scores if scores[call] >= min_score), key=lambda c: (-scores[c], first_row[c]))
+    expected = ranked[:top_n]
+    assert expected
+
+    assert list(dict.fromkeys(found[CALL_COL])) == expected
+    assert (found[SCORE_COL].diff().dropna() <= 0).all()
+    assert found[SCORE_COL].min() >= round(min_score, 2)
+    for call in expected:
+        assert sorted(found.loc[found[CALL_COL] == call, "מק\"ט - חלק"]) == sorted(
+            finder_rows.loc[finder_rows[CALL_COL] == call, "מק\"ט - חלק"]
+        )
@@ -0,0 +1,182 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# In-memory indexes for searching a column without scanning it.
+# Both index the distinct values of a column, sorted once (so they double as
+# select box options), with the rows of each value in a CSR layout: the row
+# numbers ordered by value, plus where each value's rows start.
+#   - TextIndex adds a trigram -> values inverted index; a substring search
+#     intersects the posting lists of the query's trigrams and checks only
+#     the few values left, instead of running str.contains over every row
+#   - PrefixIndex answers "keys starting with ..." by binary search on the
+#     sorted keys (typeahead over call numbers)
+#   - FuzzyIndex ranks values by similarity to free text: trigram Dice
+#     score on Hebrew-normalized words (no niqqud, maqaf as a space, final
+#     letters as regular ones), counted through an inverted index, so typos
+#     and word order cost little and no pairwise comparison runs per query
+# Indexes are built once per uploaded file(s) and kept in a small LRU here.
+
+GRAM = 3
+MAX_ENTRIES = 8
+
+# Cantillation marks and vowel points (niqqud), but not the maqaf (U+05BE)
+_NIQQUD = re.compile(r"[\u0591-\u05bd\u05bf-\u05c7]")
+# Quotes, geresh and gershayim inside abbreviations (מק"ט) and direction marks
+_DROPPED = re.compile(r"[\"'\u05f3\u05f4\u200e\u200f\u202a-\u202e]")
+_SEPARATORS = re.compile(r"[\W_]+")
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> index (or whatever the caller built)
+
+
+# 🛠 HELPER FUNCTIONS
+def trigrams(text: str) -> set:
+    """The distinct GRAM-character substrings of ``text``."""
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def normalize_hebrew(text) -> str:
+    """Lower-case words of ``text`` without niqqud, punctuation or final letter forms."""
+    text = _DROPPED.sub("", _NIQQUD.sub("", str(text)))
+    return " ".join(_SEPARATORS.sub(" ", text).translate(_FINAL_LETTERS).lower().split())
+
+
+def word_trigrams(text: str) -> set:
+    """Trigrams of each space-padded word of normalized ``text``; word order doesn't matter."""
+    return {gram for word in text.split() for gram in trigrams(f" {word} ")}
+
+
+class _ValueRows:
+    """Sorted distinct values of a column and the rows holding each of them."""
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(pd.Series(values).to_numpy(dtype=object), sort=True)
+        self.codes = codes  # value id per row, -1 for NaN
+        self.values = np.asarray(uniques, dtype=object)
+        self.order = np.argsort(codes, kind="stable")
+        self.order = self.order[codes[self.order] >= 0]
+        self.bounds = np.searchsorted(codes[self.order], np.arange(len(self.values) + 1))
+
+    def __len__(self):
+        return len(self.values)
+
+    def value_id(self, value) -> int:
+        """Id of ``value``, or -1 when no row holds it."""
+        i = int(np.searchsorted(self.values, value)) if len(self.values) else 0
+        return i if i < len(self.values) and self.values[i] == value else -1
+
+    def rows_of(self, ids) -> np.ndarray:
+        """Row numbers (ascending) of the rows holding any of the value ids ``ids``."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 1:
+            return self.order[self.bounds[ids[0]]:self.bounds[ids[0] + 1]]
+        # One pass over the value ids of all rows; the extra last slot is for NaN (-1)
+        hit = np.zeros(len(self.values) + 1, dtype=bool)
+        hit[ids] = True
+        return np.flatnonzero(hit[self.codes])
+
+    def rows_equal(self, value) -> np.ndarray:
+        i = self.value_id(value)
+        return self.rows_of([i] if i >= 0 else [])
+
+    def values_in(self, rows) -> np.ndarray:
+        """Sorted distinct values of ``rows``."""
+        ids = np.unique(self.codes[rows])
+        return self.values[ids[ids >= 0]]
+
+
+# 📥 PUBLIC API
+class TextIndex(_ValueRows):
+    """Literal substring search over a text column (trigram inverted index)."""
+
+    def __init__(self, values):
+        super().__init__(values)
+        postings = {}
+        for i, text in enumerate(self.values):
+            for gram in trigrams(str(text)):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self.text = pd.Series(self.values, dtype="string")
+
+    def ids_containing(self, query: str) -> np.ndarray:
+        """Ids of the values containing ``query``."""
+        query = str(query)
+        if len(query) < GRAM:
+            candidates = np.arange(len(self.values))
+        else:
+            lists = sorted((self.postings.get(gram) for gram in trigrams(query)), key=lambda p: 0 if p is None else len(p))
+            if lists[0] is None:
+                return np.empty(0, dtype=np.int64)
+            candidates = lists[0]
+            for posting in lists[1:]:
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        # Having all the trigrams doesn't make a substring; check the candidates
+        found = self.text.iloc[candidates].str.contains(query, regex=False).to_numpy(dtype=bool)
+        return candidates[found]
+
+    def rows_containing(self, query: str) -> np.ndarray:
+        """Rows whose value contains ``query``, like ``str.contains(query, regex=False)``."""
+        return self.rows_of(self.ids_containing(query))
+
+
+class PrefixIndex(_ValueRows):
+    """Keys as text, sorted, for prefix lookups."""
+
+    def __init__(self, values):
+        values = pd.Series(values)
+        super().__init__(values.astype(str).where(values.notna()))
+
+    def keys_with_prefix(self, prefix: str) -> np.ndarray:
+        prefix = str(prefix)
+        start = np.searchsorted(self.values, prefix, side="left")
+        # Every key starting with prefix sorts below prefix + the highest code point
+        end = np.searchsorted(self.values, prefix + "\U0010ffff", side="left")
+        return self.values[start:end]
+
+
+class FuzzyIndex(_ValueRows):
+    """Similarity ranking of a free-text column (trigram Dice on normalized words)."""
+
+    def __init__(self, values):
+        super().__init__(values)
+        postings = {}
+        self.gram_counts = np.zeros(len(self.values), dtype=np.int64)
+        for i, text in enumerate(self.values):
+            grams = word_trigrams(normalize_hebrew(text))
+            self.gram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def value_scores(self, query: str) -> np.ndarray:
+        """Dice similarity (0 to 1) of every distinct value to ``query``."""
+        grams = word_trigrams(normalize_hebrew(query))
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return np.zeros(len(self.values))
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.values))
+        return 2 * shared / (len(grams) + self.gram_counts).clip(min=1)
+
+    def row_scores(self, query: str) -> np.ndarray:
+        """Similarity of every row's value to ``query`` (0 for empty rows)."""
+        return np.append(self.value_scores(query), 0.0)[self.codes]
+
+
+def cached_index(key, build):
+    """``build()``'s result for ``key`` (e.g. the uploads' content hashes), built once while cached."""
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key]
+    index = build()
+    with _lock:
+        _entries[key] = index
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return index
@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
 import io
+from excel_writer import ReportWriter
+from upload_cache import read_excel_cached
 
 def run_app():
     st.title("📊 Export or Modify Users File")
@@ -14,7 +15,7 @@ def run_app():
 
     if uploaded_file:
         # Read with all columns as strings to preserve leading zeros
-        df = pd.read_excel(uploaded_file, sheet_name='Users', dtype=str)
+        df = read_excel_cached(uploaded_file, sheet_name='Users', dtype=str)
 
         if mode == "Group and Export":
             filter_option = st.radio(
@@ -35,7 +36,8 @@ def run_app():
             grouped = df.groupby(group_cols)
 
             output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            with ReportWriter(output, expected_rows=len(df)) as writer:
+                text_format = writer.format(num_format='@')
                 for group_keys, group_df in grouped:
                     # Ensure UserID and CardID in each group remain strings
                     for col in ["UserID", "CardID"]:
@@ -45,15 +47,9 @@ def run_app():
                     if isinstance(group_keys, tuple):
                         sheet_name = "_".join(str(key)[:15] for key in group_keys)
                     else:
-                        sheet_name = str(group_keys)[:31]
-                    sheet_name = sheet_name.replace('/', '_').replace('\\', '_').replace(':', '_')
-                    if len(sheet_name) > 31:
-                        sheet_name = sheet_name[:31]
-
-                    group_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    worksheet = writer.sheets[sheet_name]
-                    text_format = writer.book.add_format({'num_format': '@'})
-                    worksheet.set_column('A:Z', None, text_format)
+                        sheet_name = str(group_keys)
+                    # The writer sanitizes, truncates and de-duplicates the name
+                    writer.write_frame(group_df, sheet_name, cell_format=text_format)
 
             st.success("✅ Grouped Excel file is ready.")
             st.download_button(
@@ -109,11 +105,8 @@ def run_app():
                         df[col] = df[col].astype(str)
 
                 output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    df.to_excel(writer, sheet_name='Users', index=False)
-                    worksheet = writer.sheets['Users']
-                    text_format = writer.book.add_format({'num_format': '@'})
-                    worksheet.set_column('A:Z', None, text_format)
+                with ReportWriter(output, expected_rows=len(df)) as writer:
+                    writer.write_frame(df, 'Users', cell_format=writer.format(num_format='@'))
 
                 st.success("✅ Modified file is ready.")
                 st.download_button(
@@ -0,0 +1,170 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+import columnar_store
+import excel_reader
+from cache_keys import freeze_key
+from schema import SCHEMA_VERSION, normalize_frame
+
+# Content-addressed cache for uploaded Priority / PM8 exports.
+# Streamlit reruns the whole tool on every widget click, so without this each
+# click re-parses the same workbook. Entries are keyed by the SHA-256 of the
+# uploaded bytes plus the sheet, the read options and schema.SCHEMA_VERSION,
+# live at module level (shared by every tool and every session in the process)
+# and are evicted LRU-first.
+# Below it sits the on-disk columnar_store, shared across processes and restarts.
+# With schema=True the frame goes through schema.normalize_frame() before it
+# is cached, so cache and store hold the canonical, memory-compact version.
+
+MAX_ENTRIES = 32
+MAX_BYTES = 512 * 1024 * 1024
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (DataFrame, size in bytes)
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+# 🛠 HELPER FUNCTIONS
+def file_bytes(uploaded_file) -> bytes:
+    """Return the raw bytes of an uploaded file, a file object or a path."""
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if isinstance(uploaded_file, str):
+        with open(uploaded_file, "rb") as f:
+            return f.read()
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    uploaded_file.seek(0)
+    return data
+
+
+def content_hash(uploaded_file) -> str:
+    return hashlib.sha256(file_bytes(uploaded_file)).hexdigest()
+
+
+def _frame_size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _get(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[0]
+
+
+def _put(key, df: pd.DataFrame):
+    size = _frame_size(df)
+    with _lock:
+        _entries[key] = (df, size)
+        _entries.move_to_end(key)
+        total = sum(s for _, s in _entries.values())
+        while len(_entries) > 1 and (len(_entries) > MAX_ENTRIES or total > MAX_BYTES):
+            _, (_, evicted_size) = _entries.popitem(last=False)
+            total -= evicted_size
+            _stats["evictions"] += 1
+
+
+def _load(key, label, parse):
+    # Memory first, then the on-disk columnar store, and only then the original file
+    df = _get(key)
+    if df is None:
+        df = columnar_store.get(key)
+        if df is None:
+            df = parse()
+            columnar_store.put(key, df, label=label, sheet=key[2])
+        _put(key, df)
+    return df
+
+
+def _cached(kind, uploaded_file, sheet_name, options, parse):
+    data = file_bytes(uploaded_file)
+    key = (hashlib.sha256(data).hexdigest(), kind, sheet_name, freeze_key(options), SCHEMA_VERSION)
+    df = _load(key, getattr(uploaded_file, "name", ""), lambda: parse(BytesIO(data)))
+    # Tools add and overwrite columns freely, so never hand out the cached frame itself
+    return df.copy()
+
+
+def _with_schema(options, parse, normalize):
+    # Normalized frames get their own key; plain reads keep the read options as key
+    if not normalize:
+        return options, parse
+    return {**options, "schema": True}, lambda buf: normalize_frame(parse(buf))
+
+
+# 📥 PUBLIC API
+def read_excel_cached(uploaded_file, sheet_name=0, schema=False, **kwargs) -> pd.DataFrame:
+    """Drop-in replacement for ``pd.read_excel`` on a single sheet.
+
+    ``engine`` also accepts the excel_reader engines ("openpyxl-stream",
+    "calamine", "auto"). ``schema=True`` returns the frame with canonical
+    column names and compact dtypes (see schema.py).
+    """
+    parse = lambda buf: excel_reader.read_excel(buf, sheet_name=sheet_name, **kwargs)  # noqa: E731
+    return _cached("xlsx", uploaded_file, sheet_name, *_with_schema(kwargs, parse, schema))
+
+
+def read_excel_sheets_cached(uploaded_file, sheets) -> dict:
+    """Load several sheets of one workbook, opening it at most once.
+
+    ``sheets`` is a list of sheet names or a ``{sheet_name: read options}``
+    dict. Sheets share cache keys with ``read_excel_cached``, and only the
+    ones not cached yet are parsed, all from a single ``pd.ExcelFile``.
+    """
+    if not isinstance(sheets, dict):
+        sheets = {name: {} for name in sheets}
+    data = file_bytes(uploaded_file)
+    digest = hashlib.sha256(data).hexdigest()
+
+    label = getattr(uploaded_file, "name", "")
+    workbook = None
+    frames = {}
+    try:
+        for name, options in sheets.items():
+            def parse(name=name, options=options):
+                nonlocal workbook
+                if workbook is None:
+                    workbook = pd.ExcelFile(BytesIO(data))
+                return workbook.parse(sheet_name=name, **options)
+
+            frames[name] = _load((digest, "xlsx", name, freeze_key(options), SCHEMA_VERSION), label, parse).copy()
+    finally:
+        if workbook is not None:
+            workbook.close()
+    return frames
+
+
+def read_csv_cached(uploaded_file, schema=False, **kwargs) -> pd.DataFrame:
+    """Drop-in replacement for ``pd.read_csv``; ``schema`` as in ``read_excel_cached``."""
+    parse = lambda buf: pd.read_csv(buf, **kwargs)  # noqa: E731
+    return _cached("csv", uploaded_file, None, *_with_schema(kwargs, parse, schema))
+
+
+def cache_stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "Entries": len(_entries),
+            "Size (MB)": round(sum(s for _, s in _entries.values()) / (1024 * 1024), 1),
+            "Hits": _stats["hits"],
+            "Misses": _stats["misses"],
+            "Evictions": _stats["evictions"],
+            "Hit Rate (%)": round(_stats["hits"] / lookups * 100, 2) if lookups else 0,
+        }
+
+
+def clear_cache():
+    with _lock:
+        _entries.clear()
+        for k in _stats:
+            _stats[k] = 0